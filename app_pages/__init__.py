@@ -0,0 +1,37 @@
+"""
+Pages of the app, imported on demand.
+
+app.py only draws the shared sidebar; the active page's module is imported the
+first time the page is shown, so the Table page never imports plotly and the
+Dashboard page never loads SALES. Every page module provides:
+
+    init(session)
+        Initializes the session state the page needs, once per session.
+    reads(session, filters)
+        Name -> callable of the page's reads that can run at the same time as
+        the sidebar's, with the filters as they stood at the start of the rerun.
+    render(session, reads, read_errors, filters, prefetched_filters)
+        Draws the page.
+"""
+import importlib
+import sys
+
+from perf_trace import span
+
+PAGES = {
+    "Table": "app_pages.sales_table",
+    "Dashboard": "app_pages.dashboard",
+}
+
+
+def load_page(name):
+    """
+    Args:
+        name (str) : A key of PAGES
+
+    Returns:
+        module : The page module, imported on first use
+    """
+    module_name = PAGES[name]
+    with span("page.import", page = name, cold = module_name not in sys.modules):
+        return importlib.import_module(module_name)
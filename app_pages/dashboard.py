@@ -0,0 +1,48 @@
+"""
+Dashboard page: sales totals and the yearly sales chart of VGSALES.
+"""
+import plotly.express as px
+import streamlit as st
+
+from dashboard_data import load_yearly_region_sales, sales_totals, yearly_sales
+from perf_trace import span
+
+
+def init(session):
+    pass
+
+
+def reads(session, filters):
+    return {"yearly": lambda: load_yearly_region_sales(session, *filters)}
+
+
+def render(session, reads, read_errors, filters, prefetched_filters):
+    st.header("Sales Analysis")
+
+    if "yearly" in read_errors:
+        st.error(f"Sales query failed: {read_errors['yearly']}")
+        st.stop()
+    if "yearly" in reads and prefetched_filters == filters:
+        yearly_df = reads["yearly"]
+    else:
+        with span("dashboard.load"):
+            yearly_df = load_yearly_region_sales(session, *filters)
+    totals = sales_totals(yearly_df)
+
+    total_NA_sales = totals["NA_SALES"]
+    total_EU_sales = totals["EU_SALES"]
+    total_JP_sales = totals["JP_SALES"]
+    total_global_sales = totals["GLOBAL_SALES"]
+    
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Total Sales to Date", f"${total_global_sales:,.2f}")
+    c2.metric("North America Sales to Date", f"${total_NA_sales:,.2f}")
+    c3.metric("European Union Sales to Date", f"${total_EU_sales:,.2f}")
+    c4.metric("Japan Sales to Date", f"${total_JP_sales:,.2f}")
+
+    st.subheader("Total sales per year")
+    
+    with span("dashboard.plotly"):
+        fig = px.line(yearly_sales(yearly_df), x="YEAR", y="GLOBAL_SALES",markers= True)
+        fig.update_layout(yaxis_title="Sales ($)", xaxis_title= "Year")
+        st.plotly_chart(fig, use_container_width= True)
@@ -0,0 +1,105 @@
+"""
+Sales Table page: the SALES editor with its dialogs, in full or paginated mode.
+"""
+import pandas as pd
+import streamlit as st
+
+from helping_functions import build_column_config, get_dropdown_options, edit_dropdowns, add_new_dialog, select_tables_dialog, preview_changes_dialog
+from helping_functions import init_pager, load_editor_base, render_pager_controls, show_violations, validate_editor_delta
+from edit_journal import init_edit_journal, editor_key, editor_delta_keys, record_editor_delta, rebase_editor
+from change_set import key_tuples
+from sales_pager import PAGINATION_THRESHOLD, key_conflicts, sales_row_count
+from constants import DROPDOWN_TABLE, PK_COLS
+from query_cache import cached_table
+from perf_trace import span
+
+
+def init(session):
+    with span("setup.session_state"):
+        if 'paginated_mode' not in st.session_state:
+            st.session_state.paginated_mode = sales_row_count(session) > PAGINATION_THRESHOLD
+
+        init_pager()
+
+        if 'editable_df' not in st.session_state:
+            st.session_state.editable_df = load_editor_base(session)
+
+        if 'current_df' not in st.session_state:
+            st.session_state.current_df = st.session_state.editable_df
+
+        init_edit_journal()
+
+        if "dropdown_df" not in st.session_state:
+            st.session_state.dropdown_df = cached_table(session, DROPDOWN_TABLE)
+
+
+def reads(session, filters):
+    return {}
+
+
+def render(session, reads, read_errors, filters, prefetched_filters):
+    col1, col2 = st.columns([4,1])
+    col1.header("Sales Table 📋")
+
+    if col2.button("⚙️ Manage Dropdown Options"):
+        edit_dropdowns(st.session_state.dropdown_df,session)
+
+    dropdowns = get_dropdown_options(session)
+    dropdown_options = dropdowns.options
+
+    paginated = st.toggle(
+        "Paginated editor",
+        value = st.session_state.paginated_mode,
+        disabled = bool(st.session_state.edit_journal),
+        help = "Save or discard pending changes before switching modes.",
+    )
+    if paginated != st.session_state.paginated_mode:
+        st.session_state.paginated_mode = paginated
+        rebase_editor(load_editor_base(session))
+
+    if st.session_state.paginated_mode:
+        render_pager_controls(session, dropdown_options)
+
+    column_config = build_column_config(dropdowns, st.session_state.editable_df)
+    with span("editor.data_editor", rows = len(st.session_state.editable_df)):
+        edited_df = st.data_editor(st.session_state.editable_df, column_config = column_config, num_rows= "dynamic", key = editor_key())
+    st.info("Edit cells or add new rows to the table.")
+
+    with span("editor.duplicate_check"):
+        duplicate_keys = st.session_state.pk_index.conflicts(*editor_delta_keys(st.session_state.editable_df))
+    with span("editor.validate"):
+        report = validate_editor_delta(st.session_state.editable_df, dropdown_options)
+
+    if duplicate_keys:
+        st.error("Duplicate primary keys detected!  The combination has to be unique. Please edit the existing cell.")
+        primary_keys = edited_df[PK_COLS]
+        duplicates = primary_keys[pd.Series(key_tuples(primary_keys), index = primary_keys.index).isin(duplicate_keys)]
+        st.dataframe(duplicates, use_container_width=True)
+    if not report.ok:
+        show_violations(report)
+    delta_ok = not duplicate_keys and report.ok
+    if delta_ok:
+        with span("editor.record_delta"):
+            record_editor_delta(st.session_state.editable_df)
+        st.session_state.current_df = edited_df
+
+        if st.session_state.paginated_mode:
+            with span("editor.key_conflicts"):
+                conflicts = key_conflicts(session, st.session_state.edit_journal, memo = st.session_state.pager["key_conflicts"])
+            if not conflicts.empty:
+                st.error("Duplicate primary keys detected across pages! The combination has to be unique. Please edit the existing cell.")
+                st.dataframe(conflicts, use_container_width=True)
+
+    c1,spacer,c2,spacer,c3 = st.columns([1,2,1,2,1])
+
+    # Adding rows folds the editor's delta into the table, so it is only allowed once the delta was journaled
+    blocked_help = None if delta_ok else "Fix the errors in the table first."
+    if c1.button("➕ Add new row", disabled = not delta_ok, help = blocked_help):
+        add_new_dialog(st.session_state.current_df, dropdown_options)
+
+    if c2.button("🗂️ Append CSV File", disabled = not delta_ok, help = blocked_help):
+        select_tables_dialog(st.session_state.current_df, session)
+                    
+                    
+    if c3.button("🔍 Preview Changes"):
+        preview_changes_dialog(session)
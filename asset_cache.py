@@ -0,0 +1,164 @@
+"""
+Cache for files read from a Snowflake stage, such as the sidebar logo.
+
+Contents live in an on-disk, content-addressed store (one file per SHA-256 digest)
+fronted by a small in-process LRU. The stage file's md5 and last-modified time are
+re-checked with LIST at most once per revalidate_seconds; the file is downloaded
+again only when they change.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+from concurrent_queries import SingleFlight
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "streamlit_stage_assets")
+DEFAULT_REVALIDATE_SECONDS = 10 * 60
+DEFAULT_MEMORY_ITEMS = 16
+
+
+class StageAssetCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, revalidate_seconds=DEFAULT_REVALIDATE_SECONDS,
+                 max_memory_items=DEFAULT_MEMORY_ITEMS):
+        self.cache_dir = cache_dir
+        self.revalidate_seconds = revalidate_seconds
+        self.max_memory_items = max_memory_items
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._flights = SingleFlight()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index_path = os.path.join(cache_dir, "index.json")
+        self._index = self._read_index()
+
+    def _read_index(self):
+        try:
+            with open(self._index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self):
+        tmp_path = f"{self._index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _blob_path(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def _read_blob(self, digest):
+        if digest in self._memory:
+            self._memory.move_to_end(digest)
+            return self._memory[digest]
+        try:
+            with open(self._blob_path(digest), "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+        self._remember(digest, content)
+        return content
+
+    def _write_blob(self, content):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        self._remember(digest, content)
+        return digest
+
+    def _remember(self, digest, content):
+        self._memory[digest] = content
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def _stage_fingerprint(session, stage_path):
+        """
+        Returns:
+            list : [md5, last_modified] of the stage file, None when LIST is not available
+        """
+        try:
+            rows = session.sql(f"LIST {stage_path}").collect()
+        except Exception:
+            return None
+        if not rows:
+            return None
+        row = rows[0].as_dict()
+        return [row.get("md5"), str(row.get("last_modified"))]
+
+    def get(self, session, stage_path):
+        """
+        Returns the bytes of a stage file, downloading it only when it changed.
+
+        Args:
+            session (Session) : The active Snowpark session
+            stage_path (str) : e.g. "@DEMO_STREAMLIT_APP.PUBLIC.ASSETS/l1.jpg"
+
+        Returns:
+            bytes : The file contents
+        """
+        with self._lock:
+            entry = self._index.get(stage_path)
+            if entry and time.time() - entry["checked_at"] < self.revalidate_seconds:
+                content = self._read_blob(entry["digest"])
+                if content is not None:
+                    return content
+
+        content, _ = self._flights.do(stage_path, lambda: self._fetch(session, stage_path))
+        return content
+
+    def _fetch(self, session, stage_path):
+        """
+        Revalidates a stage file and downloads it when it changed; run once at a
+        time per file, concurrent callers wait for the running fetch.
+        """
+        fingerprint = self._stage_fingerprint(session, stage_path)
+
+        with self._lock:
+            entry = self._index.get(stage_path)
+            if entry and fingerprint is not None and entry["fingerprint"] == fingerprint:
+                content = self._read_blob(entry["digest"])
+                if content is not None:
+                    entry["checked_at"] = time.time()
+                    self._write_index()
+                    return content
+
+        content = session.file.get_stream(stage_path, decompress=False).read()
+
+        with self._lock:
+            digest = self._write_blob(content)
+            self._index[stage_path] = {
+                "digest": digest,
+                "fingerprint": fingerprint,
+                "checked_at": time.time(),
+            }
+            self._write_index()
+        return content
+
+
+@st.cache_resource
+def get_asset_cache():
+    """
+    Returns:
+        StageAssetCache : The process-wide stage asset cache
+    """
+    return StageAssetCache()
+
+
+def load_stage_asset(session, stage_path):
+    """
+    Shortcut for get_asset_cache().get(session, stage_path).
+    """
+    return get_asset_cache().get(session, stage_path)
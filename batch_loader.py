@@ -0,0 +1,84 @@
+"""
+Batched table loads.
+
+Results are read with to_pandas_batches, which converts the Arrow result chunks
+one at a time, instead of one to_pandas call that materialises the whole result
+before anything else can happen. Each batch can be converted (e.g. compacted) as
+it arrives, so the full-width intermediate frame never exists, and a callback
+sees every batch so the first rows can be shown while the rest streams in.
+"""
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from perf_trace import span
+
+
+def iter_batches(session, table_name, columns=None):
+    """
+    Yields the rows of a table as pandas frames, one per Arrow result batch.
+
+    Args:
+        session (Session) : The active Snowpark session
+        table_name (str) : The table to read
+        columns (list) : Columns to fetch, None for all of them
+    """
+    df = session.table(table_name)
+    if columns:
+        df = df.select(*columns)
+    for batch in df.to_pandas_batches():
+        yield batch
+
+
+def concat_batches(frames):
+    """
+    Assembles batches into one frame with a single copy per column.
+
+    Categorical columns are unioned rather than falling back to object when the
+    batches saw different values; other columns are concatenated as they are.
+
+    Returns:
+        pd.DataFrame : The rows of every batch, with a fresh RangeIndex
+    """
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    columns = {}
+    for col_name in frames[0].columns:
+        parts = [f[col_name] for f in frames]
+        if all(isinstance(p.dtype, pd.CategoricalDtype) for p in parts):
+            columns[col_name] = union_categoricals([p.array for p in parts])
+        else:
+            columns[col_name] = pd.concat(parts, ignore_index = True)
+    return pd.DataFrame(columns)
+
+
+def load_batched(session, table_name, columns=None, convert=None, on_batch=None, total_rows=None):
+    """
+    Reads a table batch by batch and assembles the result.
+
+    Args:
+        session (Session) : The active Snowpark session
+        table_name (str) : The table to read
+        columns (list) : Columns to fetch, None for all of them
+        convert (callable) : Optional f(batch) -> frame applied to each batch as it arrives
+        on_batch (callable) : Optional f(batch, rows_loaded, total_rows) called after each converted batch
+        total_rows (int) : Expected row count passed to on_batch, when known
+
+    Returns:
+        pd.DataFrame : All rows; an empty frame with the table's columns when there are none
+    """
+    frames = []
+    rows_loaded = 0
+    with span("load.batches", table = table_name.split(".")[-1]) as s:
+        for batch in iter_batches(session, table_name, columns):
+            if convert is not None:
+                batch = convert(batch)
+            frames.append(batch)
+            rows_loaded += len(batch)
+            if on_batch is not None:
+                on_batch(batch, rows_loaded, total_rows)
+        s.set(batches = len(frames), rows = rows_loaded)
+
+        if not frames:
+            frame = pd.DataFrame(columns = columns or session.table(table_name).columns)
+            return convert(frame) if convert is not None else frame
+        return concat_batches(frames)
@@ -0,0 +1,76 @@
+"""
+Compares loading SALES with one to_pandas call and compacting afterwards against
+the batched loader, which compacts each batch as it arrives: time to the first
+rows, total time, peak Python memory, and whether both give the same frame.
+
+Usage:
+    python -m benchmarks.bench_batch_loader [--sizes 100000 1000000]
+"""
+import argparse
+import time
+import tracemalloc
+
+from batch_loader import load_batched
+from benchmarks.offline_session import OfflineSession
+from benchmarks.synthetic import make_dropdown_frame, make_sales_frame
+from constants import PK_COLS, SALES_TABLE
+from sales_frame import key_categories, to_compact_frame
+
+
+def _measure(load):
+    """
+    Returns:
+        tuple : (frame, seconds to the first rows, total seconds); timed without tracemalloc
+    """
+    first = []
+
+    def on_batch(*_):
+        if not first:
+            first.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    frame = load(on_batch)
+    total = time.perf_counter() - start
+    return frame, (first[0] if first else total), total
+
+
+def _peak_mb(load):
+    tracemalloc.start()
+    load(lambda *_: None)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 ** 2
+
+
+def run(sizes):
+    for n_rows in sizes:
+        sales = make_sales_frame(n_rows)
+        session = OfflineSession()
+        session.load_table(SALES_TABLE, sales, PK_COLS)
+        categories = key_categories(make_dropdown_frame(sales))
+
+        def whole(on_first):
+            frame = to_compact_frame(session.table(SALES_TABLE).to_pandas(), categories)
+            on_first()
+            return frame
+
+        def batched(on_first):
+            return load_batched(
+                session, SALES_TABLE, convert = lambda batch: to_compact_frame(batch, categories), on_batch = on_first
+            )
+
+        whole_df, whole_first, whole_total = _measure(whole)
+        batched_df, batched_first, batched_total = _measure(batched)
+        print(
+            f"{n_rows:>9,} rows  to_pandas: first rows {whole_first:6.3f}s  total {whole_total:6.3f}s  "
+            f"peak {_peak_mb(whole):7.1f} MB  |  batched: first rows {batched_first:6.3f}s  "
+            f"total {batched_total:6.3f}s  peak {_peak_mb(batched):7.1f} MB  same={whole_df.equals(batched_df)}"
+        )
+        session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+    run(args.sizes)
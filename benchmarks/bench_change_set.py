@@ -0,0 +1,31 @@
+"""
+Times compute_change_set on synthetic SALES frames.
+
+Usage:
+    python -m benchmarks.bench_change_set [--sizes 10000 100000 1000000]
+"""
+import argparse
+import time
+
+from benchmarks.synthetic import make_sales_frame, make_edited_frame
+from change_set import compute_change_set
+
+
+def run(sizes, edit_fraction):
+    for n_rows in sizes:
+        original = make_sales_frame(n_rows)
+        edited = make_edited_frame(original, edit_fraction)
+
+        start = time.perf_counter()
+        change_set = compute_change_set(original, edited)
+        elapsed = time.perf_counter() - start
+
+        print(f"{n_rows:>9,} rows  {elapsed:8.3f}s  {change_set.summary()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--edit-fraction", type=float, default=0.01)
+    args = parser.parse_args()
+    run(args.sizes, args.edit_fraction)
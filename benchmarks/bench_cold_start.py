@@ -0,0 +1,127 @@
+"""
+Cold-start cost of each page: import time of the page module and time to the
+first render of a new session.
+
+Every measurement runs in a fresh interpreter, so module imports and the
+process-wide caches start cold. Import time is measured after the modules every
+page shares (streamlit, pandas, Snowpark) are loaded, so it is the page's own
+cost. The first render runs the app script with streamlit's AppTest against an
+offline session holding synthetic SALES, DROPDOWN_OPTIONS and VGSALES, and also
+reports whether the run loaded SALES and whether it imported plotly.express
+(streamlit itself already imports the plotly base package).
+
+Passing --script main.py measures the single-file version of the app the same way.
+
+Usage:
+    python -m benchmarks.bench_cold_start [--rows 100000] [--repeats 3] [--script app.py]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ["Table", "Dashboard"]
+SHARED_MODULES = ["streamlit", "pandas", "snowflake.snowpark"]
+RENDER_TIMEOUT_SECONDS = 600
+SALES_READ = re.compile(r"FROM\s+(\w+\.)*SALES\b", re.IGNORECASE)
+
+
+def _child(args):
+    return json.loads(subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_cold_start", "--child", *args],
+        cwd = REPO_DIR, check = True, capture_output = True, text = True,
+    ).stdout.strip().splitlines()[-1])
+
+
+def measure_import(page):
+    """
+    Returns:
+        dict : Seconds to import the page module and whether plotly.express came with it
+    """
+    import importlib
+
+    for module_name in SHARED_MODULES:
+        importlib.import_module(module_name)
+    from app_pages import PAGES as PAGE_MODULES
+
+    start = time.perf_counter()
+    importlib.import_module(PAGE_MODULES[page])
+    return {"seconds": time.perf_counter() - start, "plotly": "plotly.express" in sys.modules}
+
+
+def measure_first_render(page, n_rows, script):
+    """
+    Returns:
+        dict : Seconds of the first script run of a session on page, whether it
+            loaded SALES and whether plotly.express was imported
+    """
+    from unittest import mock
+
+    from streamlit.testing.v1 import AppTest
+
+    from benchmarks.offline_session import OfflineSession
+    from benchmarks.synthetic import make_dropdown_frame, make_sales_frame, make_vgsales_frame
+    from constants import DROPDOWN_TABLE, LOGO_PATH, PK_COLS, SALES_TABLE, VGSALES_TABLE
+
+    with open(os.path.join(REPO_DIR, "assets", "Logo.bmp"), "rb") as f:
+        session = OfflineSession(stage_files = {LOGO_PATH: f.read()})
+    sales = make_sales_frame(n_rows)
+    session.load_table(SALES_TABLE, sales, PK_COLS)
+    session.load_table(DROPDOWN_TABLE, make_dropdown_frame(sales))
+    session.load_table(VGSALES_TABLE, make_vgsales_frame(n_rows))
+
+    history = session.query_history()
+
+    app = AppTest.from_file(os.path.join(REPO_DIR, script), default_timeout = RENDER_TIMEOUT_SECONDS)
+    app.session_state["active_page"] = page
+    with mock.patch("snowflake.snowpark.context.get_active_session", return_value = session):
+        start = time.perf_counter()
+        app.run()
+        seconds = time.perf_counter() - start
+
+    return {
+        "seconds": seconds,
+        "loaded_sales": any(SALES_READ.search(q.sql_text) for q in history.queries),
+        "plotly": "plotly.express" in sys.modules,
+        "errors": [str(e.value) for e in app.exception],
+    }
+
+
+def run(n_rows, repeats, script):
+    print(f"{script}: {n_rows:,} SALES rows, median of {repeats} fresh interpreters")
+    print(f"{'page':>10} {'import s':>9} {'first render s':>15} {'loads SALES':>12} {'imports plotly':>15}")
+    for page in PAGES:
+        imports = [_child(["import", page])["seconds"] for _ in range(repeats)] if script == "app.py" else []
+        renders = [_child(["render", page, str(n_rows), script]) for _ in range(repeats)]
+        errors = [e for r in renders for e in r["errors"]]
+        if errors:
+            raise RuntimeError(f"{page} failed to render: {errors[0]}")
+        import_s = f"{statistics.median(imports):9.3f}" if imports else f"{'-':>9}"
+        print(
+            f"{page:>10} {import_s} {statistics.median(r['seconds'] for r in renders):15.3f} "
+            f"{str(renders[0]['loaded_sales']):>12} {str(renders[0]['plotly']):>15}"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        sys.path.insert(0, REPO_DIR)
+        mode, page, *rest = sys.argv[2:]
+        if mode == "import":
+            result = measure_import(page)
+        else:
+            result = measure_first_render(page, int(rest[0]), rest[1])
+        print(json.dumps(result))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--script", default="app.py")
+    args = parser.parse_args()
+    run(args.rows, args.repeats, args.script)
@@ -0,0 +1,209 @@
+"""
+Multi-writer load test of the SALES save path.
+
+Several editors, each with its own offline session on one shared SQLite file,
+save 1% edits of their own rows at the same time. The run checks that every
+save committed exactly its changes (each writer's rows in SALES equal what it
+last saved) and reports throughput. A final round has two writers save
+different values into the same row at once: one must commit and the other get
+ConcurrentModificationError.
+
+Usage:
+    python -m benchmarks.bench_concurrent_saves [--rows 100000] [--writers 1 2 4 8] [--saves 5]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.offline_session import OfflineSession
+from benchmarks.synthetic import make_edited_frame, make_sales_frame
+from change_set import compute_change_set
+from constants import MONTH_COLS, PK_COLS, SALES_TABLE
+from sales_save import save_change_set
+from sales_snapshot import ConcurrentModificationError
+
+
+def _owned_rows(session, products, writer):
+    placeholders = ", ".join(["?"] * len(products))
+    return session.sql(
+        f"SELECT * FROM {SALES_TABLE} WHERE PRODUCT IN ({placeholders}) OR PRODUCT LIKE ?",
+        params = list(products) + [f"NEW-W{writer}-%"],
+    ).to_pandas()
+
+
+def _sorted(df):
+    return df[PK_COLS + MONTH_COLS].sort_values(PK_COLS).reset_index(drop=True)
+
+
+class Writer(threading.Thread):
+    """
+    One editor saving edits of the products it owns, the way the preview dialog does.
+    """
+    def __init__(self, database, writer_id, products, n_saves, edit_fraction, start_barrier):
+        super().__init__()
+        self.database = database
+        self.writer_id = writer_id
+        self.products = products
+        self.n_saves = n_saves
+        self.edit_fraction = edit_fraction
+        self.start_barrier = start_barrier
+        self.latencies = []
+        self.changed_rows = 0
+        self.conflicts = 0
+        self.error = None
+        self.expected = None
+
+    def run(self):
+        session = OfflineSession(self.database)
+        try:
+            baseline = _owned_rows(session, self.products, self.writer_id)
+            self.start_barrier.wait()
+            for i in range(self.n_saves):
+                edited = make_edited_frame(baseline, self.edit_fraction, seed = 1000 * self.writer_id + i)
+                edited["PRODUCT"] = edited["PRODUCT"].str.replace(r"^NEW-", f"NEW-W{self.writer_id}-S{i}-", regex = True)
+                change_set = compute_change_set(baseline, edited)
+
+                start = time.perf_counter()
+                try:
+                    save_change_set(session, change_set)
+                except ConcurrentModificationError:
+                    self.conflicts += 1
+                    baseline = _owned_rows(session, self.products, self.writer_id)
+                    continue
+                self.latencies.append(time.perf_counter() - start)
+                summary = change_set.summary()
+                self.changed_rows += summary["added"] + summary["removed"] + summary["updated"]
+                baseline = edited
+            self.expected = baseline
+        except Exception as e:
+            self.error = e
+        finally:
+            session.close()
+
+
+def _load(database, n_rows):
+    session = OfflineSession(database)
+    sales = make_sales_frame(n_rows)
+    session.load_table(SALES_TABLE, sales, PK_COLS)
+    session.close()
+    return sorted(sales["PRODUCT"].unique())
+
+
+def run_writers(n_rows, n_writers, n_saves, edit_fraction):
+    """
+    Returns:
+        dict : Throughput and correctness of one run with n_writers concurrent writers
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "sales.db")
+        products = _load(database, n_rows)
+
+        barrier = threading.Barrier(n_writers)
+        writers = [
+            Writer(database, w, products[w::n_writers], n_saves, edit_fraction, barrier)
+            for w in range(n_writers)
+        ]
+        start = time.perf_counter()
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+        elapsed = time.perf_counter() - start
+
+        errors = [w.error for w in writers if w.error is not None]
+        if errors:
+            raise errors[0]
+
+        session = OfflineSession(database)
+        correct = all(
+            _sorted(_owned_rows(session, w.products, w.writer_id)).equals(_sorted(w.expected))
+            for w in writers
+        )
+        session.close()
+
+    latencies = np.concatenate([w.latencies for w in writers]) if writers else np.array([])
+    saves = len(latencies)
+    return {
+        "writers": n_writers,
+        "saves": saves,
+        "conflicts": sum(w.conflicts for w in writers),
+        "seconds": elapsed,
+        "saves_per_s": saves / elapsed,
+        "rows_per_s": sum(w.changed_rows for w in writers) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)) * 1000 if saves else 0.0,
+        "p95_ms": float(np.percentile(latencies, 95)) * 1000 if saves else 0.0,
+        "correct": correct,
+    }
+
+
+def run_contended(n_rows):
+    """
+    Two writers save different values into the same row at once.
+
+    Returns:
+        bool : True when exactly one save committed and SALES holds its value
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "sales.db")
+        _load(database, n_rows)
+
+        reader = OfflineSession(database)
+        baseline = reader.table(SALES_TABLE).to_pandas()
+        outcomes = {}
+        barrier = threading.Barrier(2)
+
+        def save(value):
+            session = OfflineSession(database)
+            edited = baseline.copy()
+            edited.loc[0, "JAN"] = value
+            change_set = compute_change_set(baseline, edited)
+            barrier.wait()
+            try:
+                save_change_set(session, change_set)
+                outcomes[value] = "committed"
+            except ConcurrentModificationError:
+                outcomes[value] = "conflict"
+            finally:
+                session.close()
+
+        threads = [threading.Thread(target = save, args = (value,)) for value in (-1.0, -2.0)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        key = baseline.loc[0, PK_COLS]
+        stored = reader.sql(
+            f"SELECT JAN FROM {SALES_TABLE} WHERE {' AND '.join(f'{c} = ?' for c in PK_COLS)}",
+            params = list(key),
+        ).collect()[0][0]
+        reader.close()
+
+    winners = [value for value, outcome in outcomes.items() if outcome == "committed"]
+    return len(winners) == 1 and stored == winners[0]
+
+
+def run(n_rows, writer_counts, n_saves, edit_fraction):
+    print(f"{n_rows:,} rows, {n_saves} saves per writer, {edit_fraction:.1%} of each writer's rows per save")
+    print(f"{'writers':>7} {'saves':>6} {'conflicts':>9} {'seconds':>8} {'saves/s':>8} {'rows/s':>9} {'p50 ms':>7} {'p95 ms':>7} correct")
+    for n_writers in writer_counts:
+        r = run_writers(n_rows, n_writers, n_saves, edit_fraction)
+        print(
+            f"{r['writers']:>7} {r['saves']:>6} {r['conflicts']:>9} {r['seconds']:8.2f} {r['saves_per_s']:8.1f} "
+            f"{r['rows_per_s']:9,.0f} {r['p50_ms']:7.1f} {r['p95_ms']:7.1f} {r['correct']}"
+        )
+    print(f"Same-row race: exactly one save committed = {run_contended(min(n_rows, 10_000))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--saves", type=int, default=5)
+    parser.add_argument("--edit-fraction", type=float, default=0.01)
+    args = parser.parse_args()
+    run(args.rows, args.writers, args.saves, args.edit_fraction)
@@ -0,0 +1,50 @@
+"""
+Compares the memory of a SALES frame as loaded with its compact representation,
+and checks that to_storage_frame restores the loaded values exactly.
+
+Usage:
+    python -m benchmarks.bench_sales_frame [--sizes 100000 1000000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_sales_frame
+from constants import PK_COLS
+from sales_frame import to_compact_frame, to_storage_frame
+
+
+def _mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def run(sizes):
+    for n_rows in sizes:
+        loaded = make_sales_frame(n_rows)
+        loaded[PK_COLS] = loaded[PK_COLS].astype(object)
+        categories = {c: sorted(loaded[c].unique()) for c in PK_COLS}
+
+        start = time.perf_counter()
+        compact = to_compact_frame(loaded, categories)
+        to_compact = time.perf_counter() - start
+
+        start = time.perf_counter()
+        restored = to_storage_frame(compact)
+        to_storage = time.perf_counter() - start
+
+        lossless = all(
+            np.array_equal(restored[c].to_numpy(), loaded[c].to_numpy()) for c in loaded.columns
+        )
+        before, after = _mb(loaded), _mb(compact)
+        print(
+            f"{n_rows:>9,} rows  loaded {before:8.1f} MB  compact {after:7.1f} MB  ({before / after:4.1f}x)  "
+            f"compact {to_compact:6.3f}s  restore {to_storage:6.3f}s  lossless={lossless}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+    run(args.sizes)
@@ -0,0 +1,466 @@
+"""
+Offline stand-in for the Snowpark Session surface the app uses, backed by SQLite.
+
+Supported:
+    session.table(name) with filter / select / distinct / group_by().agg() / count /
+        columns / collect / to_pandas / to_pandas_batches
+    session.sql(query, params).collect() / .to_pandas(), including BEGIN/COMMIT/ROLLBACK,
+        the MERGE statements built by sales_save, CREATE DYNAMIC TABLE (as a view), LIST @stage,
+        HASH_AGG(expr, ...) and SYSTEM$LAST_CHANGE_COMMIT_TIME('table'), answered with a hash of the
+        table's rows, which changes whenever they do
+    session.create_dataframe(pdf).write.save_as_table(name, mode, table_type)
+    session.write_pandas(pdf, name, auto_create_table, table_type, overwrite)
+    session.file.get_stream(stage_path, decompress)
+    session.query_history()
+
+Fully qualified names (DB.SCHEMA.TABLE) map to their last part. Several sessions
+can share one database file to simulate concurrent users; each gets its own
+connection, so temporary tables stay private to their session.
+
+Only what the app's own statements need is translated. It is not a general Snowflake emulator.
+"""
+import hashlib
+import io
+import re
+import sqlite3
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+from snowflake.snowpark import Row
+from snowflake.snowpark.query_history import QueryRecord
+
+sqlite3.register_adapter(np.int64, int)
+sqlite3.register_adapter(np.int32, int)
+sqlite3.register_adapter(np.float32, float)
+sqlite3.register_adapter(np.float64, float)
+sqlite3.register_adapter(np.bool_, bool)
+
+OFFLINE_WAREHOUSE = "OFFLINE_WH"
+BATCH_ROWS = 50_000
+
+_QUALIFIED_NAME = re.compile(r"\b(?:[A-Za-z_][A-Za-z0-9_$]*\.){2}([A-Za-z_][A-Za-z0-9_$]*)\b")
+_DYNAMIC_TABLE = re.compile(
+    r"CREATE\s+(?:OR\s+REPLACE\s+)?DYNAMIC\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?(\S+).*?\bAS\b(.*)",
+    re.IGNORECASE | re.DOTALL,
+)
+_MERGE = re.compile(
+    r"MERGE\s+INTO\s+(\S+)\s+AS\s+(\w+)\s+USING\s+(.+?)\s+AS\s+(\w+)\s+ON\s+(.+?)\s+(WHEN\s.*)",
+    re.IGNORECASE | re.DOTALL,
+)
+_CHANGE_VERSION = re.compile(r"SYSTEM\$LAST_CHANGE_COMMIT_TIME\(\s*'([^']+)'\s*\)", re.IGNORECASE)
+_WHEN = re.compile(
+    r"WHEN\s+(NOT\s+)?MATCHED(?:\s+AND\s+(.+?))?\s+THEN\s+(.+?)(?=\s+WHEN\s+|\s*$)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def local_name(name):
+    """
+    Returns:
+        str : The SQLite table name of a (possibly fully qualified) Snowflake table name
+    """
+    return name.strip().strip('"').split(".")[-1].strip('"').upper()
+
+
+def translate(query):
+    """
+    Rewrites the Snowflake-specific parts of a statement for SQLite.
+    """
+    return _QUALIFIED_NAME.sub(lambda m: m.group(1), query)
+
+
+def _sqlite_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
+def _rows_of(pdf):
+    """
+    Returns:
+        list : The rows of pdf as tuples of plain Python values, missing values as None
+    """
+    columns = []
+    for name in pdf.columns:
+        values = pdf[name]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(object)
+        elif values.dtype == np.float32:
+            values = values.astype(np.float64)
+        array = values.to_numpy(dtype=object, copy=True)
+        array[pd.isna(values).to_numpy()] = None
+        columns.append(array)
+    return list(zip(*columns))
+
+
+def _expr_sql(expr, params):
+    """
+    Renders the Snowpark Column expressions the app builds (attributes, literals,
+    comparisons, boolean operators, aliases and function calls) as SQLite SQL.
+    """
+    if isinstance(expr, str):
+        return expr
+    expr = getattr(expr, "_expression", expr)
+    kind = type(expr).__name__
+    if kind in ("UnresolvedAttribute", "Attribute"):
+        return expr.name
+    if kind == "Literal":
+        params.append(expr.value)
+        return "?"
+    if kind == "Alias":
+        return f"{_expr_sql(expr.child, params)} AS {expr.name}"
+    if kind == "FunctionExpression":
+        args = ", ".join(_expr_sql(c, params) for c in expr.children)
+        return f"{expr.name}({'DISTINCT ' if expr.is_distinct else ''}{args})"
+    if kind == "Not":
+        return f"(NOT {_expr_sql(expr.child, params)})"
+    if hasattr(expr, "sql_operator") and hasattr(expr, "left"):
+        return f"({_expr_sql(expr.left, params)} {expr.sql_operator} {_expr_sql(expr.right, params)})"
+    raise NotImplementedError(f"Offline session cannot translate {kind}")
+
+
+def _row_hash(values):
+    digest = hashlib.blake2b(repr(values).encode(), digest_size = 8).digest()
+    return int.from_bytes(digest, "big", signed = True)
+
+
+class _HashAgg:
+    """
+    Order-independent HASH_AGG(expr, ...): the sum of the row hashes as a signed 64-bit integer.
+    """
+    def __init__(self):
+        self.total = 0
+
+    def step(self, *values):
+        self.total = (self.total + _row_hash(values)) & 0xFFFFFFFFFFFFFFFF
+
+    def finalize(self):
+        return self.total - (1 << 64) if self.total >= 1 << 63 else self.total
+
+
+class OfflineQueryHistory:
+    def __init__(self, session):
+        self.session = session
+        self.queries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self in self.session._listeners:
+            self.session._listeners.remove(self)
+
+
+class OfflineWriter:
+    def __init__(self, df):
+        self._df = df
+
+    def save_as_table(self, table_name, mode="errorifexists", table_type="", **kwargs):
+        self._df.session._write_frame(self._df.to_pandas(), table_name, mode, table_type)
+
+
+class OfflineGroupBy:
+    def __init__(self, df, columns):
+        self._df = df
+        self._columns = columns
+
+    def agg(self, *exprs):
+        params = list(self._df.params)
+        keys = ", ".join(_expr_sql(c, params) for c in self._columns)
+        aggs = ", ".join(_expr_sql(e, params) for e in exprs)
+        select = ", ".join(part for part in (keys, aggs) if part)
+        query = f"SELECT {select} FROM ({self._df.query})"
+        if keys:
+            query += f" GROUP BY {keys}"
+        return OfflineDataFrame(self._df.session, query, params)
+
+
+class OfflineDataFrame:
+    """
+    A lazy query, run when its rows are asked for.
+    """
+    def __init__(self, session, query, params=()):
+        self.session = session
+        self.query = query
+        self.params = list(params or [])
+
+    @property
+    def columns(self):
+        cursor = self.session._execute(f"SELECT * FROM ({self.query}) LIMIT 0", self.params, record = False)
+        return [d[0].upper() for d in cursor.description]
+
+    @property
+    def write(self):
+        return OfflineWriter(self)
+
+    def filter(self, condition):
+        params = list(self.params)
+        where = _expr_sql(condition, params)
+        return OfflineDataFrame(self.session, f"SELECT * FROM ({self.query}) WHERE {where}", params)
+
+    where = filter
+
+    def select(self, *columns):
+        if len(columns) == 1 and isinstance(columns[0], (list, tuple)):
+            columns = columns[0]
+        params = list(self.params)
+        select = ", ".join(_expr_sql(c, params) for c in columns)
+        return OfflineDataFrame(self.session, f"SELECT {select} FROM ({self.query})", params)
+
+    def distinct(self):
+        return OfflineDataFrame(self.session, f"SELECT DISTINCT * FROM ({self.query})", self.params)
+
+    def group_by(self, *columns):
+        if len(columns) == 1 and isinstance(columns[0], (list, tuple)):
+            columns = columns[0]
+        return OfflineGroupBy(self, columns)
+
+    def count(self):
+        return self.session._execute(f"SELECT COUNT(*) FROM ({self.query})", self.params).fetchone()[0]
+
+    def collect(self):
+        return self.session._run(self.query, self.params)
+
+    def to_pandas(self):
+        cursor = self.session._execute(self.query, self.params)
+        columns = [d[0].upper() for d in cursor.description]
+        return pd.DataFrame.from_records(cursor.fetchall(), columns = columns)
+
+    def to_pandas_batches(self):
+        cursor = self.session._execute(self.query, self.params)
+        columns = [d[0].upper() for d in cursor.description]
+        while True:
+            rows = cursor.fetchmany(BATCH_ROWS)
+            if not rows:
+                break
+            yield pd.DataFrame.from_records(rows, columns = columns)
+
+
+class OfflineFileOperation:
+    def __init__(self, session):
+        self._session = session
+
+    def get_stream(self, stage_location, decompress=False):
+        return io.BytesIO(self._session.stage_files[stage_location])
+
+
+class OfflineSession:
+    """
+    Args:
+        database (str) : SQLite path, ":memory:" for a private in-memory database
+        stage_files (dict) : Stage path -> bytes, served by file.get_stream and LIST
+    """
+    def __init__(self, database=":memory:", stage_files=None):
+        self.database = database
+        self.stage_files = dict(stage_files or {})
+        self.file = OfflineFileOperation(self)
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(database, isolation_level = None, check_same_thread = False, timeout = 60)
+        self._conn.create_function("CURRENT_WAREHOUSE", 0, lambda: OFFLINE_WAREHOUSE)
+        self._conn.create_aggregate("HASH_AGG", -1, _HashAgg)
+        if database != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        self.session_id = uuid.uuid4().hex[:8]
+
+    def close(self):
+        self._conn.close()
+
+    def query_history(self, *args, **kwargs):
+        history = OfflineQueryHistory(self)
+        self._listeners.append(history)
+        return history
+
+    def _notify(self, query):
+        if self._listeners:
+            record = QueryRecord(uuid.uuid4().hex, query, False, threading.get_ident())
+            for listener in list(self._listeners):
+                listener.queries.append(record)
+
+    def _execute(self, query, params=(), record=True):
+        if record:
+            self._notify(query)
+        with self._lock:
+            query = _CHANGE_VERSION.sub(lambda m: self._change_version(m.group(1)), query)
+            return self._conn.execute(translate(query), list(params or []))
+
+    def _change_version(self, table_name):
+        """
+        Returns:
+            str : A subquery hashing every row of the table, standing in for its change token
+        """
+        name = local_name(table_name)
+        columns = ", ".join(f'"{row[1]}"' for row in self._conn.execute(f"PRAGMA table_info({name})"))
+        return f"(SELECT HASH_AGG({columns}) FROM {name})"
+
+    def _run(self, query, params=()):
+        """
+        Runs a statement and returns its result the way Snowflake reports it.
+        """
+        stripped = query.strip().rstrip(";")
+        keyword = stripped.split(None, 1)[0].upper() if stripped else ""
+
+        if keyword == "MERGE":
+            self._notify(query)
+            return [Row(**self._merge(stripped, params))]
+        if keyword == "LIST":
+            self._notify(query)
+            return self._list(stripped.split(None, 1)[1])
+        if keyword == "CREATE" and _DYNAMIC_TABLE.match(stripped):
+            if_not_exists, name, select = _DYNAMIC_TABLE.match(stripped).groups()
+            self._execute(f"CREATE VIEW {if_not_exists or ''}{local_name(name)} AS {select}", params)
+            return [Row(status = f"Dynamic table {local_name(name)} successfully created.")]
+
+        cursor = self._execute(stripped, params)
+        if cursor.description:
+            names = [d[0].upper() for d in cursor.description]
+            return [Row(**dict(zip(names, values))) for values in cursor.fetchall()]
+        if keyword == "INSERT":
+            return [Row(**{"number of rows inserted": cursor.rowcount})]
+        if keyword == "DELETE":
+            return [Row(**{"number of rows deleted": cursor.rowcount})]
+        if keyword == "UPDATE":
+            return [Row(**{"number of rows updated": cursor.rowcount})]
+        return [Row(status = "Statement executed successfully.")]
+
+    def _merge(self, statement, params):
+        """
+        Runs a MERGE as DELETE, UPDATE and INSERT statements in one savepoint,
+        each restricted to the keys its WHEN clause applies to.
+        """
+        match = _MERGE.match(statement)
+        if match is None:
+            raise NotImplementedError("Offline session cannot parse this MERGE")
+        target, t_alias, source, s_alias, on, whens = match.groups()
+        target = local_name(target)
+        source = source if source.startswith("(") else local_name(source)
+        counts = {"number of rows inserted": 0, "number of rows updated": 0, "number of rows deleted": 0}
+
+        clauses = [(bool(nm), cond, action.strip()) for nm, cond, action in _WHEN.findall(whens)]
+        order = {"DELETE": 0, "UPDATE": 1, "INSERT": 2}
+        clauses.sort(key = lambda c: order[c[2].split(None, 1)[0].upper()])
+
+        with self._lock:
+            self._conn.execute("SAVEPOINT offline_merge")
+            try:
+                for not_matched, condition, action in clauses:
+                    extra = f" AND ({condition})" if condition else ""
+                    verb = action.split(None, 1)[0].upper()
+                    if verb == "DELETE":
+                        sql = (f"DELETE FROM {target} WHERE rowid IN (SELECT {t_alias}.rowid "
+                               f"FROM {source} AS {s_alias} JOIN {target} AS {t_alias} ON {on}{extra})")
+                        counts["number of rows deleted"] += self._conn.execute(translate(sql), params).rowcount
+                    elif verb == "UPDATE":
+                        assignments = re.sub(r"^UPDATE\s+SET\s+", "", action, flags = re.IGNORECASE)
+                        sql = (f"UPDATE {target} AS {t_alias} SET {assignments} "
+                               f"FROM {source} AS {s_alias} WHERE {on}{extra}")
+                        counts["number of rows updated"] += self._conn.execute(translate(sql), params).rowcount
+                    else:
+                        insert = re.match(r"INSERT\s*\((.+?)\)\s*VALUES\s*\((.+)\)", action, re.IGNORECASE | re.DOTALL)
+                        columns, values = insert.groups()
+                        sql = (f"INSERT INTO {target} ({columns}) SELECT {values} FROM {source} AS {s_alias} "
+                               f"WHERE NOT EXISTS (SELECT 1 FROM {target} AS {t_alias} WHERE {on}){extra}")
+                        counts["number of rows inserted"] += self._conn.execute(translate(sql), params).rowcount
+                self._conn.execute("RELEASE offline_merge")
+            except Exception:
+                self._conn.execute("ROLLBACK TO offline_merge")
+                self._conn.execute("RELEASE offline_merge")
+                raise
+        return counts
+
+    def _list(self, location):
+        location = location.strip()
+        rows = []
+        for path, content in self.stage_files.items():
+            if path == location or path.startswith(location.rstrip("/") + "/"):
+                rows.append(Row(
+                    name = path.lstrip("@"),
+                    size = len(content),
+                    md5 = hashlib.md5(content).hexdigest(),
+                    last_modified = "Thu, 1 Jan 2026 00:00:00 GMT",
+                ))
+        return rows
+
+    def _write_frame(self, pdf, table_name, mode="overwrite", table_type=""):
+        name = local_name(table_name)
+        temporary = "TEMP " if str(table_type).lower() in ("temp", "temporary") else ""
+        column_defs = ", ".join(f'"{str(c).upper()}" {_sqlite_type(pdf[c].dtype)}' for c in pdf.columns)
+        placeholders = ", ".join(["?"] * len(pdf.columns))
+        self._notify(f"-- write {len(pdf)} rows to {name} ({mode})")
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ? UNION ALL SELECT 1 FROM sqlite_temp_master WHERE name = ?",
+                [name, name],
+            ).fetchone()
+            if exists and mode in ("errorifexists", "error"):
+                raise ValueError(f"Table {name} already exists")
+            if exists and mode == "ignore":
+                return
+            if mode == "overwrite":
+                self._conn.execute(f"DROP TABLE IF EXISTS {name}")
+                exists = None
+            self._conn.execute("SAVEPOINT offline_write")
+            try:
+                if not exists:
+                    self._conn.execute(f"CREATE {temporary}TABLE {name} ({column_defs})")
+                columns = ", ".join(f'"{str(c).upper()}"' for c in pdf.columns)
+                self._conn.executemany(f"INSERT INTO {name} ({columns}) VALUES ({placeholders})", _rows_of(pdf))
+                self._conn.execute("RELEASE offline_write")
+            except Exception:
+                self._conn.execute("ROLLBACK TO offline_write")
+                self._conn.execute("RELEASE offline_write")
+                raise
+
+    def table(self, name):
+        return OfflineDataFrame(self, f"SELECT * FROM {local_name(name)}")
+
+    def sql(self, query, params=None):
+        return OfflineDataFrame(self, query, params)
+
+    def create_dataframe(self, data, schema=None):
+        pdf = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data, columns = schema)
+        return OfflinePandasFrame(self, pdf)
+
+    def write_pandas(self, pdf, table_name, auto_create_table=False, table_type="", overwrite=False, **kwargs):
+        self._write_frame(pdf, table_name, "overwrite" if overwrite else "append", table_type)
+        return self.table(table_name)
+
+    def load_table(self, table_name, pdf, key_cols=None):
+        """
+        Creates or replaces a table from a pandas frame, for setting up fixtures.
+
+        Args:
+            key_cols (list) : Columns to index, standing in for Snowflake's pruning on keyed lookups
+        """
+        self._write_frame(pdf, table_name, "overwrite")
+        if key_cols:
+            name = local_name(table_name)
+            with self._lock:
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name}_KEY ON {name} ({', '.join(key_cols)})")
+
+    def copy_table(self, source, target, key_cols=None):
+        """
+        Replaces target with a copy of source, to reset a fixture between runs.
+        """
+        source, target = local_name(source), local_name(target)
+        with self._lock:
+            self._conn.execute(f"DROP TABLE IF EXISTS {target}")
+            self._conn.execute(f"CREATE TABLE {target} AS SELECT * FROM {source}")
+            if key_cols:
+                self._conn.execute(f"CREATE INDEX {target}_KEY ON {target} ({', '.join(key_cols)})")
+
+
+class OfflinePandasFrame(OfflineDataFrame):
+    """
+    The result of create_dataframe: a local pandas frame that can be written to a table.
+    """
+    def __init__(self, session, pdf):
+        super().__init__(session, None)
+        self._pdf = pdf
+
+    def to_pandas(self):
+        return self._pdf
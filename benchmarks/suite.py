@@ -0,0 +1,216 @@
+"""
+Benchmark suite for the app's hot paths, run against the offline session.
+
+Cases:
+    preview_diff   compute_change_set between the loaded SALES frame and a 1% edit
+    merge_save     save_change_set of that change set into SALES
+    csv_append     stream_csv_to_stage of a CSV holding 10% new rows, then the INSERT from the stage
+    dropdown_save  write_dropdown_options with 10% of the options replaced
+    dashboard      the dashboard query (unfiltered and filtered), the filter options and the local derivations
+    validate       validate of a CSV-sized frame of new rows against the dropdown options and the SALES keys
+
+Each case is timed best-of-N, with setup outside the timer. Results are compared
+with benchmarks/baselines.json and a case fails when it is slower than its
+baseline by more than the tolerance. Baselines are machine specific; refresh them
+with --update-baselines after a deliberate change or on new hardware.
+
+Usage:
+    python -m benchmarks.suite [--sizes 10000 100000 1000000] [--cases merge_save ...]
+                               [--repeats 3] [--tolerance 0.5] [--update-baselines]
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.offline_session import OfflineSession
+from benchmarks.synthetic import make_dropdown_frame, make_edited_frame, make_sales_frame, make_vgsales_frame
+from change_set import compute_change_set
+from constants import DROPDOWN_TABLE, PK_COLS, SALES_TABLE, VGSALES_TABLE
+from csv_ingest import stream_csv_to_stage
+from dashboard_data import fetch_yearly_region_sales, sales_totals, yearly_sales
+from dropdown_options import group_dropdown_options, write_dropdown_options
+from pk_index import PrimaryKeyIndex
+from sales_frame import key_categories, to_compact_frame
+from sales_save import insert_staged_rows, save_change_set
+from validation import validate
+from vgsales_rollup import _fetch_filter_options
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_TOLERANCE = 0.5
+NOISE_FLOOR_SECONDS = 0.005
+
+SALES_BASE = "SALES_BASE"
+
+
+def _best_of(repeats, run, setup=None):
+    best = float("inf")
+    for _ in range(repeats):
+        context = setup() if setup else None
+        start = time.perf_counter()
+        run(context)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class Fixture:
+    """
+    Synthetic SALES, DROPDOWN_OPTIONS and VGSALES of one size, loaded into an offline session.
+    """
+    def __init__(self, n_rows):
+        self.n_rows = n_rows
+        self.sales = make_sales_frame(n_rows)
+        self.edited = make_edited_frame(self.sales, 0.01)
+        self.dropdown = make_dropdown_frame(self.sales)
+        self.vgsales = make_vgsales_frame(n_rows)
+
+        self.session = OfflineSession()
+        self.session.load_table(SALES_BASE, self.sales, PK_COLS)
+        self.session.load_table(DROPDOWN_TABLE, self.dropdown)
+        self.session.load_table(VGSALES_TABLE, self.vgsales)
+
+    def reset_sales(self):
+        self.session.copy_table(SALES_BASE, SALES_TABLE, PK_COLS)
+
+
+def bench_preview_diff(fixture, repeats):
+    categories = key_categories(fixture.dropdown)
+    original = to_compact_frame(fixture.sales, categories)
+    edited = to_compact_frame(fixture.edited, categories)
+    return _best_of(repeats, lambda _: compute_change_set(original, edited))
+
+
+def bench_merge_save(fixture, repeats):
+    change_set = compute_change_set(fixture.sales, fixture.edited)
+    return _best_of(
+        repeats,
+        lambda _: save_change_set(fixture.session, change_set),
+        setup = fixture.reset_sales,
+    )
+
+
+def bench_csv_append(fixture, repeats):
+    new_rows = make_sales_frame(max(1, fixture.n_rows // 10), seed = 7)
+    new_rows["PRODUCT"] = "CSV-" + new_rows["PRODUCT"]
+    csv_bytes = new_rows.to_csv(index = False).encode()
+    existing_keys = PrimaryKeyIndex.from_frame(fixture.sales)
+
+    def run(_):
+        result = stream_csv_to_stage(fixture.session, io.BytesIO(csv_bytes), list(fixture.sales.columns), existing_keys)
+        insert_staged_rows(fixture.session, result["stage_table"])
+
+    return _best_of(repeats, run, setup = fixture.reset_sales)
+
+
+def bench_dropdown_save(fixture, repeats):
+    old = fixture.dropdown
+    n_changes = max(1, len(old) // 10)
+    added = old.iloc[:n_changes].copy()
+    added["VALUE"] = "NEW-" + added["VALUE"]
+    new = pd.concat([old.iloc[n_changes:], added], ignore_index = True)
+
+    def setup():
+        fixture.session.load_table(DROPDOWN_TABLE, old)
+
+    return _best_of(repeats, lambda _: write_dropdown_options(fixture.session, old, new), setup = setup)
+
+
+def bench_dashboard(fixture, repeats):
+    def run(_):
+        for genre, platform in (("All", "All"), ("Action", "All"), ("Sports", "Wii")):
+            yearly_df = fetch_yearly_region_sales(fixture.session, genre, platform)
+            sales_totals(yearly_df)
+            yearly_sales(yearly_df)
+        _fetch_filter_options(fixture.session, VGSALES_TABLE)
+
+    return _best_of(repeats, run)
+
+
+def bench_validate(fixture, repeats):
+    new_rows = make_sales_frame(fixture.n_rows, seed = 7)
+    new_rows["PRODUCT"] = "CSV-" + new_rows["PRODUCT"]
+    new_rows = pd.read_csv(io.StringIO(new_rows.to_csv(index = False)))
+    options = group_dropdown_options(pd.concat([fixture.dropdown, make_dropdown_frame(new_rows)])).options
+    existing_keys = PrimaryKeyIndex.from_frame(fixture.sales)
+    return _best_of(repeats, lambda _: validate(new_rows, options, existing_keys))
+
+
+CASES = {
+    "preview_diff": bench_preview_diff,
+    "merge_save": bench_merge_save,
+    "csv_append": bench_csv_append,
+    "dropdown_save": bench_dropdown_save,
+    "dashboard": bench_dashboard,
+    "validate": bench_validate,
+}
+
+
+def load_baselines(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(baselines, path=BASELINE_PATH):
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent = 2, sort_keys = True)
+        f.write("\n")
+
+
+def run(sizes, cases, repeats, tolerance, update_baselines):
+    """
+    Runs the selected cases at each size and compares them with the stored baselines.
+
+    Returns:
+        int : The number of regressions
+    """
+    baselines = load_baselines()
+    regressions = 0
+
+    print(f"{'case':<14} {'rows':>10} {'seconds':>9} {'baseline':>9} {'ratio':>6}")
+    for n_rows in sizes:
+        fixture = Fixture(n_rows)
+        for name in cases:
+            elapsed = CASES[name](fixture, repeats)
+            baseline = baselines.get(name, {}).get(str(n_rows))
+
+            status = ""
+            ratio = ""
+            if baseline is not None:
+                ratio = f"{elapsed / baseline:6.2f}"
+                if elapsed > baseline * (1 + tolerance) and elapsed - baseline > NOISE_FLOOR_SECONDS:
+                    status = "REGRESSION"
+                    regressions += 1
+            baseline_text = f"{baseline:9.4f}" if baseline is not None else f"{'-':>9}"
+            print(f"{name:<14} {n_rows:>10,} {elapsed:9.4f} {baseline_text} {ratio:>6} {status}")
+
+            if update_baselines:
+                baselines.setdefault(name, {})[str(n_rows)] = round(elapsed, 4)
+        fixture.session.close()
+
+    if update_baselines:
+        save_baselines(baselines)
+        print(f"Baselines written to {BASELINE_PATH}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown over the baseline, 0.5 = 50%%")
+    parser.add_argument("--update-baselines", action="store_true")
+    args = parser.parse_args()
+
+    failed = run(args.sizes, args.cases, args.repeats, args.tolerance, args.update_baselines)
+    if failed and not args.update_baselines:
+        print(f"{failed} case(s) slower than baseline by more than {args.tolerance:.0%}")
+        sys.exit(1)
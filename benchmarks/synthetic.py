@@ -0,0 +1,97 @@
+"""
+Synthetic SALES data for the benchmarks. Keys are derived from the row number so
+every generated frame has unique (METRIC, FORECAST, PRODUCT, YEAR) combinations.
+"""
+import numpy as np
+import pandas as pd
+
+from constants import PK_COLS, MONTH_COLS
+
+
+def make_sales_frame(n_rows, seed=0):
+    """
+    Args:
+        n_rows (int) : Number of rows to generate
+        seed (int) : Seed for the month values
+
+    Returns:
+        pd.DataFrame : A frame shaped like SALES
+    """
+    rng = np.random.default_rng(seed)
+    i = np.arange(n_rows)
+    df = pd.DataFrame({
+        "METRIC": np.where(i % 2 == 0, "Units", "Sales"),
+        "FORECAST": pd.Series((i // 20) % 50).map(lambda f: f"2025-F{f // 10}-V{f % 10}").to_numpy(),
+        "PRODUCT": pd.Series(i // 1000).map(lambda p: f"P{p}").to_numpy(),
+        "YEAR": (2020 + (i // 2) % 10).astype(str),
+    })
+    values = rng.integers(0, 1000, size=(n_rows, len(MONTH_COLS))).astype(float)
+    for j, month in enumerate(MONTH_COLS):
+        df[month] = values[:, j]
+    return df[PK_COLS + MONTH_COLS]
+
+
+def make_edited_frame(original_df, edit_fraction=0.01, seed=1):
+    """
+    Applies a realistic mix of cell edits, deletions and new rows to a copy of original_df.
+
+    Returns:
+        pd.DataFrame : The edited frame
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = len(original_df)
+    n_changes = max(1, int(n_rows * edit_fraction))
+
+    edited = original_df.copy()
+    touched = rng.choice(n_rows, size=n_changes, replace=False)
+    edit_rows = touched[: n_changes // 2]
+    drop_rows = touched[n_changes // 2:]
+
+    month_idx = rng.integers(0, len(MONTH_COLS), size=len(edit_rows))
+    for month_pos in np.unique(month_idx):
+        rows = edit_rows[month_idx == month_pos]
+        edited.iloc[rows, len(PK_COLS) + month_pos] += 1
+
+    edited = edited.drop(index=edited.index[drop_rows])
+
+    added = make_sales_frame(n_changes // 2, seed=seed)
+    added["PRODUCT"] = "NEW-" + added["PRODUCT"]
+    return pd.concat([edited, added], ignore_index=True)
+
+
+GENRES = ["Action", "Adventure", "Fighting", "Misc", "Platform", "Puzzle", "Racing", "Role-Playing", "Shooter", "Simulation", "Sports", "Strategy"]
+PLATFORMS = ["DS", "GB", "GBA", "GC", "N64", "NES", "PC", "PS", "PS2", "PS3", "PS4", "PSP", "SNES", "Wii", "X360", "XB", "XOne"]
+
+
+def make_vgsales_frame(n_rows, seed=0):
+    """
+    Returns:
+        pd.DataFrame : A frame shaped like VGSALES, with upper-case column names
+    """
+    rng = np.random.default_rng(seed)
+    regions = rng.gamma(0.5, 0.4, size=(n_rows, 4)).round(2)
+    return pd.DataFrame({
+        "RANK": np.arange(1, n_rows + 1),
+        "NAME": pd.Series(np.arange(n_rows)).map(lambda i: f"Game {i}").to_numpy(),
+        "PLATFORM": rng.choice(PLATFORMS, size=n_rows),
+        "YEAR": rng.integers(1980, 2021, size=n_rows),
+        "GENRE": rng.choice(GENRES, size=n_rows),
+        "PUBLISHER": rng.choice([f"Publisher {p}" for p in range(200)], size=n_rows),
+        "NA_SALES": regions[:, 0],
+        "EU_SALES": regions[:, 1],
+        "JP_SALES": regions[:, 2],
+        "OTHER_SALES": regions[:, 3],
+        "GLOBAL_SALES": regions.sum(axis=1).round(2),
+    })
+
+
+def make_dropdown_frame(sales_df):
+    """
+    Returns:
+        pd.DataFrame : DROPDOWN_OPTIONS rows holding every key value of sales_df
+    """
+    parts = [
+        pd.DataFrame({"COLUMN_NAME": c, "VALUE": sorted(sales_df[c].astype(str).unique())})
+        for c in PK_COLS
+    ]
+    return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,187 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from constants import PK_COLS
+
+_ORIG_SUFFIX = "__orig"
+
+
+@dataclass(frozen=True)
+class ChangeSet:
+    """
+    Differences between a baseline SALES frame and an edited copy of it.
+
+    Attributes:
+        added (pd.DataFrame) : Rows whose key only exists in the edited frame
+        removed (pd.DataFrame) : Rows whose key only exists in the baseline frame
+        updated (pd.DataFrame) : Edited version of rows whose values changed
+        updated_before (pd.DataFrame) : Baseline version of the same rows, in the same order
+        cell_diffs (pd.DataFrame) : One row per changed cell with the key columns, COLUMN, OLD_VALUE and NEW_VALUE
+    """
+    added: pd.DataFrame
+    removed: pd.DataFrame
+    updated: pd.DataFrame
+    updated_before: pd.DataFrame
+    cell_diffs: pd.DataFrame
+
+    @property
+    def is_empty(self):
+        return self.added.empty and self.removed.empty and self.updated.empty
+
+    def summary(self):
+        """
+        Returns:
+            dict : Row counts per change type plus the number of changed cells
+        """
+        return {
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "updated": len(self.updated),
+            "cells": len(self.cell_diffs),
+        }
+
+
+def normalize_keys(df, pk_cols=PK_COLS):
+    """
+    Returns a shallow copy of df with the key columns cast to stripped strings,
+    the same normalisation the preview has always applied before comparing keys.
+    """
+    df = df.copy(deep=False)
+    for col_name in pk_cols:
+        df[col_name] = df[col_name].astype(str).str.strip()
+    return df
+
+
+def key_tuples(df, pk_cols=PK_COLS):
+    """
+    Returns:
+        list : The normalised key tuple of every row of df, used as row identities
+    """
+    keys = normalize_keys(df[pk_cols], pk_cols)
+    # Zipping the NumPy arrays rather than the Series avoids a per-element Series iteration
+    return list(zip(*(keys[c].to_numpy() for c in pk_cols)))
+
+
+def key_index(df, pk_cols=PK_COLS):
+    """
+    Returns:
+        pd.MultiIndex : The normalised keys of df, by row position
+    """
+    return pd.MultiIndex.from_frame(normalize_keys(df[pk_cols], pk_cols))
+
+
+def rows_for_keys(df, keys, index=None, pk_cols=PK_COLS):
+    """
+    Looks up the rows of df with the given keys. Keys missing from df are skipped.
+
+    Args:
+        df (pd.DataFrame) : Rows with unique keys
+        keys (list) : Normalised key tuples
+        index (pd.MultiIndex) : key_index(df), when it is kept between lookups
+
+    Returns:
+        pd.DataFrame : The matching rows of df, in the order of keys
+    """
+    if not len(keys):
+        return df.iloc[:0]
+    index = key_index(df, pk_cols) if index is None else index
+    positions = index.get_indexer(pd.MultiIndex.from_tuples(list(keys), names = pk_cols))
+    return df.iloc[positions[positions >= 0]]
+
+
+def _values_differ(new, old):
+    """
+    NaN-aware element-wise inequality: two missing values count as equal.
+    """
+    new_missing = pd.isna(new)
+    old_missing = pd.isna(old)
+    with np.errstate(invalid="ignore"):
+        equal = np.asarray(new == old, dtype=bool)
+    return ~(equal | (new_missing & old_missing))
+
+
+def compute_change_set(original_df, edited_df, pk_cols=PK_COLS):
+    """
+    Compares two SALES frames with a single keyed join instead of a per-key scan.
+
+    Both frames are expected to hold unique keys, which the editor already enforces.
+
+    Args:
+        original_df (pd.DataFrame) : The baseline rows, as loaded from SALES
+        edited_df (pd.DataFrame) : The rows as they currently stand in the editor
+        pk_cols (list) : The columns that together identify a row
+
+    Returns:
+        ChangeSet : Added, removed and updated rows plus the per-cell differences
+    """
+    original_df = normalize_keys(original_df, pk_cols)
+    edited_df = normalize_keys(edited_df, pk_cols)
+
+    value_cols = [c for c in edited_df.columns if c not in pk_cols and c in original_df.columns]
+
+    if original_df.empty and edited_df.empty:
+        # pandas cannot merge two empty string key columns, and there is nothing to compare
+        before_cols = [c for c in original_df.columns if c in pk_cols or c in value_cols]
+        return ChangeSet(
+            added = edited_df.reset_index(drop=True),
+            removed = original_df.reset_index(drop=True),
+            updated = edited_df.reset_index(drop=True),
+            updated_before = original_df[before_cols].reset_index(drop=True),
+            cell_diffs = pd.DataFrame(columns = pk_cols + ["COLUMN", "OLD_VALUE", "NEW_VALUE"]),
+        )
+
+    merged = edited_df.merge(
+        original_df,
+        on = pk_cols,
+        how = "outer",
+        suffixes = ("", _ORIG_SUFFIX),
+        indicator = True,
+        sort = False,
+    )
+    side = merged["_merge"]
+
+    added = merged.loc[side == "left_only", list(edited_df.columns)]
+
+    removed = merged.loc[side == "right_only"].drop(columns = value_cols)
+    removed = removed.rename(columns = {f"{c}{_ORIG_SUFFIX}": c for c in value_cols})
+    removed = removed[list(original_df.columns)]
+
+    both = merged.loc[side == "both"]
+    if value_cols and not both.empty:
+        changed = np.column_stack([
+            _values_differ(both[c].to_numpy(), both[f"{c}{_ORIG_SUFFIX}"].to_numpy())
+            for c in value_cols
+        ])
+    else:
+        changed = np.zeros((len(both), len(value_cols)), dtype=bool)
+
+    row_changed = changed.any(axis=1)
+    changed_rows = both.loc[row_changed]
+
+    updated = changed_rows[list(edited_df.columns)]
+    updated_before = changed_rows[pk_cols + [f"{c}{_ORIG_SUFFIX}" for c in value_cols]]
+    updated_before = updated_before.rename(columns = {f"{c}{_ORIG_SUFFIX}": c for c in value_cols})
+    updated_before = updated_before[[c for c in original_df.columns if c in updated_before.columns]]
+
+    row_pos, col_pos = np.nonzero(changed[row_changed])
+    old_values = np.empty(len(row_pos), dtype=object)
+    new_values = np.empty(len(row_pos), dtype=object)
+    for j, c in enumerate(value_cols):
+        in_col = col_pos == j
+        old_values[in_col] = changed_rows[f"{c}{_ORIG_SUFFIX}"].to_numpy()[row_pos[in_col]]
+        new_values[in_col] = changed_rows[c].to_numpy()[row_pos[in_col]]
+
+    cell_diffs = changed_rows.iloc[row_pos][pk_cols].reset_index(drop=True)
+    cell_diffs["COLUMN"] = np.asarray(value_cols, dtype=object)[col_pos]
+    cell_diffs["OLD_VALUE"] = old_values
+    cell_diffs["NEW_VALUE"] = new_values
+
+    return ChangeSet(
+        added = added.reset_index(drop=True),
+        removed = removed.reset_index(drop=True),
+        updated = updated.reset_index(drop=True),
+        updated_before = updated_before.reset_index(drop=True),
+        cell_diffs = cell_diffs,
+    )
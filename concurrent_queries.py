@@ -0,0 +1,143 @@
+"""
+Runs independent reads of a rerun (dashboard aggregate, filter options, logo) at
+the same time, so the rerun waits for the slowest read instead of their sum.
+
+Every session shares one process-wide pool of QUERY_WORKERS threads, so the
+number of reads running against the warehouse stays bounded however many
+sessions rerun at once; reads beyond that wait in the pool's queue. A read that
+times out is abandoned and keeps its worker until its query returns.
+
+Worker threads get the script run context and the perf trace of the calling
+thread, so st.cache_resource, session state and spans behave as in the script.
+
+SingleFlight collapses concurrent calls for the same key into one, so a rerun
+asking for data the background prefetch is already loading waits for that load.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from perf_trace import attach_trace, current_trace, span
+
+QUERY_WORKERS = 16
+DEFAULT_TIMEOUT_SECONDS = 30
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+@st.cache_resource
+def get_query_pool():
+    """
+    Returns:
+        ThreadPoolExecutor : The process-wide pool running the concurrent reads of every session
+    """
+    return ThreadPoolExecutor(max_workers = QUERY_WORKERS, thread_name_prefix = "app-query")
+
+
+def _in_script_context(func, ctx, trace, name):
+    def run():
+        add_script_run_ctx(ctx = ctx)
+        attach_trace(trace)
+        try:
+            with span(f"concurrent.{name}"):
+                return func()
+        finally:
+            attach_trace(None)
+    return run
+
+
+def run_concurrently(tasks, timeout=DEFAULT_TIMEOUT_SECONDS, pool=None):
+    """
+    Submits every task at once and waits for all of them.
+
+    Args:
+        tasks (dict) : Name -> callable, or name -> (callable, timeout in seconds)
+        timeout (float) : Timeout of the tasks that do not set their own, counted from submission,
+            so time spent queued behind other sessions' reads counts too
+        pool (ThreadPoolExecutor) : Defaults to the shared pool of get_query_pool
+
+    Returns:
+        tuple : (name -> result of the tasks that finished, name -> exception of those that failed or timed out)
+    """
+    pool = pool or get_query_pool()
+    ctx = get_script_run_ctx()
+    trace = current_trace()
+
+    submitted_at = time.monotonic()
+    futures = {}
+    for name, task in tasks.items():
+        func, task_timeout = task if isinstance(task, tuple) else (task, timeout)
+        futures[name] = (pool.submit(_in_script_context(func, ctx, trace, name)), task_timeout)
+
+    results = {}
+    errors = {}
+    for name, (future, task_timeout) in futures.items():
+        remaining = max(0.0, task_timeout - (time.monotonic() - submitted_at))
+        try:
+            results[name] = future.result(timeout = remaining)
+        except FutureTimeoutError:
+            # Drops the read if it is still queued; a running one finishes in the background
+            future.cancel()
+            errors[name] = QueryTimeout(f"{name} did not finish within {task_timeout:g}s")
+        except Exception as e:
+            errors[name] = e
+    return results, errors
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls by key: the first caller runs the function and
+    every caller that arrives while it runs waits for and shares its result,
+    instead of issuing the same query again.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._flights
+
+    def do(self, key, func):
+        """
+        Args:
+            key (hashable) : Identifies the call
+            func (callable) : Runs the call, only in the first caller
+
+        Returns:
+            tuple : (result, True if it was shared from another caller's run)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, True
+
+        try:
+            flight.value = func()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.value, False
@@ -0,0 +1,16 @@
+"""
+Shared table names and column layouts for the SALES editor and dashboard.
+"""
+
+DATABASE_SCHEMA = "DEMO_STREAMLIT_APP.PUBLIC"
+
+SALES_TABLE = f"{DATABASE_SCHEMA}.SALES"
+DROPDOWN_TABLE = f"{DATABASE_SCHEMA}.DROPDOWN_OPTIONS"
+VGSALES_TABLE = f"{DATABASE_SCHEMA}.VGSALES"
+
+LOGO_PATH = f"@{DATABASE_SCHEMA}.ASSETS/l1.jpg"
+
+PK_COLS = ["METRIC", "FORECAST", "PRODUCT", "YEAR"]
+MONTH_COLS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+REGION_COLS = ["NA_SALES", "EU_SALES", "JP_SALES", "OTHER_SALES", "GLOBAL_SALES"]
@@ -0,0 +1,157 @@
+"""
+Streaming CSV ingest for the Append CSV dialog.
+
+The upload is read in chunks. The header is normalised and validated once, each
+chunk is run through the validation rules, with keys checked against a key index
+and the earlier chunks, and accepted rows are written straight to a temporary
+staging table. Only one chunk and the key index are held in memory at a time,
+whatever the file size.
+"""
+import uuid
+
+import pandas as pd
+
+from constants import PK_COLS, SALES_TABLE
+from change_set import key_tuples
+from perf_trace import traced
+from validation import validate
+
+DEFAULT_CHUNK_ROWS = 50_000
+STREAMING_THRESHOLD_BYTES = 20 * 1024 * 1024
+MAX_REJECTED_SAMPLE = 100
+
+
+class _ChunkKeys:
+    """
+    Keys the next chunk must not reuse: those of the earlier chunks plus the existing and pending keys.
+    """
+    def __init__(self, existing_keys, pending_keys=None):
+        self.seen = set()
+        self.others = [keys for keys in (existing_keys, pending_keys) if keys is not None]
+
+    def __contains__(self, key):
+        return key in self.seen or any(key in keys for keys in self.others)
+
+
+def _failure(error, rejected=0, rejected_sample=None):
+    return {"stage_table": None, "accepted": 0, "rejected": rejected, "keys": set(),
+            "rejected_sample": rejected_sample, "violations": None, "error": error}
+
+
+def normalize_header(columns):
+    """
+    Returns:
+        list : Column names stripped and upper-cased, "Forecast " -> "FORECAST"
+    """
+    return [str(c).strip().upper() for c in columns]
+
+
+def header_mismatch(columns, expected_columns):
+    """
+    Returns:
+        str : A description of the mismatch, None when the header matches
+    """
+    missing = [c for c in expected_columns if c not in columns]
+    unexpected = [c for c in columns if c not in expected_columns]
+    if not missing and not unexpected:
+        return None
+    return f"Missing columns: {missing}. Unexpected columns: {unexpected}."
+
+
+@traced("csv.stream_to_stage")
+def stream_csv_to_stage(session, file, expected_columns, existing_keys=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                        progress_callback=None, pk_cols=PK_COLS, dropdown_options=None, pending_keys=None):
+    """
+    Reads a CSV in chunks, validates them and writes the valid rows to a temporary staging table.
+
+    Args:
+        session (Session) : The active Snowpark session
+        file (file-like) : The uploaded CSV
+        expected_columns (list) : The SALES columns, upper case
+        existing_keys (container) : Keys already in the table being edited, a set or a key index overlay;
+            None to check against SALES in the warehouse
+        chunk_rows (int) : Rows read per chunk
+        progress_callback (callable) : Optional f(fraction, text) called after each chunk
+        dropdown_options (dict) : Column name -> allowed key values, None to skip the dropdown check
+        pending_keys (container) : Keys of unsaved rows outside existing_keys (earlier staged uploads,
+            journaled rows) that must not be reused either
+
+    Returns:
+        dict : stage_table, accepted and rejected counts, the set of staged keys, a sample of rejected
+            rows and of their violations, and an error message or None. stage_table is None when
+            nothing was staged, e.g. for a file with a header and no rows
+    """
+    total_bytes = getattr(file, "size", None)
+    stage_table = f"CSV_UPLOAD_STAGE_{uuid.uuid4().hex[:8].upper()}"
+    chunk_keys = _ChunkKeys(existing_keys, pending_keys)
+    accepted = 0
+    rejected = 0
+    rejected_sample = []
+    violations = []
+
+    try:
+        chunks = pd.read_csv(file, chunksize = chunk_rows)
+    except pd.errors.EmptyDataError:
+        return _failure("The file is empty.")
+
+    for i, chunk in enumerate(chunks):
+        chunk.columns = normalize_header(chunk.columns)
+        if i == 0:
+            error = header_mismatch(list(chunk.columns), expected_columns)
+            if error:
+                return _failure(error)
+        chunk = chunk[expected_columns]
+
+        report = validate(chunk, dropdown_options, chunk_keys, pk_cols = pk_cols)
+        collides = chunk.index.isin(report.invalid_rows())
+        chunk_keys.seen.update(key_tuples(chunk[~collides], pk_cols))
+
+        if collides.any():
+            rejected += int(collides.sum())
+            if len(rejected_sample) < MAX_REJECTED_SAMPLE:
+                rejected_sample.append(chunk[collides].head(MAX_REJECTED_SAMPLE - len(rejected_sample)))
+            if sum(len(v) for v in violations) < MAX_REJECTED_SAMPLE:
+                violations.append(report.violations.head(MAX_REJECTED_SAMPLE))
+
+        good = chunk[~collides]
+        if not good.empty:
+            session.write_pandas(
+                good.reset_index(drop=True),
+                stage_table,
+                auto_create_table = True,
+                table_type = "temporary",
+                overwrite = accepted == 0,
+            )
+            accepted += len(good)
+
+        if progress_callback:
+            fraction = min(file.tell() / total_bytes, 1.0) if total_bytes else 0.0
+            progress_callback(fraction, f"Read {accepted + rejected:,} rows, {rejected:,} rejected")
+
+    if accepted and existing_keys is None:
+        stored = stored_key_collisions(session, stage_table, pk_cols)
+        if not stored.empty:
+            session.sql(f"DROP TABLE IF EXISTS {stage_table}").collect()
+            return _failure("Some uploaded keys already exist in SALES.", rejected + len(stored),
+                            stored.head(MAX_REJECTED_SAMPLE))
+
+    return {
+        "stage_table": stage_table if accepted else None,
+        "accepted": accepted,
+        "rejected": rejected,
+        "keys": chunk_keys.seen,
+        "rejected_sample": pd.concat(rejected_sample, ignore_index = True) if rejected_sample else None,
+        "violations": pd.concat(violations, ignore_index = True).head(MAX_REJECTED_SAMPLE) if violations else None,
+        "error": None,
+    }
+
+
+def stored_key_collisions(session, stage_table, pk_cols=PK_COLS, limit=MAX_REJECTED_SAMPLE):
+    """
+    Returns:
+        pd.DataFrame : Staged rows whose key already exists in SALES, at most limit rows
+    """
+    condition = " AND ".join([f"s.{c} = t.{c}" for c in pk_cols])
+    return session.sql(
+        f"SELECT s.* FROM {stage_table} AS s JOIN {SALES_TABLE} AS t ON {condition} LIMIT {int(limit)}"
+    ).to_pandas()
@@ -0,0 +1,80 @@
+"""
+Data layer for the Dashboard page. VGSALES (or its rollup) is aggregated once per
+YEAR on the warehouse side and every chart and metric is derived locally from that result.
+"""
+import pandas as pd
+from snowflake.snowpark.functions import col, sum as ssum
+
+from constants import REGION_COLS, VGSALES_TABLE
+from perf_trace import span
+from query_cache import cached_query
+from vgsales_rollup import dashboard_source
+
+
+def fetch_yearly_region_sales(session, genre="All", platform="All", source=VGSALES_TABLE):
+    """
+    Runs the single dashboard query: summed region sales per YEAR.
+
+    Args:
+        session (Session) : The active Snowpark session
+        genre (str) : Genre filter, "All" for no filter
+        platform (str) : Platform filter, "All" for no filter
+        source (str) : VGSALES or its rollup, both have the same region columns
+
+    Returns:
+        pd.DataFrame : One row per YEAR with a column per region
+    """
+    sp_df = session.table(source)
+    if genre != "All":
+        sp_df = sp_df.filter(col("Genre") == genre)
+    if platform != "All":
+        sp_df = sp_df.filter(col("Platform") == platform)
+
+    with span("dashboard.yearly_region_sales", source = source):
+        return (
+            sp_df.group_by("YEAR")
+            .agg(*[ssum(col(c)).alias(c) for c in REGION_COLS])
+            .to_pandas()
+        )
+
+
+def load_yearly_region_sales(session, genre="All", platform="All"):
+    """
+    Cached version of fetch_yearly_region_sales, answered from the rollup when it exists.
+    """
+    source = dashboard_source(session)
+    return cached_query(
+        session,
+        [VGSALES_TABLE, source],
+        ("yearly_region_sales", source, genre, platform),
+        lambda: fetch_yearly_region_sales(session, genre, platform, source),
+    )
+
+
+def sales_totals(yearly_df):
+    """
+    Returns:
+        pd.Series : Grand total per region column
+    """
+    return yearly_df[REGION_COLS].sum()
+
+
+def yearly_sales(yearly_df):
+    """
+    Returns:
+        pd.DataFrame : Numeric YEAR rows sorted by year, years that are not numbers dropped
+    """
+    df = yearly_df.copy()
+    df["YEAR"] = pd.to_numeric(df["YEAR"], errors = "coerce")
+    return df.dropna(subset = ["YEAR"]).sort_values("YEAR").reset_index(drop=True)
+
+
+def last_n_years_sales(yearly_df, n_years=10):
+    """
+    Returns:
+        pd.DataFrame : The per-year rows of the last n_years years on record
+    """
+    df = yearly_sales(yearly_df)
+    if df.empty:
+        return df
+    return df[df["YEAR"] >= df["YEAR"].max() - n_years].reset_index(drop=True)
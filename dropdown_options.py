@@ -0,0 +1,124 @@
+"""
+Reads and writes the DROPDOWN_OPTIONS table that feeds the editor's select boxes.
+
+The options are grouped by column once per version of the table and shared through
+the query cache; the content hash of a grouping identifies it, so derived values
+such as the editor's column_config can be memoized on it.
+"""
+import hashlib
+import json
+from dataclasses import dataclass, field
+
+from constants import DROPDOWN_TABLE, PK_COLS
+from perf_trace import traced
+from query_cache import cached_query, cached_table
+
+
+@dataclass(frozen=True)
+class DropdownOptions:
+    """
+    Compared and hashed by content_hash only.
+
+    Attributes:
+        options (dict) : Column name -> list of its values, in table order
+        content_hash (str) : Hash of options
+    """
+    options: dict = field(compare=False)
+    content_hash: str
+
+
+def group_dropdown_options(dropdown_df, columns=PK_COLS):
+    """
+    Groups the options by column in a single pass over the table.
+
+    Returns:
+        DropdownOptions : The values of every column in columns, [] for a column without options
+    """
+    grouped = {}
+    if dropdown_df is not None and not dropdown_df.empty:
+        grouped = dropdown_df.groupby("COLUMN_NAME", sort=False)["VALUE"].agg(list).to_dict()
+    options = {c: grouped.get(c, []) for c in columns}
+    content_hash = hashlib.sha1(json.dumps(options, sort_keys=True, default=str).encode()).hexdigest()
+    return DropdownOptions(options = options, content_hash = content_hash)
+
+
+def load_dropdown_options(session):
+    """
+    Returns:
+        DropdownOptions : The grouped options, regrouped only when DROPDOWN_OPTIONS changes
+    """
+    return cached_query(
+        session,
+        [DROPDOWN_TABLE],
+        ("dropdown_options",),
+        lambda: group_dropdown_options(cached_table(session, DROPDOWN_TABLE)),
+    )
+
+
+def _option_set(df):
+    """
+    Returns:
+        set : The (COLUMN_NAME, VALUE) pairs of df as strings
+    """
+    if df is None or df.empty:
+        return set()
+    pairs = df[["COLUMN_NAME", "VALUE"]].dropna().astype(str)
+    return set(zip(pairs["COLUMN_NAME"], pairs["VALUE"]))
+
+
+def diff_dropdown_options(old_df, new_df):
+    """
+    Compares two versions of the dropdown table.
+
+    Args:
+        old_df (pd.DataFrame) : The options currently stored
+        new_df (pd.DataFrame) : The options to store
+
+    Returns:
+        tuple : (sorted pairs to insert, sorted pairs to delete)
+    """
+    old_pairs = _option_set(old_df)
+    new_pairs = _option_set(new_df)
+    return sorted(new_pairs - old_pairs), sorted(old_pairs - new_pairs)
+
+
+@traced("dropdowns.write")
+def write_dropdown_options(session, old_df, new_df):
+    """
+    Writes only the changed options, with bound parameters, inside one transaction
+    so readers never see a partially written table.
+
+    Args:
+        session (Session) : The active Snowpark session
+        old_df (pd.DataFrame) : The options currently stored
+        new_df (pd.DataFrame) : The options to store
+
+    Returns:
+        tuple : (number of options inserted, number of options deleted)
+    """
+    to_insert, to_delete = diff_dropdown_options(old_df, new_df)
+    if not to_insert and not to_delete:
+        return 0, 0
+
+    session.sql("BEGIN").collect()
+    try:
+        if to_delete:
+            placeholders = ", ".join(["(?, ?)"] * len(to_delete))
+            session.sql(
+                f"DELETE FROM {DROPDOWN_TABLE} WHERE (COLUMN_NAME, VALUE) IN ({placeholders})",
+                params = [v for pair in to_delete for v in pair],
+            ).collect()
+
+        if to_insert:
+            placeholders = ", ".join(["(?, ?)"] * len(to_insert))
+            session.sql(
+                f"INSERT INTO {DROPDOWN_TABLE} (COLUMN_NAME, VALUE) VALUES {placeholders}",
+                params = [v for pair in to_insert for v in pair],
+            ).collect()
+
+        session.sql("COMMIT").collect()
+    except Exception:
+        session.sql("ROLLBACK").collect()
+        raise
+
+    return len(to_insert), len(to_delete)
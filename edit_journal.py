@@ -0,0 +1,364 @@
+"""
+Append-only journal of the edits made to the SALES table during a session.
+
+The editor, the new row dialog and the CSV append all write to the same journal
+in st.session_state.edit_journal, so the preview and the save only have to look
+at the rows that were actually touched instead of diffing the whole table.
+
+Each entry is a dict with:
+    seq    : position of the entry in the journal
+    op     : "upsert", "delete" or "staged"
+    source : who wrote it ("editor", "add_new_dialog", "csv")
+    ids    : one row identity per affected row
+    rows   : pd.DataFrame with the full row values for an upsert, None otherwise
+
+Editor entries also carry the editor version they were read from and view_seq,
+the journal position from which the journal's edits are part of that view.
+
+"staged" entries stand for rows streamed to a staging table (large CSV uploads);
+they also carry the table name, row count and the set of staged keys, and are
+inserted at save time. The staged keys are part of the key index, so later rows
+cannot reuse them.
+
+A row identity is its baseline key tuple, or (NEW_ROW, source, seq, position) for
+rows that did not exist before this session. Editor entries name rows by the key
+the view showed; replay maps a re-keyed row's shown key back to its identity, but
+only through re-keys journaled before that view was shown. Keys written by the
+same editor delta, e.g. a swap or a re-key onto a row deleted in the same delta,
+still name the rows the view showed.
+
+The frame shown in the editor lives in st.session_state.editor_table, a
+VersionedTable over the loaded frame: rows added by the dialogs go to its overlay
+and editable_df is its view, so adding rows never copies the table eagerly.
+"""
+import copy
+
+import pandas as pd
+import streamlit as st
+
+from change_set import compute_change_set, key_tuples
+from constants import PK_COLS
+from pk_index import PrimaryKeyIndex
+from table_store import VersionedTable
+
+NEW_ROW = "__new__"
+
+_EMPTY_EDITOR_STATE = {"edited_rows": {}, "added_rows": [], "deleted_rows": []}
+
+
+def init_edit_journal():
+    """
+    Initializes the journal, the editor bookkeeping, the table store and the key
+    index of editable_df in session state.
+    """
+    if "edit_journal" not in st.session_state:
+        st.session_state.edit_journal = []
+    if "editor_version" not in st.session_state:
+        st.session_state.editor_version = 0
+    if "editor_view_seq" not in st.session_state:
+        st.session_state.editor_view_seq = len(st.session_state.edit_journal)
+    if "editor_seen" not in st.session_state:
+        st.session_state.editor_seen = copy.deepcopy(_EMPTY_EDITOR_STATE)
+    if "pk_index" not in st.session_state:
+        st.session_state.pk_index = _editor_key_index(st.session_state.editable_df)
+    if "editor_table" not in st.session_state:
+        st.session_state.editor_table = VersionedTable(st.session_state.editable_df)
+
+
+def editor_key():
+    """
+    Returns:
+        str : The widget key of the current st.data_editor instance
+    """
+    return f"sales_editor_{st.session_state.editor_version}"
+
+
+def _append(op, source, ids, rows=None, **extra):
+    journal = st.session_state.edit_journal
+    journal.append({
+        "seq": len(journal),
+        "op": op,
+        "source": source,
+        "ids": list(ids),
+        "rows": rows,
+        **extra,
+    })
+
+
+def record_rows(rows_df, source):
+    """
+    Journals rows added outside of the editor.
+
+    Args:
+        rows_df (pd.DataFrame) : The new rows
+        source (str) : Name of the dialog that added them
+    """
+    if rows_df.empty:
+        return
+    seq = len(st.session_state.edit_journal)
+    ids = [(NEW_ROW, source, seq, i) for i in range(len(rows_df))]
+    _append("upsert", source, ids, rows_df.reset_index(drop=True))
+
+
+def record_staged_rows(stage_table, row_count, source, keys):
+    """
+    Journals rows that were streamed to a staging table instead of the editor, and
+    adds their keys to the key index.
+
+    Args:
+        stage_table (str) : Name of the temporary staging table
+        row_count (int) : Number of staged rows
+        source (str) : Name of the dialog that staged them
+        keys (set) : The normalised keys of the staged rows
+    """
+    _append("staged", source, [], table = stage_table, count = row_count, keys = keys)
+    st.session_state.pk_index.apply(added_keys = keys)
+
+
+def journal_staged_uploads():
+    """
+    Returns:
+        list : (staging table, row count) for every staged upload in the journal
+    """
+    return [(e["table"], e["count"]) for e in st.session_state.edit_journal if e["op"] == "staged"]
+
+
+def staged_keys(journal):
+    """
+    Returns:
+        set : The keys of every staged upload in the journal
+    """
+    return set().union(*(e["keys"] for e in journal if e["op"] == "staged"))
+
+
+def _editor_key_index(base_df):
+    index = PrimaryKeyIndex.from_frame(base_df)
+    index.apply(added_keys = staged_keys(st.session_state.edit_journal))
+    return index
+
+
+def record_editor_delta(base_df, pk_cols=PK_COLS):
+    """
+    Reads the delta held by the keyed st.data_editor widget and appends whatever
+    changed since the previous rerun to the journal.
+
+    Args:
+        base_df (pd.DataFrame) : The frame that was passed to st.data_editor
+        pk_cols (list) : The key columns
+    """
+    state = st.session_state.get(editor_key())
+    if not state:
+        return
+
+    seen = st.session_state.editor_seen
+    version = st.session_state.editor_version
+    view = {"version": version, "view_seq": st.session_state.editor_view_seq}
+    columns = list(base_df.columns)
+
+    edited = {int(pos): cells for pos, cells in state.get("edited_rows", {}).items()}
+    seen_edited = {int(pos): cells for pos, cells in seen["edited_rows"].items()}
+    changed_pos = [pos for pos, cells in edited.items() if seen_edited.get(pos) != cells]
+    if changed_pos:
+        base_rows = base_df.iloc[changed_pos]
+        rows = base_rows.to_dict("records")
+        for row, pos in zip(rows, changed_pos):
+            row.update(edited[pos])
+        _append("upsert", "editor", key_tuples(base_rows, pk_cols), pd.DataFrame(rows, columns = columns), **view)
+
+    added = list(state.get("added_rows", []))
+    seen_added = seen["added_rows"]
+    changed_slots = [i for i, row in enumerate(added) if i >= len(seen_added) or seen_added[i] != row]
+    if changed_slots:
+        ids = [(NEW_ROW, "editor", version, i) for i in changed_slots]
+        _append("upsert", "editor", ids, pd.DataFrame([added[i] for i in changed_slots], columns = columns), **view)
+    if len(seen_added) > len(added):
+        ids = [(NEW_ROW, "editor", version, i) for i in range(len(added), len(seen_added))]
+        _append("delete", "editor", ids, **view)
+
+    deleted = sorted({int(pos) for pos in state.get("deleted_rows", [])} - {int(pos) for pos in seen["deleted_rows"]})
+    if deleted:
+        _append("delete", "editor", key_tuples(base_df.iloc[deleted], pk_cols), **view)
+
+    st.session_state.editor_seen = copy.deepcopy({
+        "edited_rows": edited,
+        "added_rows": added,
+        "deleted_rows": list(state.get("deleted_rows", [])),
+    })
+
+
+def editor_delta_keys(base_df, pk_cols=PK_COLS):
+    """
+    Reads the keys that the pending editor delta removes from and adds to base_df.
+    Rows whose key cells were edited count as one removed and one added key.
+
+    Returns:
+        tuple : (list of removed keys, list of added keys)
+    """
+    state = st.session_state.get(editor_key()) or {}
+    edited = {int(pos): cells for pos, cells in state.get("edited_rows", {}).items()}
+    deleted = {int(pos) for pos in state.get("deleted_rows", [])}
+    rekeyed = [pos for pos, cells in edited.items() if pos not in deleted and any(c in pk_cols for c in cells)]
+
+    removed_pos = sorted(deleted | set(rekeyed))
+    removed = key_tuples(base_df.iloc[removed_pos], pk_cols) if removed_pos else []
+
+    new_key_rows = base_df.iloc[rekeyed][pk_cols].to_dict("records")
+    for row, pos in zip(new_key_rows, rekeyed):
+        row.update({c: v for c, v in edited[pos].items() if c in pk_cols})
+    new_key_rows.extend(state.get("added_rows", []))
+    added = key_tuples(pd.DataFrame(new_key_rows, columns = pk_cols), pk_cols) if new_key_rows else []
+
+    return removed, added
+
+
+def editor_delta_rows(base_df):
+    """
+    Reads the rows the pending editor delta edits or adds, with the edits applied.
+
+    Returns:
+        tuple : (pd.DataFrame of those rows, indexed by base position for edited rows and
+            len(base_df) + i for added rows, dict row -> set of edited columns, None for added rows)
+    """
+    state = st.session_state.get(editor_key()) or {}
+    edited = {int(pos): cells for pos, cells in state.get("edited_rows", {}).items()}
+    deleted = {int(pos) for pos in state.get("deleted_rows", [])}
+    added = list(state.get("added_rows", []))
+
+    positions = [pos for pos in edited if pos not in deleted]
+    rows = base_df.iloc[positions].to_dict("records")
+    for row, pos in zip(rows, positions):
+        row.update(edited[pos])
+
+    added_pos = list(range(len(base_df), len(base_df) + len(added)))
+    touched = {pos: set(edited[pos]) for pos in positions}
+    touched.update({pos: None for pos in added_pos})
+    frame = pd.DataFrame(rows + added, columns = list(base_df.columns), index = positions + added_pos)
+    return frame, touched
+
+
+def _show(table, view_seq):
+    """
+    Shows the current view of table in a fresh editor widget, so the widget delta
+    is always relative to the current base.
+    """
+    view = table.view()
+    st.session_state.editor_table = table
+    st.session_state.editor_view_seq = view_seq
+    st.session_state.editable_df = view
+    st.session_state.current_df = view
+    st.session_state.editor_version += 1
+    st.session_state.editor_seen = copy.deepcopy(_EMPTY_EDITOR_STATE)
+
+
+def rebase_editor(new_base_df, view_seq=None):
+    """
+    Replaces the frame shown in the editor, e.g. with a freshly loaded table or page.
+
+    Args:
+        new_base_df (pd.DataFrame) : The new editor base, shared and never modified
+        view_seq (int) : Journal position from which the journal's edits are part of new_base_df,
+            for a page shown again with its edits; None for rows as loaded from SALES
+    """
+    st.session_state.pk_index = _editor_key_index(new_base_df)
+    _show(VersionedTable(new_base_df), len(st.session_state.edit_journal) if view_seq is None else view_seq)
+
+
+def extend_editor(rows_df, keys_delta):
+    """
+    Adds rows below the editor's rows. The pending widget delta is folded into
+    the table store's overlay first, so the new view keeps the user's edits;
+    callers only get here once record_editor_delta has journaled that delta.
+
+    Args:
+        rows_df (pd.DataFrame) : The rows to add
+        keys_delta (tuple) : (removed keys, added keys) of the widget delta and the new rows,
+            to update the key index incrementally
+    """
+    table = st.session_state.editor_table
+    table.apply_editor_state(st.session_state.get(editor_key()) or {})
+    table.append(rows_df)
+    st.session_state.pk_index.apply(*keys_delta)
+    _show(table, st.session_state.editor_view_seq)
+
+
+def reset_edit_journal(new_base_df):
+    """
+    Clears the journal after a save and rebases the editor on the saved table.
+    """
+    st.session_state.edit_journal = []
+    rebase_editor(new_base_df)
+
+
+def _resolve(aliases, ident, entry):
+    """
+    Maps the key an editor entry names a row by to the row's identity. Only re-keys
+    journaled since the entry's view was shown, and not by the same editor version, apply.
+    """
+    if "version" not in entry:
+        return ident
+    for seq, version, target in reversed(aliases.get(ident, ())):
+        if seq < entry["view_seq"]:
+            break
+        if version is None or version < entry["version"]:
+            return target
+    return ident
+
+
+def replay_journal(journal, columns, pk_cols=PK_COLS):
+    """
+    Folds the journal into the final state of every touched row.
+
+    Args:
+        journal (list) : The journal entries, oldest first
+        columns (list) : Columns of the resulting frame, None to keep the journal's columns
+        pk_cols (list) : The key columns
+
+    Returns:
+        tuple : (list of touched baseline keys, pd.DataFrame of the surviving touched rows)
+    """
+    latest = {}
+    aliases = {}
+    for entry_idx, entry in enumerate(journal):
+        if entry["op"] == "staged":
+            continue
+        if entry["op"] == "delete":
+            for ident in entry["ids"]:
+                latest[_resolve(aliases, ident, entry)] = None
+            continue
+
+        new_keys = key_tuples(entry["rows"], pk_cols)
+        resolved = [_resolve(aliases, ident, entry) for ident in entry["ids"]]
+        for row_idx, (ident, new_key) in enumerate(zip(resolved, new_keys)):
+            latest[ident] = (entry_idx, row_idx)
+            aliases.setdefault(new_key, []).append((entry_idx, entry.get("version"), ident))
+
+    touched_keys = [ident for ident in latest if ident[0] != NEW_ROW]
+
+    positions = {}
+    for location in latest.values():
+        if location is not None:
+            positions.setdefault(location[0], []).append(location[1])
+    parts = [journal[entry_idx]["rows"].iloc[rows] for entry_idx, rows in sorted(positions.items())]
+    final_rows = pd.concat(parts, ignore_index = True) if parts else pd.DataFrame(columns = columns or pk_cols)
+    if columns is not None:
+        final_rows = final_rows.reindex(columns = columns)
+
+    return touched_keys, final_rows
+
+
+def journal_change_set(baseline_rows, pk_cols=PK_COLS):
+    """
+    Computes the ChangeSet from the journal, comparing only the touched rows.
+
+    Args:
+        baseline_rows (callable) : f(touched keys) -> the baseline SALES rows with those keys,
+            e.g. SalesSnapshot.rows_for, so the baseline is never scanned as a whole
+
+    Returns:
+        ChangeSet : The pending changes
+    """
+    touched_keys, final_rows = replay_journal(st.session_state.edit_journal, None, pk_cols)
+    baseline = baseline_rows(touched_keys)
+    final_rows = final_rows.reindex(columns = baseline.columns)
+
+    return compute_change_set(baseline, final_rows, pk_cols)
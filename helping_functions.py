@@ -1,61 +1,274 @@
+import functools
+
 import pandas as pd
 import streamlit as st
 from snowflake.snowpark import Session
 
+from constants import DROPDOWN_TABLE, PK_COLS, SALES_TABLE
+from dropdown_options import load_dropdown_options, write_dropdown_options
+from change_set import key_index, key_tuples, rows_for_keys
+from csv_ingest import STREAMING_THRESHOLD_BYTES, header_mismatch, normalize_header, stream_csv_to_stage
+from edit_journal import editor_delta_keys, editor_delta_rows, extend_editor, journal_change_set, journal_staged_uploads, rebase_editor, record_rows, record_staged_rows, replay_journal, reset_edit_journal, staged_keys
+from perf_trace import span, traced
+from prefetch import cancel_prefetch
+from query_cache import cached_table, invalidate_table
+from sales_pager import PAGE_SIZE, fetch_page, key_conflicts
+from sales_frame import compact_rows
+from sales_snapshot import SALES_COLUMNS, ConcurrentModificationError, load_sales_snapshot, refresh_after_save
+from sales_save import save_change_set
+from validation import ValidationReport, validate
+
+PREVIEW_ROWS = 200
+MAX_VIOLATIONS_SHOWN = 1000
+
+@functools.lru_cache(maxsize = 32)
+def _column_config(dropdown_options, columns):
+    column_config = {}
+    for col_name, options in dropdown_options.options.items():
+        if col_name in columns:
+            column_config[col_name] = st.column_config.SelectboxColumn(
+                col_name,
+                options = options,
+                help = f"Select a {col_name}"
+            )
+    return column_config
+
+
 def build_column_config(dropdown_options, df):
     """
     Build Streamlit column_config for st.data_editor based on dropdown_options.
+    The result is memoized on the options' content hash and the columns of df;
+    st.data_editor copies the config, so the shared dict is never modified.
 
     Args:
-        dropdown_options (dict) : Dictionary mapping column names -> list of options
+        dropdown_options (DropdownOptions) : The grouped dropdown options
         df (pd.DataFrame) : The dataframe whose columns we want to configure
 
     Returns:
         dict : A column_config dictionary in st.data_editor
     """
-    column_config = {}
-    for col_name, options in dropdown_options.items():
-        if col_name in df.columns:
-            column_config[col_name] = st.column_config.SelectboxColumn(
-                col_name,
-                options = options,
-                help = f"Select a {col_name}"
-            )
-    return column_config
+    return _column_config(dropdown_options, tuple(df.columns))
 
 
-def get_dropdown_options(dropdown_df):
+def get_dropdown_options(session):
     """
-    Gets the dropdown options for adding to the column config
+    Gets the dropdown options for adding to the column config. They are kept in the
+    session and only reloaded after save_dropdown_options commits.
 
     Args:
-        dropdown_df (pd.DataFrame) : The dataframe from which we can retrive the unique values
+        session (Session) : The active Snowpark session
 
     Returns:
-        dict : A dropdown options as a dictionary to use in column config
+        DropdownOptions : The options grouped by column, with their content hash
     """
-    dropdown_dict = {}
-    for column in ["YEAR", "PRODUCT", "FORECAST", "METRIC"]:
-        dropdown_dict[column] = dropdown_df[dropdown_df['COLUMN_NAME'] == column]['VALUE'].tolist()
-    return dropdown_dict
+    if "dropdown_options" not in st.session_state:
+        st.session_state.dropdown_options = load_dropdown_options(session)
+    return st.session_state.dropdown_options
 
-def save_dropdown_options(df, session):
-    """
-    Overwrites the DROPDOWN_OPTIONS with the values in the edited DataFrame 
+def save_dropdown_options(df, session, previous_df=None):
     """
-    df = df[['COLUMN_NAME', 'VALUE']].copy()
+    Writes the difference between the stored DROPDOWN_OPTIONS and the edited DataFrame
 
-    records = [tuple(x) for x in df.to_numpy()]
-    session.sql("TRUNCATE TABLE DEMO_STREAMLIT_APP.PUBLIC.DROPDOWN_OPTIONS").collect()
+    Args:
+        df (pd.DataFrame) : The edited options
+        session (Session) : The active Snowpark session
+        previous_df (pd.DataFrame) : The options as last loaded, read from the table when not given
+    """
+    if previous_df is None:
+        previous_df = cached_table(session, DROPDOWN_TABLE)
 
-    for record in records:
-        session.sql(f"""
-            INSERT INTO DEMO_STREAMLIT_APP.PUBLIC.DROPDOWN_OPTIONS(COLUMN_NAME, VALUE)
-            VALUES ('{record[0]}', '{record[1]}')
-        """).collect()
+    write_dropdown_options(session, previous_df, df)
+    invalidate_table(DROPDOWN_TABLE)
+    st.session_state.pop("dropdown_options", None)
 
     st.success("Dropdown table successfully updated!")
 
+def show_violations(report):
+    """
+    Shows what failed validation: a count per rule and the first violations by row and column.
+
+    Args:
+        report (ValidationReport) : The result of validate
+    """
+    counts = ", ".join(f"{n:,} {rule}" for rule, n in report.summary().items())
+    st.error(f"{len(report.invalid_rows()):,} rows failed validation ({counts}). Please correct them.")
+    st.dataframe(report.violations.head(MAX_VIOLATIONS_SHOWN), hide_index = True, use_container_width = True)
+
+
+def validate_editor_delta(base_df, dropdown_options):
+    """
+    Validates the cells the pending editor delta edits and the rows it adds. Key
+    uniqueness is left to the key index, which checks it incrementally.
+
+    Args:
+        base_df (pd.DataFrame) : The frame that was passed to st.data_editor
+        dropdown_options (dict) : Column name -> allowed values
+
+    Returns:
+        ValidationReport : The violations in edited cells and added rows
+    """
+    rows, touched = editor_delta_rows(base_df)
+    report = validate(rows, dropdown_options, rules = ("key_not_null", "in_dropdown", "numeric", "non_negative"))
+    if report.ok:
+        return report
+    violations = report.violations
+    keep = [touched[row] is None or col_name in touched[row] for row, col_name in zip(violations["row"], violations["column"])]
+    return ValidationReport(violations = violations[keep].reset_index(drop=True), n_rows = report.n_rows)
+
+
+def init_pager():
+    """
+    Initializes the paginated editor state: filters, sort order, the stack of
+    page cursors and the edited pages kept in memory until they are saved. Each
+    edited page also keeps its rows as they were loaded, the baseline its edits
+    are saved against, and the journal position its edits start from. The
+    cross-page key check keeps its result and the keys it looked up in SALES.
+    """
+    if "pager" not in st.session_state:
+        st.session_state.pager = {
+            "filters": {},
+            "sort_col": PK_COLS[0],
+            "descending": False,
+            "cursors": [None],
+            "next_cursor": None,
+            "dirty": {},
+            "journal_len": 0,
+            "loaded_page": None,
+            "view_seq": None,
+            "key_conflicts": {},
+        }
+
+
+def _page_token(pager):
+    return (tuple(sorted(pager["filters"].items())), pager["sort_col"], pager["descending"], pager["cursors"][-1])
+
+
+@traced("pager.load_current_page")
+def load_current_page(session):
+    """
+    Returns the page the pager points at, from memory if it has unsaved edits.
+
+    Returns:
+        pd.DataFrame : The page to show in the editor
+    """
+    pager = st.session_state.pager
+    token = _page_token(pager)
+    view_seq = None
+    if token in pager["dirty"]:
+        page, next_cursor, loaded_page, view_seq = pager["dirty"][token]
+    else:
+        page, next_cursor = fetch_page(
+            session, pager["filters"], pager["sort_col"], pager["descending"], pager["cursors"][-1]
+        )
+        page = compact_rows(session, page)
+        loaded_page = page
+    pager["next_cursor"] = next_cursor
+    pager["loaded_page"] = loaded_page
+    pager["view_seq"] = view_seq
+    return page
+
+
+def go_to_page(session, **changes):
+    """
+    Keeps the current page in memory if it was edited, applies the pager changes
+    and rebases the editor on the new page.
+    """
+    pager = st.session_state.pager
+    if len(st.session_state.edit_journal) > pager["journal_len"]:
+        pager["dirty"][_page_token(pager)] = (
+            st.session_state.current_df, pager["next_cursor"], pager["loaded_page"], st.session_state.editor_view_seq,
+        )
+    pager.update(changes)
+    page = load_current_page(session)
+    rebase_editor(page, pager["view_seq"])
+    pager["journal_len"] = len(st.session_state.edit_journal)
+
+
+def paginated_baseline_rows(keys, pk_cols=PK_COLS):
+    """
+    Looks up the touched keys in the pages as they were loaded, the edited pages
+    and the current one. A row loaded more than once keeps its earliest version,
+    so a change made by another session in between is caught as a conflict
+    when saving instead of being overwritten.
+
+    Returns:
+        pd.DataFrame : The as-loaded rows with those keys
+    """
+    pager = st.session_state.pager
+    pages = [loaded_page for _, _, loaded_page, _ in pager["dirty"].values()]
+    if pager.get("loaded_page") is not None:
+        pages.append(pager["loaded_page"])
+    if not pages:
+        return pd.DataFrame(columns = SALES_COLUMNS)
+    loaded = pd.concat(pages, ignore_index = True)
+    loaded = loaded[~key_index(loaded, pk_cols).duplicated(keep = "first")]
+    return rows_for_keys(loaded, keys, pk_cols = pk_cols)
+
+
+def render_pager_controls(session, dropdown_options):
+    """
+    Server-side filter, sort and page navigation controls for the paginated editor.
+    """
+    pager = st.session_state.pager
+    cols = st.columns(len(PK_COLS) + 2)
+
+    filters = {}
+    for c, key in zip(cols, PK_COLS):
+        value = c.selectbox(key, ["All"] + dropdown_options.get(key, []), key = f"pager_filter_{key}")
+        if value != "All":
+            filters[key] = value
+    sort_col = cols[-2].selectbox("Sort by", PK_COLS, key = "pager_sort")
+    descending = cols[-1].checkbox("Descending", key = "pager_descending")
+
+    if (filters, sort_col, descending) != (pager["filters"], pager["sort_col"], pager["descending"]):
+        go_to_page(session, filters = filters, sort_col = sort_col, descending = descending, cursors = [None])
+
+    prev_col, info_col, next_col = st.columns([1, 4, 1])
+    if prev_col.button("◀ Previous", disabled = len(pager["cursors"]) == 1):
+        go_to_page(session, cursors = pager["cursors"][:-1])
+    if next_col.button("Next ▶", disabled = pager["next_cursor"] is None):
+        go_to_page(session, cursors = pager["cursors"] + [pager["next_cursor"]])
+    info_col.caption(f"Page {len(pager['cursors'])} · {PAGE_SIZE:,} rows per page · {len(pager['dirty'])} edited page(s) in memory")
+
+
+def stream_preview(preview_rows=PREVIEW_ROWS):
+    """
+    Returns an on_batch callback that shows the load progress and the first rows while SALES streams in,
+    and a function clearing both once the load is done.
+    """
+    progress_slot = st.empty()
+    preview_slot = st.empty()
+
+    def on_batch(batch, rows_loaded, total_rows):
+        if total_rows:
+            progress_slot.progress(min(rows_loaded / total_rows, 1.0), text = f"Loading SALES: {rows_loaded:,} of {total_rows:,} rows")
+        if rows_loaded == len(batch):
+            preview_slot.dataframe(batch.head(preview_rows), use_container_width = True)
+
+    def clear():
+        progress_slot.empty()
+        preview_slot.empty()
+
+    return on_batch, clear
+
+
+@traced("editor.load_base")
+def load_editor_base(session):
+    """
+    Also stores the SALES snapshot the editor's changes will be diffed against, None in paginated mode.
+
+    Returns:
+        pd.DataFrame : The frame the editor starts from, the current page in paginated mode
+    """
+    if st.session_state.paginated_mode:
+        st.session_state.sales_snapshot = None
+        return load_current_page(session)
+    on_batch, clear_preview = stream_preview()
+    st.session_state.sales_snapshot = load_sales_snapshot(session, on_batch)
+    clear_preview()
+    return st.session_state.sales_snapshot.frame
+
+
 @st.dialog("Edit Dropdown Options ✏️")
 def edit_dropdowns(dropdown_df, session):
     st.write("Update dropdown values here:")
@@ -84,8 +297,8 @@ def edit_dropdowns(dropdown_df, session):
         if updated_df.empty:
             st.error("No values entered. Please fill atleast one value before saving")
         else:
+            save_dropdown_options(updated_df, session, dropdown_df)
             st.session_state.dropdown_df = updated_df
-            save_dropdown_options(updated_df, session)
             st.success("Dropdown options updated successfully!")
             st.rerun()
 
@@ -122,99 +335,166 @@ def add_new_dialog(df, dropdown_options):
 
             new_row_df = pd.DataFrame([new_row])
 
-            temp_df= pd.concat([df, new_row_df], ignore_index= True)
-            primary_keys = temp_df[["METRIC","FORECAST", "PRODUCT","YEAR"]]
-
-            if primary_keys.duplicated(keep=False).iloc[-1]:
-                st.error("Duplicate primary keys detected! The combination has to be unique. Please edit the existing cell.")
-                existing_df = df
-                duplicate_match = existing_df[
-                    (existing_df["METRIC"] == metric) &
-                    (existing_df["FORECAST"] == forecast) &
-                    (existing_df["PRODUCT"] == product) &
-                    (existing_df["YEAR"] == year)
-                    ]
-                if not duplicate_match.empty:
-                    st.dataframe(duplicate_match)
+            with span("add_row.validate"):
+                removed_keys, added_keys = editor_delta_keys(st.session_state.editable_df)
+                existing_keys = st.session_state.pk_index.overlay(removed_keys, added_keys)
+                report = validate(new_row_df, dropdown_options, existing_keys)
+
+            if not report.ok:
+                show_violations(report)
+                if "unique_key" in report.summary():
+                    existing_df = df
+                    duplicate_match = existing_df[
+                        (existing_df["METRIC"] == metric) &
+                        (existing_df["FORECAST"] == forecast) &
+                        (existing_df["PRODUCT"] == product) &
+                        (existing_df["YEAR"] == year)
+                        ]
+                    if not duplicate_match.empty:
+                        st.dataframe(duplicate_match)
 
             else:
-                st.session_state.editable_df = temp_df
+                extend_editor(new_row_df, (removed_keys, added_keys + key_tuples(new_row_df)))
+                record_rows(new_row_df, "add_new_dialog")
                 st.success("Table updated successfully")
                 st.rerun()
 
 
     
+def stream_csv_dialog_body(uploaded_file, edit_df, session):
+    """
+    Streaming variant of the CSV append: rows go to a staging table in chunks
+    and are inserted into SALES when the changes are saved.
+    """
+    try:
+        preview = pd.read_csv(uploaded_file, nrows = 20)
+    except pd.errors.EmptyDataError:
+        st.error("Cannot append the file. It is empty.")
+        return
+    st.write("Preview of the uploaded file:")
+    st.dataframe(preview)
+    uploaded_file.seek(0)
+
+    if st.button("📤 Stage rows for the table"):
+        existing_keys = None
+        pending_keys = None
+        if not st.session_state.paginated_mode:
+            # The key index already holds the keys of earlier staged uploads
+            existing_keys = st.session_state.pk_index.overlay(*editor_delta_keys(st.session_state.editable_df))
+        else:
+            journal = st.session_state.edit_journal
+            _, final_rows = replay_journal(journal, None)
+            pending_keys = staged_keys(journal) | set(key_tuples(final_rows))
+        progress = st.progress(0.0, text = "Reading file...")
+        result = stream_csv_to_stage(
+            session,
+            uploaded_file,
+            list(edit_df.columns),
+            existing_keys,
+            progress_callback = lambda fraction, text: progress.progress(fraction, text = text),
+            dropdown_options = get_dropdown_options(session).options,
+            pending_keys = pending_keys,
+        )
+
+        if result["error"]:
+            st.error(f"Cannot append the file. {result['error']}")
+        elif result["rejected"]:
+            session.sql(f"DROP TABLE IF EXISTS {result['stage_table']}").collect()
+            st.error(f"{result['rejected']:,} rows failed validation and nothing was staged. Please correct them.")
+        elif not result["accepted"]:
+            st.info("The file has no rows, nothing was staged.")
+        else:
+            record_staged_rows(result["stage_table"], result["accepted"], "csv", result["keys"])
+            st.success(f"{result['accepted']:,} rows staged. They will be inserted when the changes are saved.")
+            st.rerun()
+
+        if result["violations"] is not None:
+            st.dataframe(result["violations"], hide_index = True, use_container_width = True)
+        elif result["rejected_sample"] is not None:
+            st.dataframe(result["rejected_sample"])
+
+
 @st.dialog("Upload File 📎")
 def select_tables_dialog(edit_df, session):
     uploaded_file = st.file_uploader("🗂️ Upload CSV file ", type = ["csv"])
     
     if uploaded_file is not None:
-        df_csv = pd.read_csv(uploaded_file)
+        streaming = st.checkbox(
+            "Stream to a staging table (large files)",
+            value = uploaded_file.size > STREAMING_THRESHOLD_BYTES,
+        )
+        if streaming:
+            stream_csv_dialog_body(uploaded_file, edit_df, session)
+            return
+
+        try:
+            with span("csv.read") as s:
+                df_csv = s.add_frame(pd.read_csv(uploaded_file))
+        except pd.errors.EmptyDataError:
+            st.error(f"Cannot append {uploaded_file.name}. The file is empty.")
+            return
         st.write("Preview of the uploaded file:")
         st.dataframe(df_csv.head(20))
 
         if st.button(f"📤 Add to the table"):
-            full_df = df_csv.copy()
-
-            editable_cols = set(edit_df.columns)
-            new_cols = set(full_df.columns)
-
-            if editable_cols == new_cols:
-                temp_df = pd.concat(
-                    [edit_df, full_df], ignore_index = True
-                )
-
-                primary_keys = temp_df[["METRIC","FORECAST", "PRODUCT","YEAR"]]
-
-                duplicates = primary_keys[primary_keys.duplicated(keep=False)]
-                
-                if not duplicates.empty:
-                    st.error("Duplicate primary keys detected! The combination has to be unique. Please edit the existing cell.")
-                    st.dataframe(temp_df.loc[duplicates.index]) 
-                         
-                else:
-                    st.session_state.editable_df = temp_df
-                    st.success("Table updated successfully")
-                    st.rerun()
-
+            full_df = df_csv.set_axis(normalize_header(df_csv.columns), axis = 1)
+            expected_cols = list(edit_df.columns)
+
+            error = header_mismatch(list(full_df.columns), expected_cols)
+            if error:
+                st.error(f"Cannot append {uploaded_file.name}. Column mismatch. {error}")
+                return
+            full_df = full_df[expected_cols]
+
+            with span("csv.validate"):
+                removed_keys, added_keys = editor_delta_keys(st.session_state.editable_df)
+                existing_keys = st.session_state.pk_index.overlay(removed_keys, added_keys)
+                report = validate(full_df, get_dropdown_options(session).options, existing_keys)
+
+            if not report.ok:
+                show_violations(report)
             else:
-                st.error(
-                    f"Cannot append {df_csv}.Column mismatch.\n\n"
-                    f"Original Table Columns : {list(editable_cols)}. \n\n"
-                    f"{df_csv} columsn: {list(new_cols)}"
-                )
+                extend_editor(full_df, (removed_keys, added_keys + key_tuples(full_df)))
+                record_rows(full_df, "csv")
+                st.success("Table updated successfully")
+                st.rerun()
 
 @st.dialog("Preview and Save Changes ✅")
 def preview_changes_dialog(session):
     """
-    Dialog to preview and save changes between editable_df and original_df
+    Dialog to preview and save the changes recorded in the edit journal against the SALES snapshot
     """
-    pk_cols = ["METRIC", "FORECAST", "PRODUCT", "YEAR"]
-
-    temp_df = pd.DataFrame(st.session_state.editable_df)
-    original_df = pd.DataFrame(st.session_state.original_df.to_pandas())
-
-    for col_name in pk_cols:
-        temp_df[col_name] = temp_df[col_name].astype(str).str.strip()
-        original_df[col_name] = original_df[col_name].astype(str).str.strip()
-
-
-    temp_df["_pk"] = temp_df[pk_cols].apply(lambda row: tuple(row), axis = 1)
-    original_df["_pk"] = original_df[pk_cols].apply(lambda row: tuple(row), axis = 1)
-
-    added_rows = temp_df[~temp_df["_pk"].isin(original_df["_pk"])].drop(columns= "_pk")
-    removed_rows = original_df[~original_df["_pk"].isin(temp_df["_pk"])].drop(columns = "_pk")
-
-    updated_rows = pd.DataFrame()
-    original_rows = pd.DataFrame()
-    common_pks = temp_df["_pk"].isin(original_df["_pk"])
-    for pk in temp_df.loc[common_pks, "_pk"]:
-        row_temp = temp_df[temp_df["_pk"] == pk].drop(columns="_pk").iloc[0]
-        row_orig = original_df[original_df["_pk"] == pk].drop(columns = "_pk").iloc[0]
+    pk_cols = PK_COLS
+
+    if st.session_state.get("sales_conflict"):
+        st.warning("Rows you changed were also changed by another session after you loaded them, so your changes were not saved.")
+        if st.button("🔄 Reload SALES (discards unsaved edits)"):
+            st.session_state.sales_conflict = False
+            st.session_state.pager["dirty"] = {}
+            st.session_state.pager["journal_len"] = 0
+            reset_edit_journal(load_editor_base(session))
+            st.rerun()
 
-        if not row_temp.equals(row_orig):
-            updated_rows = pd.concat([updated_rows, pd.DataFrame([row_temp])], ignore_index = False)
-            original_rows = pd.concat([original_rows, pd.DataFrame([row_orig])],ignore_index = False)
+    if st.session_state.paginated_mode:
+        conflicts = key_conflicts(session, st.session_state.edit_journal, memo = st.session_state.pager["key_conflicts"])
+        if not conflicts.empty:
+            st.error("Duplicate primary keys detected across pages! Please fix them before saving.")
+            st.dataframe(conflicts, use_container_width = True)
+            return
+
+    # The baseline is the rows as loaded, so a row another session changed since then
+    # shows as the user's edit and is caught as a conflict by the save
+    if st.session_state.paginated_mode:
+        baseline_rows = paginated_baseline_rows
+    else:
+        baseline_rows = st.session_state.sales_snapshot.rows_for
+
+    with span("preview.change_set") as s:
+        change_set = journal_change_set(baseline_rows, pk_cols)
+        s.set(**change_set.summary())
+    added_rows = change_set.added
+    removed_rows = change_set.removed
+    updated_rows = change_set.updated
 
     st.subheader("Changes Preview")
 
@@ -230,49 +510,46 @@ def preview_changes_dialog(session):
         st.warning("Updated Rows:")
         st.dataframe(updated_rows, use_container_width = True)
 
-    if added_rows.empty and removed_rows.empty and updated_rows.empty:
+    staged_uploads = journal_staged_uploads()
+    if staged_uploads:
+        st.success(f"Uploaded Rows: {sum(count for _, count in staged_uploads):,} rows staged from CSV uploads")
+
+    if added_rows.empty and removed_rows.empty and updated_rows.empty and not staged_uploads:
         st.info("No Changes Detected.")
 
     if st.button("💾 Save Changes to the Table"):
         try:
-            df_to_save = st.session_state.editable_df
-            df_to_save = df_to_save.dropna(subset=pk_cols)
-            df_to_save.columns = [c.upper() for c in df_to_save.columns]
-
-            month_cols = [c for c in df_to_save.columns if c not in pk_cols]
-
-            session.create_dataframe(df_to_save).write.save_as_table(
-                "TMP_SALES_STAGE", mode = "overwrite"
+            # Warm-ups still queued would only compete with the save for the warehouse
+            cancel_prefetch()
+            progress = st.progress(0.0, text = "Saving changes...")
+            save_result = save_change_set(
+                session,
+                change_set,
+                staged_uploads,
+                progress_callback = lambda fraction, text: progress.progress(fraction, text = text),
             )
 
-            merge_condition = " AND ".join([f"target.{col} = source.{col}" for col in pk_cols])
-            update_clause = ", ".join([f"{col} = source.{col}" for col in month_cols])
-            insert_columns = ", ".join(df_to_save.columns)
-            insert_values = ", ".join([f"source.{c}" for c in df_to_save.columns])
-
-            session.sql(f"""
-                MERGE INTO DEMO_STREAMLIT_APP.PUBLIC.SALES AS target
-                USING TMP_SALES_STAGE AS source
-                ON {merge_condition}
-                WHEN MATCHED THEN
-                    UPDATE SET {update_clause}
-                WHEN NOT MATCHED THEN
-                    INSERT ({insert_columns})
-                    VALUES ({insert_values})
-            """).collect()
-
-            if not removed_rows.empty:
-                for idx, row in removed_rows.iterrows():
-                    condition = " AND ".join([f"{col} = '{row[col]}'" for col in pk_cols])
-                    session.sql(f"DELETE FROM DEMO_STREAMLIT_APP.PUBLIC.SALES WHERE {condition}").collect()
-
-            refreshed_df = session.table("DEMO_STREAMLIT_APP.PUBLIC.SALES")
-            st.session_state.editable_df = refreshed_df.to_pandas()
-            st.session_state.original_df = refreshed_df
+            invalidate_table(SALES_TABLE)
+
+            st.session_state.pager["dirty"] = {}
+            st.session_state.pager["journal_len"] = 0
+            refreshed = None
+            if not st.session_state.paginated_mode and not staged_uploads:
+                refreshed = refresh_after_save(st.session_state.sales_snapshot, change_set, save_result)
+            if refreshed is not None:
+                st.session_state.sales_snapshot = refreshed
+                reset_edit_journal(refreshed.frame)
+            else:
+                reset_edit_journal(load_editor_base(session))
 
             st.success("Changes Saved Successfully!")
             st.rerun()
 
+        except ConcurrentModificationError as e:
+            invalidate_table(SALES_TABLE)
+            st.session_state.sales_conflict = True
+            st.error(f"Save Failed: {e}")
+
         except Exception as e:
             st.error(f"Save Failed: {e}")
 
@@ -3,32 +3,47 @@
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-from PIL import Image
-import io
 from snowflake.snowpark.context import get_active_session
-from snowflake.snowpark.functions import col, sum as ssum, max as smax
+
+from change_set import compute_change_set, key_tuples
+from edit_journal import init_edit_journal, editor_key, editor_delta_keys, extend_editor, rebase_editor
+from sales_save import save_change_set
+from sales_snapshot import apply_saved_changes, read_change_version
+from dropdown_options import load_dropdown_options, write_dropdown_options
+from query_cache import cached_table, invalidate_table, get_query_cache
+from perf_trace import begin_rerun, end_rerun, render_trace_panel, set_page, span
+from concurrent_queries import run_concurrently
+from prefetch import cancel_prefetch, start_prefetch
+from asset_cache import load_stage_asset
+from batch_loader import load_batched
+from table_store import enable_copy_on_write
+from validation import validate
+from csv_ingest import header_mismatch
+from constants import LOGO_PATH, MONTH_COLS, PK_COLS
+from vgsales_rollup import load_filter_options
+from dashboard_data import load_yearly_region_sales, sales_totals, yearly_sales, last_n_years_sales
 
     
+enable_copy_on_write()
 session = get_active_session()
 
 st.set_page_config(page_title= "Streamlit Snowflake Demo", layout = "wide", initial_sidebar_state = "expanded")
 st.title("Streamlit Snowflake Demo")
 st.write("This is a simple Streamlit app connected to Snowflake.")
 
-logo = session.file.get_stream("@DEMO_STREAMLIT_APP.PUBLIC.ASSETS/l1.jpg", decompress=False).read()
+begin_rerun(session)
+
+prefetcher = start_prefetch({
+    "dashboard": lambda: load_yearly_region_sales(session, "All", "All"),
+    "filter_options": lambda: load_filter_options(session),
+    "dropdown_options": lambda: load_dropdown_options(session),
+    "logo": lambda: load_stage_asset(session, LOGO_PATH),
+})
 
-st.sidebar.image(logo)
+logo_slot = st.sidebar.empty()
 st.sidebar.title("Navigation")
 st.sidebar.subheader("Select a page")
 
-#initialize the session state for df to avoid losing data during re-runs
-if 'original_df' not in st.session_state:
-    st.session_state.original_df = session.table("DEMO_STREAMLIT_APP.PUBLIC.SALES")
-
-if 'editable_df' not in st.session_state:
-    st.session_state.editable_df = st.session_state.original_df.to_pandas().copy()
-
 #Initializing session state to track actve page
 if 'active_page' not in st.session_state:
     st.session_state.active_page = "Table"
@@ -36,9 +51,6 @@ if 'active_page' not in st.session_state:
 if 'save_success' not in st.session_state:
     st.session_state.save_success = False
 
-if "saved_df" not in st.session_state:
-    st.session_state.saved_df = st.session_state.editable_df.copy()
-
 if "changes_preview" not in st.session_state:
     st.session_state.changes_preview = None
 
@@ -49,11 +61,43 @@ if st.sidebar.button("Sales Table"):
 if st.sidebar.button("Dashboard"):
     st.session_state.active_page = "Dashboard"
 
-st.sidebar.header("Filters")
+set_page(st.session_state.active_page)
 
+#SALES is only loaded once the Table page is shown, the dashboard does not need it
+if st.session_state.active_page == "Table":
+    if 'original_df' not in st.session_state:
+        st.session_state.original_df = session.table("DEMO_STREAMLIT_APP.PUBLIC.SALES")
+
+    if 'editable_df' not in st.session_state:
+        st.session_state.sales_version = read_change_version(session)
+        with span("setup.to_pandas") as s:
+            st.session_state.editable_df = s.add_frame(load_batched(session, "DEMO_STREAMLIT_APP.PUBLIC.SALES", PK_COLS + MONTH_COLS))
+
+    #The key index of the loaded rows, kept up to date with the editor's delta instead of re-checking the whole table
+    init_edit_journal()
+
+    if "saved_df" not in st.session_state:
+        st.session_state.saved_df = st.session_state.editable_df
+
+#Independent reads run at the same time, the dashboard with the filters as they stood at the start of the rerun
+prefetched_filters = (st.session_state.get("filter_genre", "All"), st.session_state.get("filter_platform", "All"))
+page_reads = {
+    "logo": lambda: load_stage_asset(session, LOGO_PATH),
+    "filter_options": lambda: load_filter_options(session),
+}
+if st.session_state.active_page == "Dashboard":
+    page_reads["yearly"] = lambda: load_yearly_region_sales(session, *prefetched_filters)
+with span("setup.concurrent_reads", reads = len(page_reads)):
+    reads, read_errors = run_concurrently(page_reads)
 
-selected_platform = "All"
-selected_genre = "All"
+if "logo" in reads:
+    logo_slot.image(reads["logo"])
+
+st.sidebar.header("Filters")
+
+filter_options = reads.get("filter_options", {"GENRE": [], "PLATFORM": []})
+selected_platform = st.sidebar.selectbox("Platform", ["All"] + filter_options["PLATFORM"], key = "filter_platform")
+selected_genre = st.sidebar.selectbox("Genre", ["All"] + filter_options["GENRE"], key = "filter_genre")
 
 
 if 'show_uploader' not in st.session_state:
@@ -62,32 +106,14 @@ if 'show_uploader' not in st.session_state:
 if 'uploaded_df' not in st.session_state:
     st.session_state.uploaded_df = None
 
-def get_last10_sales(sp_df):
-    last_year = sp_df.select(col("Year")).agg(smax(col("Year"))).collect()[0][0] 
-    
-    last10_df = (
-        sp_df.filter(col("Year") >= last_year - 10)
-        .group_by("Year")
-        .agg(
-            ssum(col("NA_Sales")).alias("NA_Sales"),
-            ssum(col("EU_Sales")).alias("EU_Sales"),
-            ssum(col("JP_Sales")).alias("JP_Sales"),
-            ssum(col("Other_Sales")).alias("Other_Sales")
-        )
-        .sort(col("Year"))
-        .to_pandas()
-    )
-
-    return last10_df
-
-if "dropdown_df" not in st.session_state:
-    st.session_state.dropdown_df = session.table("DEMO_STREAMLIT_APP.PUBLIC.DROPDOWN_OPTIONS").to_pandas()
+if st.session_state.active_page == "Table" and "dropdown_df" not in st.session_state:
+    st.session_state.dropdown_df = cached_table(session, "DEMO_STREAMLIT_APP.PUBLIC.DROPDOWN_OPTIONS")
 
 @st.dialog("Edit Dropdown Options")
 def edit_dropdowns():
     st.write("Update dropdown values here:")
 
-    dropdown_df = session.table("DEMO_STREAMLIT_APP.PUBLIC.DROPDOWN_OPTIONS").to_pandas()
+    dropdown_df = cached_table(session, "DEMO_STREAMLIT_APP.PUBLIC.DROPDOWN_OPTIONS")
     primary_keys = ["METRIC", "FORECAST", "PRODUCT", "YEAR"]
 
     updated_values = []
@@ -109,45 +135,40 @@ def edit_dropdowns():
     updated_df = pd.concat(updated_values, ignore_index= True)[["COLUMN_NAME", "VALUE"]]
 
     if st.button("Update Dropdowns"):
+        save_dropdown_options(updated_df, dropdown_df)
         st.session_state.dropdown_df = updated_df
-        save_dropdown_options(updated_df)
         st.success("Dropdown options updated successfully!")
         st.rerun()
 
-def save_dropdown_options(df):
+def save_dropdown_options(df, previous_df=None):
     """
-    Overwrites the DROPDOWN_OPTIONS with the values in the edited DataFrame 
+    Writes the difference between the stored DROPDOWN_OPTIONS and the edited DataFrame 
     """
-    df = df[['COLUMN_NAME', 'VALUE']].copy()
+    if previous_df is None:
+        previous_df = cached_table(session, "DEMO_STREAMLIT_APP.PUBLIC.DROPDOWN_OPTIONS")
 
-    records = [tuple(x) for x in df.to_numpy()]
-    session.sql("TRUNCATE TABLE DEMO_STREAMLIT_APP.PUBLIC.DROPDOWN_OPTIONS").collect()
-
-    for record in records:
-        session.sql(f"""
-            INSERT INTO DEMO_STREAMLIT_APP.PUBLIC.DROPDOWN_OPTIONS(COLUMN_NAME, VALUE)
-            VALUES ('{record[0]}', '{record[1]}')
-        """).collect()
+    write_dropdown_options(session, previous_df, df)
+    invalidate_table("DEMO_STREAMLIT_APP.PUBLIC.DROPDOWN_OPTIONS")
+    st.session_state.pop("dropdown_options", None)
 
     st.success("Dropdown table successfully updated!")
 
 def get_dropdown_options():
-    dropdown_df = session.table("DEMO_STREAMLIT_APP.PUBLIC.DROPDOWN_OPTIONS").to_pandas()
-    dropdown_dict = {}
-    for column in ["YEAR", "PRODUCT", "FORECAST", "METRIC"]:
-        dropdown_dict[column] = dropdown_df[dropdown_df['COLUMN_NAME'] == column]['VALUE'].tolist()
-    return dropdown_dict
-
-dropdown_options = get_dropdown_options()
-
-column_config = {}
-for col_name, options in dropdown_options.items():
-    if col_name in st.session_state.editable_df.columns:
-        column_config[col_name] = st.column_config.SelectboxColumn(
-            col_name,
-            options = options,
-            help= f"Select a {col_name}"
-        )
+    if "dropdown_options" not in st.session_state:
+        st.session_state.dropdown_options = load_dropdown_options(session)
+    return st.session_state.dropdown_options.options
+
+if st.session_state.active_page == "Table":
+    dropdown_options = get_dropdown_options()
+
+    column_config = {}
+    for col_name, options in dropdown_options.items():
+        if col_name in st.session_state.editable_df.columns:
+            column_config[col_name] = st.column_config.SelectboxColumn(
+                col_name,
+                options = options,
+                help= f"Select a {col_name}"
+            )
 
 @st.dialog("Add New Row")
 def add_new_dialog():
@@ -181,11 +202,13 @@ def add_new_dialog():
 
             new_row_df = pd.DataFrame([new_row])
 
-            temp_df= pd.concat([st.session_state.temp_editable_df, new_row_df], ignore_index= True)
-            primary_keys = temp_df[["METRIC","FORECAST", "PRODUCT","YEAR"]]
-            
-            if primary_keys.duplicated(keep=False).iloc[-1]:
-                st.error("Duplicate primary keys detected! The combination has to be unique. Please edit the existing cell.")
+            removed_keys, added_keys = editor_delta_keys(st.session_state.editable_df)
+            existing_keys = st.session_state.pk_index.overlay(removed_keys, added_keys)
+            report = validate(new_row_df, dropdown_options, existing_keys)
+
+            if not report.ok:
+                st.error("The new row failed validation. Please correct it.")
+                st.dataframe(report.violations, hide_index = True)
                 existing_df = st.session_state.editable_df
                 duplicate_match = existing_df[
                     (existing_df["METRIC"] == metric) &
@@ -197,7 +220,7 @@ def add_new_dialog():
                     st.dataframe(duplicate_match)
         
             else:
-                st.session_state.editable_df = temp_df.copy()
+                extend_editor(new_row_df, (removed_keys, added_keys + key_tuples(new_row_df)))
                 st.success("Table updated successfully.")
 
 #Display content based on active page
@@ -209,16 +232,19 @@ if st.session_state.active_page == "Table":
         edit_dropdowns()
 
     if "original_df" not in st.session_state or not isinstance(st.session_state.original_df, pd.DataFrame):
-        st.session_state.original_df = st.session_state.editable_df.copy()
+        st.session_state.original_df = st.session_state.editable_df
     
-    edited_df = st.data_editor(st.session_state.editable_df, column_config = column_config, num_rows= "dynamic")
+    with span("editor.data_editor", rows = len(st.session_state.editable_df)):
+        edited_df = st.data_editor(st.session_state.editable_df, column_config = column_config, num_rows= "dynamic", key = editor_key())
     st.info("Edit cells or add new rows to the table.")
     
-    primary_keys = edited_df[["METRIC", "FORECAST", "PRODUCT", "YEAR"]]
-    duplicates = primary_keys[primary_keys.duplicated(keep=False)]
+    with span("editor.duplicate_check"):
+        duplicate_keys = st.session_state.pk_index.conflicts(*editor_delta_keys(st.session_state.editable_df))
 
-    if not duplicates.empty:
+    if duplicate_keys:
         st.error("Duplicate primary keys detected!  The combination has to be unique. Please edit the existing cell.")
+        primary_keys = edited_df[["METRIC", "FORECAST", "PRODUCT", "YEAR"]]
+        duplicates = primary_keys[pd.Series(key_tuples(primary_keys), index = primary_keys.index).isin(duplicate_keys)]
         st.dataframe(duplicates, use_container_width=True)
     else:
         st.session_state.temp_editable_df = edited_df
@@ -230,11 +256,13 @@ if st.session_state.active_page == "Table":
         st.session_state.save_success = False
 
     c1,c2,c3 = st.columns(3)
-    if c1.button("Add new row"):
+    #Adding rows folds the editor's edits into the table, so it waits until they are valid
+    blocked_help = "Fix the duplicate keys first." if duplicate_keys else None
+    if c1.button("Add new row", disabled = bool(duplicate_keys), help = blocked_help):
         add_new_dialog()
         
 
-    if c2.button("Append CSV"):
+    if c2.button("Append CSV", disabled = bool(duplicate_keys), help = blocked_help):
         st.session_state.show_uploader = True
 
     if st.session_state.show_uploader:
@@ -243,41 +271,38 @@ if st.session_state.active_page == "Table":
             st.session_state.uploaded_df = pd.read_csv(uploaded_file)
             st.dataframe(st.session_state.uploaded_df)
 
-            if st.button("Add to the table"):
+            if st.button("Add to the table", disabled = bool(duplicate_keys), help = blocked_help):
                 if "uploaded_df" in st.session_state and st.session_state.uploaded_df is not None:
 
                     uploaded_cols = [col.strip().upper() for col in st.session_state.uploaded_df.columns]
                     st.session_state.uploaded_df.columns = uploaded_cols
-                    
-                    st.session_state.temp_editable_df = pd.concat([st.session_state.temp_editable_df, st.session_state.uploaded_df], ignore_index = True)
-                    st.success("data appended to the table")
-                    st.session_state.uploaded_df = None
-                    st.session_state.show_uploader = False
+
+                    error = header_mismatch(uploaded_cols, list(st.session_state.editable_df.columns))
+                    removed_keys, added_keys = editor_delta_keys(st.session_state.editable_df)
+                    report = None if error else validate(
+                        st.session_state.uploaded_df, dropdown_options,
+                        st.session_state.pk_index.overlay(removed_keys, added_keys)
+                    )
+                    if error:
+                        st.error(f"Cannot append the file. {error}")
+                    elif not report.ok:
+                        st.error(f"{len(report.invalid_rows()):,} rows failed validation. Please correct them.")
+                        st.dataframe(report.violations.head(1000), hide_index = True)
+                    else:
+                        uploaded_df = st.session_state.uploaded_df[list(st.session_state.editable_df.columns)]
+                        extend_editor(uploaded_df, (removed_keys, added_keys + key_tuples(uploaded_df)))
+                        st.success("data appended to the table")
+                        st.session_state.uploaded_df = None
+                        st.session_state.show_uploader = False
 
     if c3.button("Preview Changes"):
         pk_cols = ["METRIC", "FORECAST", "PRODUCT", "YEAR"]
     
-        temp_df = st.session_state.temp_editable_df.copy()
-        original_df = st.session_state.original_df.copy()
-
-        for col_name in pk_cols:
-            temp_df[col_name] = temp_df[col_name].astype(str).str.strip()
-            original_df[col_name] = original_df[col_name].astype(str).str.strip()
-
-        temp_df["_pk"] = temp_df[pk_cols].apply(lambda row: tuple(row), axis=1)
-        original_df["_pk"] = original_df[pk_cols].apply(lambda row: tuple(row), axis=1)
-        
-        added_rows = temp_df[~temp_df["_pk"].isin(original_df["_pk"])].drop(columns="_pk")
-        removed_rows = original_df[~original_df["_pk"].isin(temp_df["_pk"])].drop(columns="_pk")
-        common_pks = temp_df["_pk"].isin(original_df["_pk"])
-        
-        updated_rows = pd.DataFrame()
-
-        for pk in temp_df.loc[common_pks,"_pk"]:
-            row_temp = temp_df[temp_df["_pk"] == pk].drop(columns="_pk").iloc[0]
-            row_orig = original_df[original_df["_pk"] == pk].drop(columns="_pk").iloc[0]
-            if not row_temp.equals(row_orig):
-                updated_rows = pd.concat([updated_rows, pd.DataFrame([row_temp])], ignore_index=True)
+        with span("preview.change_set"):
+            change_set = compute_change_set(st.session_state.original_df, st.session_state.temp_editable_df, pk_cols)
+        added_rows = change_set.added
+        removed_rows = change_set.removed
+        updated_rows = change_set.updated
 
         st.subheader("Changes Preview")
         if not added_rows.empty:
@@ -297,30 +322,19 @@ if st.session_state.active_page == "Table":
 
         if st.button("Save Changes"):
             try:
-                df_to_save = st.session_state.temp_editable_df.copy()
-                df_to_save.columns = [c.upper() for c in df_to_save.columns]
-
-                session.create_dataframe(df_to_save).write.save_as_table("TMP_SALES_STAGE", mode = "overwrite")
-
-                merge_condition = " AND ".join([f"taget.{col} = source.{col}" for col in pk_cols])
-                update_clause = ", ".join([f"{col} = source.{col}" for col in month_cols])
-                insert_columns = ", ".join(df_to_save.columns)
-                insert_values = ", ".join([f"source.{c}" for c in df_to_save.columns])
-
-                session.sql(f"""
-                    MERGE INTO DEMO_STREAMLIT_APP.PUBLIC.SALES AS target
-                    USING TMP_SALES_STAGE AS source
-                    ON {merge_condition}
-                    WHEN MATCHED THEN
-                        UPDATE SET {update_clause}
-                    WHEN NOT MATCHED THEN
-                        INSERT ({insert_columns})
-                        VALUES ({insert_values})
-                """).collect()
-                
-                refreshed_df = session.table("DEMO_STREAMLIT_APP.PUBLIC.SALES").to_pandas()
-                st.session_state.editable_df = refreshed_df.copy()
-                st.session_state.original_df = refreshed_df.copy()
+                cancel_prefetch()
+                save_result = save_change_set(session, change_set)
+
+                invalidate_table("DEMO_STREAMLIT_APP.PUBLIC.SALES")
+                #The saved changes are applied to the loaded rows, SALES is only read again when another session changed it
+                refreshed_df = apply_saved_changes(st.session_state.original_df, change_set, st.session_state.sales_version, save_result)
+                if refreshed_df is None:
+                    st.session_state.sales_version = read_change_version(session)
+                    refreshed_df = cached_table(session, "DEMO_STREAMLIT_APP.PUBLIC.SALES", PK_COLS + MONTH_COLS)
+                else:
+                    st.session_state.sales_version = save_result["version"]
+                rebase_editor(refreshed_df)
+                st.session_state.original_df = refreshed_df
             
                 st.success("Changes saved")
                 st.rerun()
@@ -330,26 +344,24 @@ if st.session_state.active_page == "Table":
 
 #Display for the dashboard
 if st.session_state.active_page == "Dashboard":
+    import plotly.express as px
+
     st.header("Sales Analysis")
 
-    #Snowpark DataFrame
-    sp_df = session.table("DEMO_STREAMLIT_APP.PUBLIC.VGSALES")
-    if selected_genre != "All":
-        sp_df = sp_df.filter(col("Genre") == selected_genre)
-    if selected_platform != "All":
-        sp_df = sp_df.filter(col("Platform") == selected_platform)
-
-    totals_df = sp_df.agg(
-        ssum(col("NA_Sales")).alias("NA_Sales"),
-        ssum(col("EU_Sales")).alias("EU_Sales"),
-        ssum(col("JP_Sales")).alias("JP_Sales"),
-        ssum(col("Global_Sales")).alias("Global_Sales")
-    ).to_pandas()
-    
-    total_NA_sales = totals_df["NA_SALES"].iloc[0]
-    total_EU_sales = totals_df["EU_SALES"].iloc[0]
-    total_JP_sales = totals_df["JP_SALES"].iloc[0]
-    total_global_sales = totals_df["GLOBAL_SALES"].iloc[0]
+    if "yearly" in read_errors:
+        st.error(f"Sales query failed: {read_errors['yearly']}")
+        st.stop()
+    if "yearly" in reads and prefetched_filters == (selected_genre, selected_platform):
+        yearly_df = reads["yearly"]
+    else:
+        with span("dashboard.load"):
+            yearly_df = load_yearly_region_sales(session, selected_genre, selected_platform)
+    totals = sales_totals(yearly_df)
+
+    total_NA_sales = totals["NA_SALES"]
+    total_EU_sales = totals["EU_SALES"]
+    total_JP_sales = totals["JP_SALES"]
+    total_global_sales = totals["GLOBAL_SALES"]
     
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Total Sales to Date", f"${total_global_sales:,.2f}")
@@ -357,30 +369,18 @@ if st.session_state.active_page == "Dashboard":
     c3.metric("European Union Sales to Date", f"${total_EU_sales:,.2f}")
     c4.metric("Japan Sales to Date", f"${total_JP_sales:,.2f}")
 
-    pdf = sp_df.to_pandas().copy()
-    
-    
     col1, col2 = st.columns(2)
     col1.subheader("Total sales per year")
-    pdf['YEAR'] = pd.to_numeric(pdf['YEAR'], errors = 'coerce')
-    pdf = pdf.dropna(subset = ["YEAR"])
-    pdf = pdf.sort_values('YEAR')
-
-    yearly_sales = (
-        sp_df.group_by("YEAR")
-        .agg(ssum(col("Global_Sales")).alias("Global_Sales"))
-        .to_pandas()
-        .sort_values("YEAR")
-    )
     
-    fig = px.line(yearly_sales, x="YEAR", y="GLOBAL_SALES",markers= True)
+    fig = px.line(yearly_sales(yearly_df), x="YEAR", y="GLOBAL_SALES",markers= True)
     fig.update_layout(yaxis_title="Sales ($)", xaxis_title= "Year")
-    col1.plotly_chart(fig, use_container_width= True)
+    with span("dashboard.plotly"):
+        col1.plotly_chart(fig, use_container_width= True)
 
     col2.subheader("Distribution of Sales (Last 10 Years)")
       
     
-    last10_df = get_last10_sales(sp_df)
+    last10_df = last_n_years_sales(yearly_df, 10)
     
     melted_df = last10_df.melt(
         id_vars='YEAR',
@@ -402,4 +402,8 @@ if st.session_state.active_page == "Dashboard":
         uniformtext_minsize = 8,
         uniformtext_mode = 'hide'
     )
-    col2.plotly_chart(fig2, use_container_width= True)
\ No newline at end of file
+    with span("dashboard.plotly"):
+        col2.plotly_chart(fig2, use_container_width= True)
+
+end_rerun()
+render_trace_panel({**get_query_cache().stats(), "prefetch": prefetcher.status()})
@@ -0,0 +1,352 @@
+"""
+Per-rerun performance tracing.
+
+A trace is opened at the top of the script with begin_rerun and closed with
+end_rerun. In between, span() times a block and traced() a function. Snowpark
+queries are counted through session.query_history(), and the bytes of the pandas
+frames that spans materialise are added up. When tracing is off, span() returns a
+shared no-op object, so instrumented code pays one thread-local lookup.
+
+Tracing is enabled by the sidebar panel's checkbox or for every session with
+APP_TRACE=1. Finished reruns are kept in the session for the panel and, when
+APP_TRACE_FILE is set, appended to that file. A path ending in .json gets the
+Chrome trace event format (open it in chrome://tracing or Perfetto); any other
+path gets one JSON object per rerun.
+"""
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+import pandas as pd
+import streamlit as st
+
+TRACE_ENV = "APP_TRACE"
+TRACE_FILE_ENV = "APP_TRACE_FILE"
+PANEL_KEY = "perf_trace_enabled"
+PANEL_RERUNS = 20
+
+_local = threading.local()
+_file_lock = threading.Lock()
+
+
+def frame_bytes(value):
+    """
+    Returns:
+        int : The memory of a pandas frame or series, 0 for anything else
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage().sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage())
+    return 0
+
+
+class RerunTrace:
+    """
+    The spans, query count and result bytes of one script run.
+    """
+    def __init__(self, session=None, page=None):
+        self.rerun_id = uuid.uuid4().hex[:8]
+        self.page = page
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self.result_bytes = 0
+        self._history = None
+        if session is not None:
+            try:
+                self._history = session.query_history()
+            except Exception:
+                self._history = None
+
+    def query_count(self):
+        return len(self._history.queries) if self._history is not None else 0
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self._start) * 1000
+
+    def incr(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self, status="ok"):
+        """
+        Stops listening for queries.
+
+        Returns:
+            dict : The rerun summary with its spans
+        """
+        queries = self.query_count()
+        if self._history is not None:
+            self._history.__exit__(None, None, None)
+            self._history = None
+        return {
+            "rerun_id": self.rerun_id,
+            "page": self.page,
+            "started_at": self.started_at,
+            "duration_ms": round(self.elapsed_ms(), 3),
+            "status": status,
+            "queries": queries,
+            "result_bytes": self.result_bytes,
+            "counters": dict(self.counters),
+            "spans": self.spans,
+        }
+
+
+class _Span:
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        trace = self.trace
+        self._depth = getattr(_local, "depth", 0)
+        _local.depth = self._depth + 1
+        self._queries = trace.query_count()
+        self._start_ms = trace.elapsed_ms()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        trace = self.trace
+        _local.depth = self._depth
+        end_ms = trace.elapsed_ms()
+        record = {
+            "name": self.name,
+            "start_ms": round(self._start_ms, 3),
+            "duration_ms": round(end_ms - self._start_ms, 3),
+            "depth": self._depth,
+            "queries": trace.query_count() - self._queries,
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record.update(self.attrs)
+        trace.spans.append(record)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add_frame(self, value):
+        """
+        Records the bytes of a materialised pandas result on the span and the rerun.
+        """
+        n = frame_bytes(value)
+        if n:
+            self.attrs["bytes"] = self.attrs.get("bytes", 0) + n
+            self.attrs["rows"] = self.attrs.get("rows", 0) + len(value)
+            self.trace.result_bytes += n
+        return value
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def add_frame(self, value):
+        return value
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def current_trace():
+    """
+    Returns:
+        RerunTrace : The trace of the current thread, None when tracing is off
+    """
+    return getattr(_local, "trace", None)
+
+
+def attach_trace(trace):
+    """
+    Makes trace the current trace of this thread, for work handed to a worker thread.
+    """
+    _local.trace = trace
+
+
+def span(name, **attrs):
+    """
+    Times a block: `with span("editor.duplicate_check") as s: ...`.
+
+    Args:
+        name (str) : Dotted span name
+        **attrs : Extra values stored on the span
+    """
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name, attrs)
+
+
+def traced(name):
+    """
+    Decorator that wraps every call of a function in a span.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, "trace", None) is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def incr(name, n=1):
+    """
+    Adds n to a per-rerun counter, such as cache hits.
+    """
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.incr(name, n)
+
+
+def tracing_enabled():
+    return os.environ.get(TRACE_ENV, "").lower() in ("1", "true", "yes") or bool(st.session_state.get(PANEL_KEY))
+
+
+def begin_rerun(session, page=None):
+    """
+    Opens the trace of this script run when tracing is enabled.
+
+    A trace left open by a run that ended in st.rerun() or an exception is
+    closed first and kept with the status "interrupted".
+    """
+    stale = st.session_state.pop("_perf_trace", None)
+    if stale is not None:
+        _store(stale.finish("interrupted"))
+    _local.trace = None
+
+    if not tracing_enabled():
+        return None
+    trace = RerunTrace(session, page)
+    _local.trace = trace
+    st.session_state["_perf_trace"] = trace
+    return trace
+
+
+def set_page(page):
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.page = page
+
+
+def end_rerun():
+    """
+    Closes the trace of this script run and stores its summary.
+    """
+    trace = st.session_state.pop("_perf_trace", None)
+    _local.trace = None
+    if trace is not None:
+        _store(trace.finish())
+
+
+def _store(summary):
+    if "perf_reruns" not in st.session_state:
+        st.session_state.perf_reruns = deque(maxlen = PANEL_RERUNS)
+    st.session_state.perf_reruns.append(summary)
+
+    path = os.environ.get(TRACE_FILE_ENV)
+    if path:
+        write_trace(path, summary)
+
+
+def chrome_events(summary, pid=None):
+    """
+    Converts a rerun summary into Chrome trace "complete" events, timestamps in microseconds.
+    """
+    pid = pid if pid is not None else os.getpid()
+    start_us = summary["started_at"] * 1_000_000
+    tid = summary["rerun_id"]
+    events = [{
+        "name": f"rerun {summary['page'] or ''}".strip(),
+        "cat": "rerun",
+        "ph": "X",
+        "ts": start_us,
+        "dur": summary["duration_ms"] * 1000,
+        "pid": pid,
+        "tid": tid,
+        "args": {k: summary[k] for k in ("status", "queries", "result_bytes", "counters")},
+    }]
+    for s in summary["spans"]:
+        events.append({
+            "name": s["name"],
+            "cat": "span",
+            "ph": "X",
+            "ts": start_us + s["start_ms"] * 1000,
+            "dur": s["duration_ms"] * 1000,
+            "pid": pid,
+            "tid": tid,
+            "args": {k: v for k, v in s.items() if k not in ("name", "start_ms", "duration_ms")},
+        })
+    return events
+
+
+def write_trace(path, summary):
+    """
+    Appends a rerun summary to a JSONL file, or to a Chrome trace file when path ends in .json.
+
+    The Chrome trace array is left unterminated, which the trace viewers accept, so
+    that each rerun is a plain append.
+    """
+    with _file_lock:
+        if path.endswith(".json"):
+            new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+            with open(path, "a") as f:
+                if new_file:
+                    f.write("[\n")
+                for event in chrome_events(summary):
+                    f.write(json.dumps(event, default=str) + ",\n")
+        else:
+            with open(path, "a") as f:
+                f.write(json.dumps(summary, default=str) + "\n")
+
+
+def render_trace_panel(cache_stats=None):
+    """
+    Sidebar panel with the opt-in checkbox and the last reruns of this session.
+
+    Args:
+        cache_stats (dict) : Optional QueryCache.stats() to show under the reruns
+    """
+    with st.sidebar.expander("⏱️ Performance"):
+        st.checkbox("Trace reruns", key = PANEL_KEY)
+        reruns = list(st.session_state.get("perf_reruns", []))
+        if not reruns:
+            st.caption("No traced reruns yet.")
+        else:
+            summary_df = pd.DataFrame([
+                {
+                    "rerun": r["rerun_id"],
+                    "page": r["page"],
+                    "ms": round(r["duration_ms"], 1),
+                    "queries": r["queries"],
+                    "KB": round(r["result_bytes"] / 1024, 1),
+                    "status": r["status"],
+                }
+                for r in reversed(reruns)
+            ])
+            st.dataframe(summary_df, hide_index = True, use_container_width = True)
+
+            chosen = st.selectbox("Spans of rerun", summary_df["rerun"].tolist(), key = "perf_trace_rerun")
+            spans = next(r["spans"] for r in reruns if r["rerun_id"] == chosen)
+            if spans:
+                spans_df = pd.DataFrame(spans).sort_values("start_ms")
+                spans_df["name"] = ["  " * d + n for d, n in zip(spans_df["depth"], spans_df["name"])]
+                st.dataframe(spans_df.drop(columns = ["depth"]), hide_index = True, use_container_width = True)
+
+        if cache_stats:
+            st.caption("Query cache")
+            st.json(cache_stats, expanded = False)
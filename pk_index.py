@@ -0,0 +1,97 @@
+"""
+Hash index of the primary keys of the frame shown in the editor.
+
+The index counts the rows per (METRIC, FORECAST, PRODUCT, YEAR) key. It is built
+once when a table is loaded and then updated with the keys that an edit, add,
+append or delete removes and adds, so duplicate checks cost O(changed rows)
+instead of a duplicated() pass over the whole table.
+"""
+from collections import Counter
+
+from change_set import key_tuples
+from constants import PK_COLS
+
+
+class PrimaryKeyIndex:
+    def __init__(self, keys=()):
+        self._counts = Counter(keys)
+        self._dupes = {k for k, n in self._counts.items() if n > 1}
+
+    @classmethod
+    def from_frame(cls, df, pk_cols=PK_COLS):
+        """
+        Builds the index of every row key of df.
+        """
+        return cls(key_tuples(df, pk_cols))
+
+    def __len__(self):
+        return sum(self._counts.values())
+
+    def __contains__(self, key):
+        return self._counts.get(key, 0) > 0
+
+    def count(self, key):
+        return self._counts.get(key, 0)
+
+    def duplicates(self):
+        """
+        Returns:
+            set : Keys held by more than one row
+        """
+        return set(self._dupes)
+
+    def _set(self, key, n):
+        if n > 0:
+            self._counts[key] = n
+        else:
+            self._counts.pop(key, None)
+        if n > 1:
+            self._dupes.add(key)
+        else:
+            self._dupes.discard(key)
+
+    def apply(self, removed_keys=(), added_keys=()):
+        """
+        Updates the index in place with the keys a change removed and added.
+        """
+        for key in removed_keys:
+            self._set(key, self.count(key) - 1)
+        for key in added_keys:
+            self._set(key, self.count(key) + 1)
+
+    def conflicts(self, removed_keys=(), added_keys=()):
+        """
+        Finds the keys that would be duplicated after a change, without applying it.
+
+        Args:
+            removed_keys (list) : Keys of rows the change deletes or re-keys
+            added_keys (list) : Keys of rows the change adds or re-keys to
+
+        Returns:
+            set : Keys held by more than one row once the change is applied
+        """
+        delta = Counter(added_keys)
+        delta.subtract(Counter(removed_keys))
+        bad = {k for k, d in delta.items() if self.count(k) + d > 1}
+        bad |= {k for k in self._dupes if k not in delta}
+        return bad
+
+    def overlay(self, removed_keys=(), added_keys=()):
+        """
+        Returns:
+            KeyOverlay : A read-only membership view of the index with a change applied
+        """
+        return KeyOverlay(self, removed_keys, added_keys)
+
+
+class KeyOverlay:
+    """
+    Membership test against a PrimaryKeyIndex plus a pending change, without copying the index.
+    """
+    def __init__(self, index, removed_keys=(), added_keys=()):
+        self._index = index
+        self._delta = Counter(added_keys)
+        self._delta.subtract(Counter(removed_keys))
+
+    def __contains__(self, key):
+        return self._index.count(key) + self._delta.get(key, 0) > 0
@@ -0,0 +1,131 @@
+"""
+Background warm-up of the reads a session is about to need.
+
+At session startup the Prefetcher submits the dashboard aggregate, the dropdown
+options and the stage assets to a small background pool, so they load into the
+shared caches while the first rerun is still reading SALES. Prefetches go through
+the same cached loaders as the script: a rerun that asks for data a prefetch is
+loading waits for that load (see SingleFlight) instead of querying again, and one
+that asks for data already prefetched is a cache hit.
+
+Tasks are deduplicated by name while they are pending or running. Cancelling
+drops the tasks that have not started; a running query is left to finish, its
+result simply lands in the cache.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+PREFETCH_WORKERS = 2
+
+
+@st.cache_resource
+def get_prefetch_pool():
+    """
+    Returns:
+        ThreadPoolExecutor : The process-wide background pool, separate from the query pool so
+            warm-ups never delay the concurrent reads of a rerun
+    """
+    return ThreadPoolExecutor(max_workers = PREFETCH_WORKERS, thread_name_prefix = "app-prefetch")
+
+
+class Prefetcher:
+    """
+    Attributes:
+        cancelled (bool) : Set once cancel() was called; later submissions are ignored
+    """
+    def __init__(self, pool=None, ctx=None):
+        self.pool = pool or get_prefetch_pool()
+        self.ctx = ctx
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._errors = {}
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def _run(self, name, func):
+        if self._cancel.is_set():
+            return None
+        if self.ctx is not None:
+            add_script_run_ctx(ctx = self.ctx)
+        try:
+            return func()
+        except Exception as e:
+            # A failed warm-up only costs the foreground its own query
+            self._errors[name] = e
+            return None
+
+    def submit(self, name, func):
+        """
+        Queues func on the background pool unless a task of the same name is pending or running.
+
+        Returns:
+            Future : The task's future, None after cancel()
+        """
+        with self._lock:
+            if self._cancel.is_set():
+                return None
+            future = self._futures.get(name)
+            if future is not None and not future.done():
+                return future
+            future = self._futures[name] = self.pool.submit(self._run, name, func)
+            return future
+
+    def cancel(self):
+        """
+        Stops the prefetches that have not started yet.
+        """
+        self._cancel.set()
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+
+    def status(self):
+        """
+        Returns:
+            dict : Task name -> "pending", "running", "done", "failed" or "cancelled"
+        """
+        with self._lock:
+            futures = dict(self._futures)
+        status = {}
+        for name, future in futures.items():
+            if future.cancelled():
+                status[name] = "cancelled"
+            elif not future.done():
+                status[name] = "running" if future.running() else "pending"
+            else:
+                status[name] = "failed" if name in self._errors else "done"
+        return status
+
+
+def start_prefetch(tasks):
+    """
+    Starts the warm-up once per session; later reruns reuse the session's Prefetcher.
+
+    Args:
+        tasks (dict) : Name -> callable that loads through one of the cached loaders
+
+    Returns:
+        Prefetcher : The session's prefetcher
+    """
+    prefetcher = st.session_state.get("prefetcher")
+    if prefetcher is None:
+        prefetcher = Prefetcher(ctx = get_script_run_ctx())
+        for name, func in tasks.items():
+            prefetcher.submit(name, func)
+        st.session_state.prefetcher = prefetcher
+    return prefetcher
+
+
+def cancel_prefetch():
+    """
+    Cancels the session's pending prefetches, e.g. before a save changes the tables they read.
+    """
+    prefetcher = st.session_state.get("prefetcher")
+    if prefetcher is not None:
+        prefetcher.cancel()
@@ -0,0 +1,222 @@
+"""
+Result cache for the Snowpark reads, shared by every session of the app.
+
+Entries are keyed by the tables they read and the query parameters, expire after
+a TTL and are evicted least-recently-used once the cache is full. Each entry also
+remembers the version of its tables when it was loaded: a counter bumped by our
+own save paths plus the table's LAST_ALTERED timestamp, which is re-checked at
+most once per version_check_seconds. A version mismatch is treated as a miss.
+Concurrent misses on the same entry run the query once; the other callers wait for it.
+
+Cached frames are shared between sessions and must be treated as read-only.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import streamlit as st
+
+from batch_loader import load_batched
+from concurrent_queries import SingleFlight
+from perf_trace import incr, span
+
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_TTL_SECONDS = 15 * 60
+DEFAULT_VERSION_CHECK_SECONDS = 60
+
+
+class QueryCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 version_check_seconds=DEFAULT_VERSION_CHECK_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version_check_seconds = version_check_seconds
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._counters = defaultdict(int)
+        self._last_altered = {}
+        self._checked_at = {}
+        self._flights = SingleFlight()
+
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _refresh_last_altered(self, session, tables):
+        """
+        Re-reads LAST_ALTERED for the tables whose last check is older than version_check_seconds.
+        """
+        now = time.monotonic()
+        with self._lock:
+            stale = [t for t in tables if now - self._checked_at.get(t, float("-inf")) >= self.version_check_seconds]
+            for table in stale:
+                self._checked_at[table] = now
+        if not stale or session is None:
+            return
+
+        by_database = defaultdict(list)
+        for table in stale:
+            database, schema, name = table.split(".")
+            by_database[database].append((schema, name, table))
+
+        for database, entries in by_database.items():
+            placeholders = ", ".join(["(?, ?)"] * len(entries))
+            try:
+                rows = session.sql(
+                    f"SELECT TABLE_SCHEMA, TABLE_NAME, LAST_ALTERED FROM {database}.INFORMATION_SCHEMA.TABLES "
+                    f"WHERE (TABLE_SCHEMA, TABLE_NAME) IN ({placeholders})",
+                    params = [v for schema, name, _ in entries for v in (schema, name)],
+                ).collect()
+            except Exception:
+                # Without access to INFORMATION_SCHEMA the local counters still invalidate our own saves
+                continue
+            altered = {(row[0], row[1]): row[2] for row in rows}
+            with self._lock:
+                for schema, name, table in entries:
+                    self._last_altered[table] = altered.get((schema, name))
+
+    def _versions(self, tables):
+        return tuple((t, self._counters[t], self._last_altered.get(t)) for t in tables)
+
+    def get_or_load(self, session, tables, key, loader):
+        """
+        Returns the cached result for key, calling loader() on a miss.
+
+        Args:
+            session (Session) : The active Snowpark session, used for the LAST_ALTERED check
+            tables (list) : Fully qualified names of the tables the query reads
+            key (tuple) : Query name and filter parameters
+            loader (callable) : Runs the query and returns its result
+
+        Returns:
+            The (shared, read-only) query result
+        """
+        tables = tuple(sorted(set(tables)))
+        full_key = (tables, key)
+        self._refresh_last_altered(session, tables)
+
+        with self._lock:
+            versions = self._versions(tables)
+            entry = self._entries.get(full_key)
+            if entry is not None:
+                value, loaded_at, entry_versions = entry
+                if entry_versions == versions and time.monotonic() - loaded_at < self.ttl_seconds:
+                    self._entries.move_to_end(full_key)
+                    self.hits += 1
+                    incr("cache_hits")
+                    return value
+                del self._entries[full_key]
+
+        def load():
+            with self._lock:
+                self.misses += 1
+            incr("cache_misses")
+            with span("cache.load", query = str(key[0])) as s:
+                value = s.add_frame(loader())
+            self._store(full_key, value, versions)
+            return value
+
+        # A load of the same entry already running (e.g. the background prefetch) is waited for, not repeated
+        value, shared = self._flights.do((full_key, versions), load)
+        if shared:
+            with self._lock:
+                self.waits += 1
+            incr("cache_waits")
+        return value
+
+    def _store(self, full_key, value, versions):
+        with self._lock:
+            self._entries[full_key] = (value, time.monotonic(), versions)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, session, tables, key, value):
+        """
+        Stores a result computed without running its query, such as a frame
+        brought up to date locally after our own save, under the current table versions.
+        """
+        tables = tuple(sorted(set(tables)))
+        with self._lock:
+            for table in tables:
+                self._checked_at.pop(table, None)
+        self._refresh_last_altered(session, tables)
+        with self._lock:
+            versions = self._versions(tables)
+        self._store((tables, key), value, versions)
+
+    def invalidate(self, table):
+        """
+        Bumps the version of a table after we changed it and drops every entry that read it.
+        """
+        with self._lock:
+            self._counters[table] += 1
+            self._checked_at.pop(table, None)
+            stale = [k for k in self._entries if table in k[0]]
+            for k in stale:
+                del self._entries[k]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict : Hit/miss/wait counters, hit rate and current size
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "waits": self.waits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+@st.cache_resource
+def get_query_cache():
+    """
+    Returns:
+        QueryCache : The process-wide cache shared by all sessions
+    """
+    return QueryCache()
+
+
+def cached_query(session, tables, key, loader):
+    """
+    Shortcut for get_query_cache().get_or_load(...).
+    """
+    return get_query_cache().get_or_load(session, tables, key, loader)
+
+
+def cached_table(session, table_name, columns=None):
+    """
+    Args:
+        columns (list) : Columns to fetch, None for all of them
+
+    Returns:
+        pd.DataFrame : The table as pandas, shared and read-only
+    """
+    key = ("table", table_name, tuple(columns) if columns else None)
+    return cached_query(session, [table_name], key, lambda: load_batched(session, table_name, columns))
+
+
+def store_query(session, tables, key, value):
+    """
+    Shortcut for get_query_cache().put(...).
+    """
+    get_query_cache().put(session, tables, key, value)
+
+
+def invalidate_table(table_name):
+    get_query_cache().invalidate(table_name)
@@ -0,0 +1,187 @@
+"""
+Typed load/save layer for the SALES working set.
+
+The key columns are held as categoricals whose categories are the DROPDOWN_OPTIONS
+values (plus any stored value missing from them), and the month columns as
+float32 wherever every loaded value survives the round trip to float32 and back
+through to_storage_frame exactly. to_storage_frame undoes both before rows are
+staged for the MERGE.
+"""
+import numpy as np
+import pandas as pd
+
+from constants import DROPDOWN_TABLE, MONTH_COLS, PK_COLS
+from query_cache import cached_table
+
+
+def key_categories(dropdown_df, pk_cols=PK_COLS):
+    """
+    Returns:
+        dict : Key column -> list of its DROPDOWN_OPTIONS values
+    """
+    if dropdown_df is None or dropdown_df.empty:
+        return {c: [] for c in pk_cols}
+    options = dropdown_df[["COLUMN_NAME", "VALUE"]].dropna()
+    return {
+        c: options.loc[options["COLUMN_NAME"] == c, "VALUE"].astype(str).unique().tolist()
+        for c in pk_cols
+    }
+
+
+def _fits_float32(values):
+    """
+    Returns:
+        bool : True when every value converts to float32 and back through _restore_float32,
+            the way to_storage_frame widens it, unchanged
+    """
+    values = np.asarray(values, dtype=np.float64)
+    narrow = values.astype(np.float32)
+    # Most columns that do not fit already fail the exact comparison, without the slower restore
+    if not np.array_equal(narrow.astype(np.float64), values, equal_nan=True):
+        return False
+    return bool(np.array_equal(_restore_float32(narrow), values, equal_nan=True))
+
+
+def to_compact_frame(df, categories=None, pk_cols=PK_COLS, month_cols=MONTH_COLS):
+    """
+    Converts a SALES frame to its compact in-memory representation.
+
+    Args:
+        df (pd.DataFrame) : SALES rows as returned by to_pandas()
+        categories (dict) : Key column -> category domain, usually key_categories(dropdown_df)
+        pk_cols (list) : The key columns
+        month_cols (list) : The month value columns
+
+    Returns:
+        pd.DataFrame : A new frame with categorical keys and float32 months where lossless
+    """
+    categories = categories or {}
+    df = df.copy(deep=False)
+    for col_name in pk_cols:
+        if col_name not in df.columns:
+            continue
+        values = df[col_name]
+        if not pd.api.types.is_string_dtype(values):
+            values = values.where(values.isna(), values.astype(str))
+        present = pd.Categorical(values)
+        domain = list(categories.get(col_name, []))
+        known = set(domain)
+        domain += [v for v in present.categories if v not in known]
+        df[col_name] = present.set_categories(domain)
+    for col_name in month_cols:
+        if col_name in df.columns and pd.api.types.is_numeric_dtype(df[col_name]) and _fits_float32(df[col_name]):
+            df[col_name] = df[col_name].astype(np.float32)
+    return df
+
+
+def _restore_float32(values):
+    """
+    Widens float32 values to float64. Integral values are exact; fractional ones go
+    through their shortest decimal form so that 0.1 typed in the editor stays 0.1.
+    """
+    wide = values.astype(np.float64)
+    fractional = np.isfinite(wide) & (wide != np.floor(wide))
+    if fractional.any():
+        wide[fractional] = [float(str(v)) for v in values[fractional]]
+    return wide
+
+
+def to_storage_frame(df):
+    """
+    Converts a compact frame back to the plain dtypes written to SALES.
+
+    Returns:
+        pd.DataFrame : A new frame with object keys and float64 months
+    """
+    df = df.copy(deep=False)
+    for col_name in df.columns:
+        column = df[col_name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            df[col_name] = column.astype(object).where(column.notna(), None)
+        elif column.dtype == np.float32:
+            df[col_name] = pd.Series(_restore_float32(column.to_numpy()), index = column.index)
+    return df
+
+
+def widen_for(df, incoming):
+    """
+    Widens the float32 columns of df that cannot hold every value about to be written
+    into them, so that a compact frame stays lossless as it is edited.
+
+    Args:
+        df (pd.DataFrame) : A compact frame
+        incoming (list) : Frames (or dicts of lists) of the values to write, by column name
+
+    Returns:
+        pd.DataFrame : df itself when nothing had to be widened, a shallow copy otherwise
+    """
+    widened = df
+    for col_name in df.columns:
+        if df[col_name].dtype != np.float32:
+            continue
+        values = [v for part in incoming if col_name in part for v in list(part[col_name])]
+        if values and not _fits_float32(pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")):
+            if widened is df:
+                widened = df.copy(deep=False)
+            widened[col_name] = to_storage_frame(df[[col_name]])[col_name]
+    return widened
+
+
+def _extend_categories(column, values):
+    """
+    Returns column with any new value of values added to its categories, and values as that categorical.
+    """
+    values = pd.Series(values, dtype=object)
+    values = values.where(values.isna(), values.astype(str))
+    known = set(column.cat.categories)
+    new = [v for v in pd.unique(values.dropna()) if v not in known]
+    if new:
+        column = column.cat.add_categories(new)
+    return column, pd.Categorical(values, categories = column.cat.categories)
+
+
+def assign_compact(column, positions, values):
+    """
+    Returns a copy of a compact column with values written at positions; new key values
+    extend the categories. Call widen_for first so float32 columns can hold the values.
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        column, values = _extend_categories(column, values)
+    else:
+        values = pd.array(values, dtype=column.dtype)
+    column = column.copy()
+    column.iloc[positions] = values
+    return column
+
+
+def append_compact_rows(df, rows):
+    """
+    Appends plain rows to a compact frame without losing the compact dtypes.
+
+    Args:
+        df (pd.DataFrame) : A compact frame
+        rows (pd.DataFrame) : The rows to append, with plain dtypes
+
+    Returns:
+        pd.DataFrame : A new frame with a fresh RangeIndex
+    """
+    df = widen_for(df, [rows])
+    rows = rows.reindex(columns = df.columns)
+    extended = {}
+    for col_name in df.columns:
+        column = df[col_name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            column, rows[col_name] = _extend_categories(column, rows[col_name].to_numpy())
+            extended[col_name] = column
+        else:
+            rows[col_name] = rows[col_name].astype(column.dtype)
+    if extended:
+        df = df.assign(**extended)
+    return pd.concat([df, rows], ignore_index = True)
+
+
+def compact_rows(session, df):
+    """
+    Converts rows fetched outside the SALES snapshot (a page, a key lookup) to the compact representation.
+    """
+    return to_compact_frame(df, key_categories(cached_table(session, DROPDOWN_TABLE)))
@@ -0,0 +1,181 @@
+"""
+Keyset pagination over SALES for the paginated editor mode.
+
+Pages are ordered by the (METRIC, FORECAST, PRODUCT, YEAR) key, optionally with
+one key column moved to the front, and each page starts strictly after the last
+key of the previous one, so fetching page n never scans the n - 1 pages before it.
+Filters and sorting run on the warehouse side.
+"""
+import pandas as pd
+
+from constants import PK_COLS, SALES_TABLE
+from change_set import key_tuples
+from edit_journal import replay_journal, staged_keys
+from perf_trace import span
+from query_cache import cached_query
+
+PAGE_SIZE = 1000
+PAGINATION_THRESHOLD = 200_000
+KEY_LOOKUP_CHUNK = 1000
+
+
+def order_columns(sort_col=None, pk_cols=PK_COLS):
+    """
+    Returns:
+        list : The key columns with sort_col moved to the front
+    """
+    if sort_col is None:
+        return list(pk_cols)
+    return [sort_col] + [c for c in pk_cols if c != sort_col]
+
+
+def keyset_predicate(columns, cursor, descending=False):
+    """
+    Builds the lexicographic "after cursor" condition for the given column order.
+
+    Args:
+        columns (list) : The ORDER BY columns
+        cursor (tuple) : Values of those columns on the last row of the previous page
+        descending (bool) : Whether the page order is descending
+
+    Returns:
+        tuple : (SQL condition, list of bound parameters)
+    """
+    op = "<" if descending else ">"
+    clauses = []
+    params = []
+    for i, column in enumerate(columns):
+        equal_part = [f"{c} = ?" for c in columns[:i]]
+        clauses.append("(" + " AND ".join(equal_part + [f"{column} {op} ?"]) + ")")
+        params.extend(cursor[:i])
+        params.append(cursor[i])
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+def _where(filters, cursor, columns, descending):
+    conditions = []
+    params = []
+    for column, value in filters.items():
+        conditions.append(f"{column} = ?")
+        params.append(value)
+    if cursor is not None:
+        condition, cursor_params = keyset_predicate(columns, cursor, descending)
+        conditions.append(condition)
+        params.extend(cursor_params)
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+
+def fetch_page(session, filters=None, sort_col=None, descending=False, cursor=None, page_size=PAGE_SIZE):
+    """
+    Fetches one page of SALES.
+
+    Args:
+        session (Session) : The active Snowpark session
+        filters (dict) : Key column -> required value
+        sort_col (str) : Key column to sort on first
+        descending (bool) : Sort direction
+        cursor (tuple) : Order-column values of the last row of the previous page, None for the first page
+        page_size (int) : Rows per page
+
+    Returns:
+        tuple : (page as pd.DataFrame, cursor of the next page or None on the last page)
+    """
+    columns = order_columns(sort_col)
+    where, params = _where(filters or {}, cursor, columns, descending)
+    direction = " DESC" if descending else ""
+    order_by = ", ".join([f"{c}{direction}" for c in columns])
+
+    with span("pager.fetch_page") as s:
+        page = s.add_frame(session.sql(
+            f"SELECT * FROM {SALES_TABLE}{where} ORDER BY {order_by} LIMIT {int(page_size) + 1}",
+            params = params,
+        ).to_pandas())
+
+    if len(page) <= page_size:
+        return page.reset_index(drop=True), None
+
+    page = page.iloc[:page_size].reset_index(drop=True)
+    next_cursor = tuple(page.iloc[-1][columns].tolist())
+    return page, next_cursor
+
+
+def _key_in_list(keys, pk_cols=PK_COLS):
+    placeholders = ", ".join(["(" + ", ".join(["?"] * len(pk_cols)) + ")"] * len(keys))
+    return f"({', '.join(pk_cols)}) IN ({placeholders})", [v for key in keys for v in key]
+
+
+def fetch_rows_by_keys(session, keys, pk_cols=PK_COLS, columns="*", chunk_size=KEY_LOOKUP_CHUNK):
+    """
+    Fetches the SALES rows with the given keys, in chunks of bound-parameter IN lists.
+
+    Args:
+        keys (list) : Key tuples to look up
+        columns (str) : The select list, "*" for whole rows
+
+    Returns:
+        pd.DataFrame : The matching rows
+    """
+    keys = list(keys)
+    if not keys:
+        return session.sql(f"SELECT {columns} FROM {SALES_TABLE} LIMIT 0").to_pandas()
+
+    parts = []
+    with span("pager.fetch_rows_by_keys", keys = len(keys)) as s:
+        for start in range(0, len(keys), chunk_size):
+            condition, params = _key_in_list(keys[start:start + chunk_size], pk_cols)
+            parts.append(s.add_frame(session.sql(f"SELECT {columns} FROM {SALES_TABLE} WHERE {condition}", params = params).to_pandas()))
+    return pd.concat(parts, ignore_index = True)
+
+
+def key_conflicts(session, journal, pk_cols=PK_COLS, memo=None):
+    """
+    Finds journaled rows whose key collides with another journaled row, a staged
+    upload or a stored row that the journal has not touched, whichever page it lives on.
+
+    Args:
+        memo (dict) : Optional state kept across reruns for the same journal. The result is reused until
+            the journal grows, and each key is looked up in SALES once. Rows another session adds later
+            are not seen here; the save's conflict check still catches them
+
+    Returns:
+        pd.DataFrame : The conflicting journaled rows, empty when keys are unique
+    """
+    if memo is not None:
+        if memo.get("journal") is not journal:
+            memo.clear()
+            memo.update(journal = journal, length = None, result = None, stored = {})
+        if memo["length"] == len(journal):
+            return memo["result"]
+    stored_lookup = memo["stored"] if memo is not None else {}
+
+    touched_keys, final_rows = replay_journal(journal, None, pk_cols)
+    result = final_rows
+    if not final_rows.empty:
+        final_keys = pd.Series(key_tuples(final_rows, pk_cols), index = final_rows.index)
+        candidates = sorted(set(final_keys) - set(touched_keys))
+        unchecked = [key for key in candidates if key not in stored_lookup]
+        if unchecked:
+            stored = fetch_rows_by_keys(session, unchecked, pk_cols, columns = ", ".join(pk_cols))
+            found = set(key_tuples(stored, pk_cols))
+            stored_lookup.update({key: key in found for key in unchecked})
+        stored_keys = {key for key in candidates if stored_lookup[key]}
+
+        conflicting = final_keys.duplicated(keep=False) | final_keys.isin(stored_keys) | final_keys.isin(staged_keys(journal))
+        result = final_rows[conflicting]
+
+    if memo is not None:
+        memo.update(length = len(journal), result = result)
+    return result
+
+
+def sales_row_count(session):
+    """
+    Returns:
+        int : Number of rows in SALES, answered from table metadata by the warehouse
+    """
+    return cached_query(
+        session,
+        [SALES_TABLE],
+        ("row_count",),
+        lambda: session.table(SALES_TABLE).count(),
+    )
@@ -0,0 +1,322 @@
+"""
+Save pipeline for the SALES editor. Only the rows in a ChangeSet are staged,
+and updates, inserts and deletes are applied by a single MERGE.
+
+Every save stages into its own temporary table, so concurrent editors never
+share a stage. The conflict check, the MERGE and then the staged CSV inserts run in
+one transaction that first takes the SALES lock: two saves touching different
+rows both commit, while a save whose rows were changed by another session since
+they were loaded is rolled back with ConcurrentModificationError. A save whose
+staged uploads share a key with each other or with a staged upsert is rolled
+back with DuplicateKeyError. The change version of SALES is read right after
+taking the lock and again after COMMIT, so the caller can tell whether its own
+save was the only change since it loaded the table. Staging tables
+are created before BEGIN and dropped after COMMIT, since DDL commits an open
+transaction in Snowflake.
+"""
+import uuid
+
+import pandas as pd
+
+from constants import SALES_TABLE, PK_COLS
+from perf_trace import span, traced
+from sales_frame import to_storage_frame
+from sales_snapshot import ConcurrentModificationError, read_change_version
+
+STAGE_TABLE_PREFIX = "TMP_SALES_STAGE"
+OP_COL = "CHANGE_OP"
+UPSERT = "U"
+DELETE = "D"
+BEFORE = "B"
+
+MAX_CONFLICT_SAMPLE = 20
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+class DuplicateKeyError(Exception):
+    """
+    Raised when a save would write the same key twice, from two staged uploads or an upload and an upsert.
+    """
+
+
+def stage_table_name():
+    """
+    Returns:
+        str : A staging table name unique to one save
+    """
+    return f"{STAGE_TABLE_PREFIX}_{uuid.uuid4().hex[:12].upper()}"
+
+
+def build_stage_frame(change_set, pk_cols=PK_COLS):
+    """
+    Stacks the upserted rows, the removed keys and the baseline version of every
+    updated or removed row (used by the conflict check) into one frame tagged with CHANGE_OP.
+
+    Args:
+        change_set (ChangeSet) : The changes to save
+        pk_cols (list) : The key columns
+
+    Returns:
+        pd.DataFrame : Upper-cased columns, one row per key to write
+    """
+    upserts = to_storage_frame(pd.concat([change_set.added, change_set.updated], ignore_index = True))
+    upserts = upserts.dropna(subset = pk_cols)
+    upserts[OP_COL] = UPSERT
+
+    deletes = change_set.removed[pk_cols].dropna()
+    deletes = deletes.assign(**{OP_COL: DELETE})
+
+    before = to_storage_frame(pd.concat([change_set.updated_before, change_set.removed], ignore_index = True))
+    before = before.dropna(subset = pk_cols)
+    before[OP_COL] = BEFORE
+
+    stage_df = pd.concat([upserts, deletes, before], ignore_index = True)
+    stage_df.columns = [c.upper() for c in stage_df.columns]
+    return stage_df
+
+
+def merge_statement(columns, stage, pk_cols=PK_COLS, target=SALES_TABLE):
+    """
+    Builds the MERGE that applies a staged change set in one statement.
+
+    Args:
+        columns (list) : The SALES columns present in the stage, CHANGE_OP excluded
+        stage (str) : The staging table of this save
+
+    Returns:
+        str : The MERGE statement
+    """
+    value_cols = [c for c in columns if c not in pk_cols]
+
+    merge_condition = " AND ".join([f"target.{col} = source.{col}" for col in pk_cols])
+    update_clause = ", ".join([f"{col} = source.{col}" for col in value_cols])
+    insert_columns = ", ".join(columns)
+    insert_values = ", ".join([f"source.{c}" for c in columns])
+
+    return f"""
+        MERGE INTO {target} AS target
+        USING (SELECT * FROM {stage} WHERE {OP_COL} <> '{BEFORE}') AS source
+        ON {merge_condition}
+        WHEN MATCHED AND source.{OP_COL} = '{DELETE}' THEN
+            DELETE
+        WHEN MATCHED AND source.{OP_COL} = '{UPSERT}' THEN
+            UPDATE SET {update_clause}
+        WHEN NOT MATCHED AND source.{OP_COL} = '{UPSERT}' THEN
+            INSERT ({insert_columns})
+            VALUES ({insert_values})
+    """
+
+
+def conflict_statement(columns, stage, pk_cols=PK_COLS, target=SALES_TABLE, limit=MAX_CONFLICT_SAMPLE):
+    """
+    Builds the query returning the staged keys that another session changed since they were loaded:
+    updated or removed rows that no longer hold their baseline values, and added keys that now exist.
+
+    Args:
+        columns (list) : The SALES columns present in the stage, CHANGE_OP excluded
+        stage (str) : The staging table of this save
+
+    Returns:
+        str : The conflict query, returning at most limit keys
+    """
+    value_cols = [c for c in columns if c not in pk_cols]
+    join_condition = " AND ".join([f"t.{col} = s.{col}" for col in pk_cols])
+    baseline_condition = " AND ".join([f"b.{col} = s.{col}" for col in pk_cols])
+    unchanged = " AND ".join([f"t.{col} IS NOT DISTINCT FROM s.{col}" for col in value_cols]) or "TRUE"
+    key_list = ", ".join([f"s.{col}" for col in pk_cols])
+
+    return f"""
+        SELECT {key_list}
+        FROM {stage} AS s
+        LEFT JOIN {target} AS t ON {join_condition}
+        LEFT JOIN {stage} AS b ON b.{OP_COL} = '{BEFORE}' AND s.{OP_COL} = '{UPSERT}' AND {baseline_condition}
+        WHERE (s.{OP_COL} = '{BEFORE}' AND (t.{pk_cols[0]} IS NULL OR NOT ({unchanged})))
+           OR (s.{OP_COL} = '{UPSERT}' AND t.{pk_cols[0]} IS NOT NULL AND b.{pk_cols[0]} IS NULL)
+        LIMIT {int(limit)}
+    """
+
+
+def lock_statement(target=SALES_TABLE):
+    """
+    A DML statement matching no rows. It takes the table lock that concurrent DML waits on,
+    so the conflict check that follows sees every earlier save and no later one.
+    """
+    return f"DELETE FROM {target} WHERE 1 = 0"
+
+
+def check_conflicts(session, stage_table, columns, staged_uploads=(), pk_cols=PK_COLS):
+    """
+    Raises ConcurrentModificationError when any staged row conflicts with SALES as it is now.
+    An uploaded key conflicts when SALES holds it, unless the stage deletes it, since the
+    MERGE runs before the uploads are inserted.
+    """
+    conflicts = []
+    if stage_table is not None:
+        conflicts = session.sql(conflict_statement(columns, stage_table, pk_cols)).collect()
+
+    key_condition = " AND ".join([f"s.{col} = t.{col}" for col in pk_cols])
+    not_deleted = ""
+    if stage_table is not None:
+        delete_condition = " AND ".join([f"d.{col} = s.{col}" for col in pk_cols])
+        not_deleted = (f" WHERE NOT EXISTS (SELECT 1 FROM {stage_table} AS d "
+                       f"WHERE d.{OP_COL} = '{DELETE}' AND {delete_condition})")
+    for upload_table, _ in staged_uploads:
+        if len(conflicts) >= MAX_CONFLICT_SAMPLE:
+            break
+        conflicts += session.sql(
+            f"SELECT {', '.join(f's.{c}' for c in pk_cols)} FROM {upload_table} AS s "
+            f"JOIN {SALES_TABLE} AS t ON {key_condition}{not_deleted} LIMIT {MAX_CONFLICT_SAMPLE}"
+        ).collect()
+
+    if conflicts:
+        keys = ", ".join(["/".join(str(v) for v in row) for row in conflicts[:3]])
+        more = "+" if len(conflicts) >= MAX_CONFLICT_SAMPLE else ""
+        raise ConcurrentModificationError(
+            f"{len(conflicts)}{more} of the rows you changed were changed by another session since you "
+            f"loaded them (e.g. {keys}). Reload the table and apply your edits again."
+        )
+
+
+def staged_duplicates_statement(upload_table, other_table, other_condition="TRUE", pk_cols=PK_COLS,
+                                limit=MAX_CONFLICT_SAMPLE):
+    """
+    Builds the query returning the keys of a staged upload that other_table also writes.
+    Keys are compared with a join, as the conflict check does, so a key staged as text
+    still matches the same key staged as a number.
+
+    Returns:
+        str : The query, returning at most limit keys
+    """
+    join_condition = " AND ".join([f"s.{col} = t.{col}" for col in pk_cols])
+    key_list = ", ".join([f"s.{col}" for col in pk_cols])
+    return (
+        f"SELECT {key_list} FROM {upload_table} AS s JOIN {other_table} AS t ON {join_condition} "
+        f"WHERE {other_condition} LIMIT {int(limit)}"
+    )
+
+
+def check_staged_duplicates(session, stage_table, staged_uploads, pk_cols=PK_COLS):
+    """
+    Raises DuplicateKeyError when two staged uploads, or an upload and a staged upsert, share a key.
+    The inserts run after the MERGE, so such an upload would add a second row for the upserted key.
+    """
+    uploads = [upload_table for upload_table, _ in staged_uploads]
+    pairs = [(a, b, "TRUE") for i, a in enumerate(uploads) for b in uploads[i + 1:]]
+    if stage_table is not None:
+        pairs += [(a, stage_table, f"t.{OP_COL} = '{UPSERT}'") for a in uploads]
+
+    duplicates = []
+    for upload_table, other_table, condition in pairs:
+        if len(duplicates) >= MAX_CONFLICT_SAMPLE:
+            break
+        duplicates += session.sql(staged_duplicates_statement(upload_table, other_table, condition, pk_cols)).collect()
+
+    if duplicates:
+        keys = ", ".join(["/".join(str(v) for v in row) for row in duplicates[:3]])
+        more = "+" if len(duplicates) >= MAX_CONFLICT_SAMPLE else ""
+        raise DuplicateKeyError(
+            f"{len(duplicates)}{more} keys are written more than once by the uploaded files and the edited rows "
+            f"(e.g. {keys}). Remove the duplicates and save again."
+        )
+
+
+@traced("save.insert_staged")
+def insert_staged_rows(session, stage_table, target=SALES_TABLE, drop=True):
+    """
+    Inserts the rows of a staging table (a streamed CSV upload) with one INSERT ... SELECT.
+
+    Args:
+        drop (bool) : Drop the staging table afterwards; pass False inside a transaction
+    """
+    column_list = ", ".join(session.table(stage_table).columns)
+    session.sql(f"INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {stage_table}").collect()
+    if drop:
+        session.sql(f"DROP TABLE IF EXISTS {stage_table}").collect()
+
+
+@traced("save.change_set")
+def save_change_set(session, change_set, staged_uploads=(), chunk_size=DEFAULT_CHUNK_SIZE, progress_callback=None,
+                    detect_conflicts=True):
+    """
+    Stages only the changed and removed keys, in chunks, then applies them and the
+    staged uploads in one transaction.
+
+    Args:
+        session (Session) : The active Snowpark session
+        change_set (ChangeSet) : The changes to save
+        staged_uploads (list) : (staging table, row count) of streamed CSV uploads, inserted after the MERGE
+        chunk_size (int) : Maximum number of rows uploaded per write to the stage table
+        progress_callback (callable) : Optional f(fraction, text) called after each step
+        detect_conflicts (bool) : Raise ConcurrentModificationError, and save nothing, when another
+            session changed any of the rows since they were loaded
+
+    Returns:
+        dict : Number of rows inserted, updated and deleted, and the change version of SALES just
+            before (version_before) and after (version) this save
+    """
+    stage_df = build_stage_frame(change_set)
+    columns = [c for c in stage_df.columns if c != OP_COL]
+    if stage_df.empty and not staged_uploads:
+        version = read_change_version(session)
+        return {"inserted": 0, "updated": 0, "deleted": 0, "version_before": version, "version": version}
+
+    stage_table = stage_table_name() if not stage_df.empty else None
+    n_chunks = -(-len(stage_df) // chunk_size)
+    steps = n_chunks + 1
+
+    try:
+        for i in range(n_chunks):
+            chunk = stage_df.iloc[i * chunk_size:(i + 1) * chunk_size]
+            with span("save.stage_chunk", rows = len(chunk)):
+                session.create_dataframe(chunk).write.save_as_table(
+                    stage_table, mode = "overwrite" if i == 0 else "append", table_type = "temporary"
+                )
+            if progress_callback:
+                progress_callback((i + 1) / steps, f"Staged {min((i + 1) * chunk_size, len(stage_df)):,} of {len(stage_df):,} rows")
+
+        with span("save.transaction"):
+            session.sql("BEGIN").collect()
+            try:
+                session.sql(lock_statement()).collect()
+                version_before = read_change_version(session)
+                if staged_uploads:
+                    with span("save.staged_duplicates"):
+                        check_staged_duplicates(session, stage_table, staged_uploads)
+                if detect_conflicts:
+                    with span("save.conflict_check"):
+                        check_conflicts(session, stage_table, columns, staged_uploads)
+
+                counts = {}
+                if stage_table is not None:
+                    with span("save.merge"):
+                        result = session.sql(merge_statement(columns, stage_table)).collect()
+                    counts = result[0].as_dict() if result else {}
+
+                # After the MERGE, so a key the editor deleted can be uploaded again
+                staged_rows = 0
+                for upload_table, row_count in staged_uploads:
+                    insert_staged_rows(session, upload_table, drop = False)
+                    staged_rows += row_count
+                session.sql("COMMIT").collect()
+            except Exception:
+                session.sql("ROLLBACK").collect()
+                raise
+            version = read_change_version(session)
+    finally:
+        if stage_table is not None:
+            session.sql(f"DROP TABLE IF EXISTS {stage_table}").collect()
+
+    for upload_table, _ in staged_uploads:
+        session.sql(f"DROP TABLE IF EXISTS {upload_table}").collect()
+
+    if progress_callback:
+        progress_callback(1.0, "Changes merged into SALES")
+
+    return {
+        "inserted": staged_rows + counts.get("number of rows inserted", 0),
+        "updated": counts.get("number of rows updated", 0),
+        "deleted": counts.get("number of rows deleted", 0),
+        "version_before": version_before,
+        "version": version,
+    }
@@ -0,0 +1,183 @@
+"""
+Version-stamped snapshot of SALES, the baseline a session edits against.
+
+The snapshot holds the compact SALES frame as it was read. The preview diffs
+against it, so opening it downloads nothing. Conflicts with other sessions are
+detected per row when saving (see sales_save), so the read needs no table-wide
+consistency check of its own.
+
+The snapshot also holds the change version of SALES (Snowflake's
+SYSTEM$LAST_CHANGE_COMMIT_TIME token) read before its rows. After our own save
+the snapshot is brought up to date by applying the saved change set to its
+frame, provided the version read inside the save transaction is still the one
+the snapshot was loaded at, i.e. no other session committed to SALES in
+between. Otherwise the table is reloaded. The refreshed snapshot stays in the
+session that saved; other sessions read SALES again.
+
+Paginated mode has no snapshot.
+"""
+import functools
+from dataclasses import dataclass
+
+import pandas as pd
+
+from batch_loader import load_batched
+from change_set import key_index, rows_for_keys
+from constants import DROPDOWN_TABLE, MONTH_COLS, PK_COLS, SALES_TABLE
+from perf_trace import span
+from query_cache import cached_query, cached_table
+from sales_pager import sales_row_count
+from sales_frame import append_compact_rows, assign_compact, key_categories, to_compact_frame, to_storage_frame, widen_for
+
+SALES_COLUMNS = PK_COLS + MONTH_COLS
+
+
+class ConcurrentModificationError(Exception):
+    """
+    Raised when rows being saved were changed by another session since they were loaded.
+    """
+
+
+@dataclass(frozen=True)
+class SalesSnapshot:
+    """
+    Attributes:
+        frame (pd.DataFrame) : Compact SALES rows, shared and read-only
+        version : The change version of SALES when the rows were read, see read_change_version
+    """
+    frame: pd.DataFrame
+    version: object = None
+
+    @functools.cached_property
+    def key_index(self):
+        """
+        The normalised keys of frame, built on first use and shared by every session holding the snapshot.
+        """
+        return key_index(self.frame)
+
+    def rows_for(self, keys):
+        """
+        Returns:
+            pd.DataFrame : The snapshot rows with the given keys, without a pass over the whole frame
+        """
+        return rows_for_keys(self.frame, keys, self.key_index)
+
+
+def read_change_version(session, table=SALES_TABLE):
+    """
+    Reads the token Snowflake moves forward on every commit that changes the table.
+
+    Returns:
+        The change version, only meant to be compared for equality
+    """
+    return session.sql(f"SELECT SYSTEM$LAST_CHANGE_COMMIT_TIME('{table}') AS VERSION").collect()[0][0]
+
+
+def _read_snapshot(session, on_batch=None):
+    """
+    Reads the SALES columns the editor works with in batches, compacting them as they arrive. The version is read first, so a commit
+    landing during the read makes the snapshot look older than it is, never newer.
+    """
+    version = read_change_version(session)
+    categories = key_categories(cached_table(session, DROPDOWN_TABLE))
+    frame = load_batched(
+        session,
+        SALES_TABLE,
+        columns = SALES_COLUMNS,
+        convert = lambda batch: to_compact_frame(batch, categories),
+        on_batch = on_batch,
+        total_rows = sales_row_count(session),
+    )
+    return SalesSnapshot(frame = frame, version = version)
+
+
+def _snapshot_key():
+    return [SALES_TABLE, DROPDOWN_TABLE], ("snapshot", SALES_TABLE)
+
+
+def load_sales_snapshot(session, on_batch=None):
+    """
+    Returns the snapshot of the full table, shared across sessions through the query cache.
+
+    Args:
+        on_batch (callable) : Optional f(batch, rows_loaded, total_rows) called for each compact
+            batch when the table has to be read, to show the first rows early
+
+    Returns:
+        SalesSnapshot : Compact SALES rows
+    """
+    tables, key = _snapshot_key()
+    return cached_query(session, tables, key, lambda: _read_snapshot(session, on_batch))
+
+
+def apply_change_set(frame, change_set, pk_cols=PK_COLS):
+    """
+    Applies a saved change set to a compact SALES frame, the same way the MERGE applied it to the table.
+
+    Args:
+        frame (pd.DataFrame) : The snapshot frame the change set was computed against
+        change_set (ChangeSet) : The saved changes
+
+    Returns:
+        pd.DataFrame : A new compact frame; updated rows keep their position, added rows go at the end
+    """
+    result = widen_for(frame.copy(deep=False), [change_set.updated, change_set.added])
+    index = key_index(result, pk_cols)
+
+    updated = change_set.updated
+    if not updated.empty:
+        positions = index.get_indexer(pd.MultiIndex.from_frame(updated[pk_cols]))
+        found = positions >= 0
+        for col_name in [c for c in updated.columns if c not in pk_cols and c in result.columns]:
+            result[col_name] = assign_compact(result[col_name], positions[found], updated[col_name].to_numpy()[found])
+
+    removed = change_set.removed
+    if not removed.empty:
+        positions = index.get_indexer(pd.MultiIndex.from_frame(removed[pk_cols]))
+        result = result.drop(index = result.index[positions[positions >= 0]])
+
+    added = change_set.added.dropna(subset = pk_cols)
+    if not added.empty:
+        result = append_compact_rows(result, added)
+
+    return result.reset_index(drop=True)
+
+
+def apply_saved_changes(frame, change_set, loaded_version, save_result):
+    """
+    Brings a frame of SALES rows up to date with a change set that was just saved, without reading the table again.
+
+    Args:
+        frame (pd.DataFrame) : The rows the change set was computed against, compact or plain
+        change_set (ChangeSet) : The saved changes
+        loaded_version : The change version of SALES read before the rows were loaded
+        save_result (dict) : The result of save_change_set, with the version read inside its transaction
+
+    Returns:
+        pd.DataFrame : The updated frame, None when another session changed SALES since the rows
+            were loaded and the table has to be reloaded
+    """
+    before = save_result.get("version_before")
+    if loaded_version is None or before is None or before != loaded_version:
+        return None
+    with span("snapshot.apply_delta"):
+        return apply_change_set(frame, change_set)
+
+
+def refresh_after_save(snapshot, change_set, save_result):
+    """
+    Brings a snapshot up to date with a change set that was just saved. The result is meant for the
+    session that saved only; it is not shared through the query cache.
+
+    Args:
+        snapshot (SalesSnapshot) : The snapshot the change set was computed against, with a frame
+        change_set (ChangeSet) : The saved changes
+        save_result (dict) : The result of save_change_set
+
+    Returns:
+        SalesSnapshot : The refreshed snapshot, None when SALES changed elsewhere and has to be reloaded
+    """
+    frame = apply_saved_changes(snapshot.frame, change_set, snapshot.version, save_result)
+    if frame is None:
+        return None
+    return SalesSnapshot(frame = frame, version = save_result.get("version"))
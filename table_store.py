@@ -0,0 +1,147 @@
+"""
+Versioned store for the frame shown in the editor.
+
+The store keeps the frame the editor was loaded with as an immutable base, shared
+with the SALES snapshot in the query cache, plus a sparse overlay of what changed
+since: cell values by base position, deleted base positions and added rows. Base
+positions never move, so they identify rows without a key lookup. Recording a
+change costs O(changed rows); the full frame is only materialized when a view is
+asked for, at most once per version.
+
+Views rely on pandas copy-on-write: a view with only cell changes shares every
+untouched column with the base, and writing to a view never reaches the base.
+"""
+import numpy as np
+import pandas as pd
+
+from sales_frame import append_compact_rows, assign_compact, widen_for
+
+
+def enable_copy_on_write():
+    """
+    Turns on pandas copy-on-write, the default from pandas 3, so frames can be
+    shared between the snapshot, the store and session state without defensive copies.
+    """
+    if int(pd.__version__.split(".")[0]) < 3:
+        pd.set_option("mode.copy_on_write", True)
+
+
+class VersionedTable:
+    """
+    Attributes:
+        base (pd.DataFrame) : The frame the store was created from, never modified
+        version (int) : Incremented by every recorded change
+    """
+    def __init__(self, base):
+        self.base = base
+        self.version = 0
+        self._cells = {}
+        self._deleted = set()
+        self._added = []
+        self._view = base
+        self._view_version = 0
+        self._kept = None
+
+    @property
+    def has_changes(self):
+        return bool(self._cells or self._deleted or self._added)
+
+    def __len__(self):
+        return len(self.base) - len(self._deleted) + len(self._added)
+
+    def _kept_positions(self):
+        """
+        Returns:
+            np.ndarray : The base positions still in the table, in order; cached per version
+        """
+        if self._kept is None or self._kept[0] != self.version:
+            kept = np.arange(len(self.base))
+            if self._deleted:
+                kept = np.setdiff1d(kept, np.fromiter(self._deleted, dtype=np.int64), assume_unique=True)
+            self._kept = (self.version, kept)
+        return self._kept[1]
+
+    def _locate(self, view_positions):
+        """
+        Maps positions in the current view to ("base", base position) or ("added", index in the added rows).
+        """
+        n_kept = len(self.base) - len(self._deleted)
+        kept = self._kept_positions() if self._deleted else None
+        located = []
+        for pos in view_positions:
+            if pos >= n_kept:
+                located.append(("added", pos - n_kept))
+            else:
+                located.append(("base", int(kept[pos]) if kept is not None else pos))
+        return located
+
+    def apply_editor_state(self, state):
+        """
+        Folds a st.data_editor delta, relative to the current view, into the overlay.
+
+        Args:
+            state (dict) : The widget state with edited_rows, added_rows and deleted_rows
+        """
+        edited = {int(pos): cells for pos, cells in (state.get("edited_rows") or {}).items()}
+        deleted = {int(pos) for pos in state.get("deleted_rows") or []}
+        added_rows = list(state.get("added_rows") or [])
+        if not edited and not deleted and not added_rows:
+            return
+
+        for (where, i), cells in zip(self._locate(list(edited)), edited.values()):
+            if where == "base":
+                self._cells.setdefault(i, {}).update(cells)
+            else:
+                self._added[i] = {**self._added[i], **cells}
+
+        dropped_added = set()
+        for where, i in self._locate(sorted(deleted)):
+            if where == "base":
+                self._deleted.add(i)
+                self._cells.pop(i, None)
+            else:
+                dropped_added.add(i)
+        if dropped_added:
+            self._added = [row for i, row in enumerate(self._added) if i not in dropped_added]
+
+        self._added.extend(dict(row) for row in added_rows)
+        self.version += 1
+
+    def append(self, rows_df):
+        """
+        Adds rows at the end of the table.
+        """
+        if rows_df.empty:
+            return
+        self._added.extend(rows_df.to_dict("records"))
+        self.version += 1
+
+    def view(self):
+        """
+        Returns:
+            pd.DataFrame : The current table; the base itself while nothing changed
+        """
+        if self._view_version == self.version:
+            return self._view
+
+        frame = self.base
+        if self._cells:
+            by_column = {}
+            for position, cells in self._cells.items():
+                for col_name, value in cells.items():
+                    positions, values = by_column.setdefault(col_name, ([], []))
+                    positions.append(position)
+                    values.append(value)
+            frame = widen_for(frame, [{c: values for c, (_, values) in by_column.items()}])
+            frame = frame.assign(**{
+                col_name: assign_compact(frame[col_name], positions, values)
+                for col_name, (positions, values) in by_column.items()
+            })
+        if self._deleted:
+            frame = frame.iloc[self._kept_positions()].reset_index(drop=True)
+        if self._added:
+            frame = append_compact_rows(frame, pd.DataFrame(self._added, columns = self.base.columns))
+
+        self._view = frame
+        self._view_version = self.version
+        return frame
@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+import streamlit as st
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.offline_session import OfflineSession
+from constants import MONTH_COLS, PK_COLS, SALES_TABLE
+
+
+@pytest.fixture(autouse=True)
+def clear_session_state():
+    """
+    Each test starts from an empty st.session_state, the way a new browser session does.
+    """
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    yield
+
+
+def sales_rows(*rows):
+    """
+    Builds a SALES frame from (METRIC, FORECAST, PRODUCT, YEAR, JAN) tuples; the other months are 0.
+    """
+    frame = pd.DataFrame([row[:4] for row in rows], columns = PK_COLS)
+    for col_name in MONTH_COLS:
+        frame[col_name] = [float(row[4]) if col_name == "JAN" else 0.0 for row in rows]
+    return frame
+
+
+def offline_sales(frame, database=":memory:"):
+    """
+    Returns an offline session whose SALES table holds frame.
+    """
+    session = OfflineSession(database)
+    session.load_table(SALES_TABLE, frame, PK_COLS)
+    return session
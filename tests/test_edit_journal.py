@@ -0,0 +1,159 @@
+import pandas as pd
+import streamlit as st
+
+from change_set import key_tuples, rows_for_keys
+from edit_journal import (editor_key, extend_editor, init_edit_journal, journal_change_set, rebase_editor, record_editor_delta,
+                          record_rows, reset_edit_journal)
+
+from conftest import sales_rows
+
+A_P1 = ("A", "F", "P1", "2020")
+B_P3 = ("B", "F", "P3", "2020")
+
+
+def start_editor(base):
+    st.session_state.editable_df = base
+    init_edit_journal()
+
+
+def edit(edited_rows=None, added_rows=None, deleted_rows=None):
+    """
+    Sets the widget delta of the current editor and journals it, as a rerun does.
+    """
+    st.session_state[editor_key()] = {
+        "edited_rows": edited_rows or {},
+        "added_rows": added_rows or [],
+        "deleted_rows": deleted_rows or [],
+    }
+    record_editor_delta(st.session_state.editable_df)
+
+
+def change_set_against(base):
+    return journal_change_set(lambda keys: rows_for_keys(base, keys))
+
+
+def jan_by_key(df):
+    return dict(zip(key_tuples(df), df["JAN"]))
+
+
+def test_cell_edit():
+    base = sales_rows(("A", "F", "P1", 2020, 1), ("B", "F", "P3", 2020, 3))
+    start_editor(base)
+    edit(edited_rows = {1: {"JAN": 9.0}})
+
+    change_set = change_set_against(base)
+    assert jan_by_key(change_set.updated) == {B_P3: 9.0}
+    assert jan_by_key(change_set.updated_before) == {B_P3: 3.0}
+    assert change_set.added.empty and change_set.removed.empty
+
+
+def test_edit_reverted_in_a_later_delta_is_no_change():
+    base = sales_rows(("A", "F", "P1", 2020, 1), ("B", "F", "P3", 2020, 3))
+    start_editor(base)
+    edit(edited_rows = {1: {"JAN": 9.0}})
+    edit(edited_rows = {1: {"JAN": 3.0}})
+
+    assert change_set_against(base).is_empty
+
+
+def test_delete():
+    base = sales_rows(("A", "F", "P1", 2020, 1), ("B", "F", "P3", 2020, 3))
+    start_editor(base)
+    edit(deleted_rows = [0])
+
+    change_set = change_set_against(base)
+    assert key_tuples(change_set.removed) == [A_P1]
+    assert change_set.added.empty and change_set.updated.empty
+
+
+def test_rekey():
+    base = sales_rows(("A", "F", "P1", 2020, 1), ("B", "F", "P3", 2020, 3))
+    start_editor(base)
+    edit(edited_rows = {0: {"PRODUCT": "P2"}})
+    edit(edited_rows = {0: {"PRODUCT": "P2", "JAN": 4.0}})
+
+    change_set = change_set_against(base)
+    assert key_tuples(change_set.removed) == [A_P1]
+    assert jan_by_key(change_set.added) == {("A", "F", "P2", "2020"): 4.0}
+    assert change_set.updated.empty
+
+
+def test_row_added_by_a_dialog_then_deleted_in_the_editor():
+    base = sales_rows(("A", "F", "P1", 2020, 1), ("B", "F", "P3", 2020, 3))
+    start_editor(base)
+    new_row = sales_rows(("C", "F", "P1", 2021, 7))
+    extend_editor(new_row, ([], key_tuples(new_row)))
+    record_rows(new_row, "add_new_dialog")
+    edit(deleted_rows = [2])
+
+    assert change_set_against(base).is_empty
+
+
+def test_row_added_in_the_editor_then_deleted():
+    base = sales_rows(("A", "F", "P1", 2020, 1))
+    start_editor(base)
+    added = sales_rows(("C", "F", "P1", 2021, 7)).to_dict("records")
+    edit(added_rows = added)
+    edit()
+
+    assert change_set_against(base).is_empty
+
+
+def test_edits_survive_a_rebase_onto_another_page():
+    page_1 = sales_rows(("A", "F", "P1", 2020, 1))
+    page_2 = sales_rows(("B", "F", "P3", 2020, 3))
+    start_editor(page_1)
+    edit(edited_rows = {0: {"JAN": 5.0}})
+    rebase_editor(page_2)
+    edit(edited_rows = {0: {"JAN": 6.0}})
+
+    change_set = change_set_against(pd.concat([page_1, page_2], ignore_index = True))
+    assert jan_by_key(change_set.updated) == {A_P1: 5.0, B_P3: 6.0}
+
+
+def test_reset_starts_a_new_journal_on_the_saved_rows():
+    base = sales_rows(("A", "F", "P1", 2020, 1))
+    start_editor(base)
+    edit(edited_rows = {0: {"JAN": 5.0}})
+    saved = sales_rows(("A", "F", "P1", 2020, 5))
+    reset_edit_journal(saved)
+
+    assert st.session_state.edit_journal == []
+    assert change_set_against(saved).is_empty
+    edit(edited_rows = {0: {"JAN": 6.0}})
+    assert jan_by_key(change_set_against(saved).updated) == {A_P1: 6.0}
+
+
+def test_rekey_onto_a_row_deleted_in_the_same_delta():
+    base = sales_rows(("A", "F", "P1", 2020, 1), ("B", "F", "P3", 2020, 3))
+    start_editor(base)
+    edit(edited_rows = {0: {"METRIC": "B", "PRODUCT": "P3"}}, deleted_rows = [1])
+
+    change_set = change_set_against(base)
+    assert key_tuples(change_set.removed) == [A_P1]
+    assert jan_by_key(change_set.updated) == {B_P3: 1.0}
+    assert change_set.added.empty
+
+
+def test_key_swap_in_one_delta():
+    base = sales_rows(("A", "F", "P1", 2020, 1), ("B", "F", "P3", 2020, 3))
+    start_editor(base)
+    edit(edited_rows = {0: {"METRIC": "B", "PRODUCT": "P3"}, 1: {"METRIC": "A", "PRODUCT": "P1"}})
+
+    change_set = change_set_against(base)
+    assert jan_by_key(change_set.updated) == {A_P1: 3.0, B_P3: 1.0}
+    assert change_set.added.empty and change_set.removed.empty
+
+
+def test_rekeyed_row_edited_after_the_editor_is_extended():
+    base = sales_rows(("A", "F", "P1", 2020, 1), ("B", "F", "P3", 2020, 3))
+    start_editor(base)
+    edit(edited_rows = {0: {"PRODUCT": "P9"}})
+    new_row = sales_rows(("C", "F", "P1", 2021, 7))
+    extend_editor(new_row, ([A_P1], [("A", "F", "P9", "2020")] + key_tuples(new_row)))
+    record_rows(new_row, "add_new_dialog")
+    edit(edited_rows = {0: {"JAN": 5.0}})
+
+    change_set = change_set_against(base)
+    assert key_tuples(change_set.removed) == [A_P1]
+    assert jan_by_key(change_set.added) == {("A", "F", "P9", "2020"): 5.0, ("C", "F", "P1", "2021"): 7.0}
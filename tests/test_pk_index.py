@@ -0,0 +1,50 @@
+from pk_index import PrimaryKeyIndex
+
+from conftest import sales_rows
+
+A = ("A", "F", "P1", "2020")
+B = ("B", "F", "P3", "2020")
+C = ("C", "F", "P4", "2020")
+
+
+def index_of_a_and_b():
+    return PrimaryKeyIndex.from_frame(sales_rows(("A", "F", "P1", 2020, 1), ("B", "F", "P3", 2020, 3)))
+
+
+def test_from_frame_normalises_keys():
+    index = index_of_a_and_b()
+    assert A in index and B in index and len(index) == 2
+    assert index.duplicates() == set()
+
+
+def test_conflicts_does_not_change_the_index():
+    index = index_of_a_and_b()
+    assert index.conflicts(added_keys = [A]) == {A}
+    assert index.conflicts(removed_keys = [A], added_keys = [A]) == set()
+    assert index.conflicts(added_keys = [C, C]) == {C}
+    assert index.count(A) == 1 and C not in index
+
+
+def test_a_swap_is_not_a_conflict():
+    index = index_of_a_and_b()
+    assert index.conflicts(removed_keys = [A, B], added_keys = [B, A]) == set()
+
+
+def test_apply_tracks_duplicates():
+    index = index_of_a_and_b()
+    index.apply(added_keys = [A])
+    assert index.duplicates() == {A}
+    assert index.conflicts() == {A}
+
+    index.apply(removed_keys = [A])
+    assert index.duplicates() == set() and index.count(A) == 1
+
+    index.apply(removed_keys = [B], added_keys = [C])
+    assert B not in index and C in index
+
+
+def test_overlay_applies_a_pending_change():
+    index = index_of_a_and_b()
+    overlay = index.overlay(removed_keys = [A], added_keys = [C])
+    assert A not in overlay and B in overlay and C in overlay
+    assert A in index and C not in index
@@ -0,0 +1,36 @@
+import streamlit as st
+
+from change_set import key_tuples
+from edit_journal import init_edit_journal, record_rows, reset_edit_journal
+from sales_pager import key_conflicts
+
+from conftest import offline_sales, sales_rows
+
+
+def queries_during(session, call):
+    with session.query_history() as history:
+        result = call()
+    return result, len(history.queries)
+
+
+def test_key_conflicts_looks_up_each_key_once_per_journal():
+    session = offline_sales(sales_rows(("A", "F", "P1", 2020, 1), ("B", "F", "P3", 2020, 3)))
+    st.session_state.editable_df = sales_rows()
+    init_edit_journal()
+    memo = {}
+
+    record_rows(sales_rows(("A", "F", "P1", 2020, 5)), "add")
+    conflicts, n_queries = queries_during(session, lambda: key_conflicts(session, st.session_state.edit_journal, memo = memo))
+    assert key_tuples(conflicts) == [("A", "F", "P1", "2020")] and n_queries == 1
+
+    _, n_queries = queries_during(session, lambda: key_conflicts(session, st.session_state.edit_journal, memo = memo))
+    assert n_queries == 0
+
+    record_rows(sales_rows(("C", "F", "P4", 2020, 2)), "add")
+    conflicts, n_queries = queries_during(session, lambda: key_conflicts(session, st.session_state.edit_journal, memo = memo))
+    assert len(conflicts) == 1 and n_queries == 1
+
+    reset_edit_journal(sales_rows())
+    record_rows(sales_rows(("C", "F", "P4", 2020, 2)), "add")
+    conflicts, n_queries = queries_during(session, lambda: key_conflicts(session, st.session_state.edit_journal, memo = memo))
+    assert conflicts.empty and n_queries == 1
@@ -0,0 +1,105 @@
+import pytest
+
+from change_set import compute_change_set, key_tuples
+from constants import SALES_TABLE
+from sales_save import BEFORE, DELETE, OP_COL, UPSERT, build_stage_frame, conflict_statement, merge_statement, save_change_set
+from sales_snapshot import ConcurrentModificationError
+
+from conftest import offline_sales, sales_rows
+
+B_P3 = ("B", "F", "P3", "2020")
+C_P4 = ("C", "F", "P4", "2020")
+D_P5 = ("D", "F", "P5", "2020")
+
+
+def base_rows():
+    return sales_rows(("A", "F", "P1", 2020, 1), ("B", "F", "P3", 2020, 3), ("C", "F", "P4", 2020, 4))
+
+
+def edited_change_set(base):
+    """
+    Updates B, removes C and adds D.
+    """
+    edited = base.copy()
+    edited.loc[1, "JAN"] = 30.0
+    edited = edited.drop(index = 2)
+    edited.loc[3] = ["D", "F", "P5", 2020] + [5.0] + [0.0] * 11
+    return compute_change_set(base, edited)
+
+
+def staged(session, stage_df, name="TMP_SALES_STAGE_TEST"):
+    session.create_dataframe(stage_df).write.save_as_table(name, mode = "overwrite", table_type = "temporary")
+    return name
+
+
+def ops_by_key(stage_df):
+    return sorted(zip(stage_df[OP_COL], key_tuples(stage_df)))
+
+
+def conflicting_keys(session, stage_df):
+    columns = [c for c in stage_df.columns if c != OP_COL]
+    rows = session.sql(conflict_statement(columns, staged(session, stage_df))).collect()
+    return sorted((r[0], r[1], r[2], str(r[3])) for r in rows)
+
+
+def test_stage_frame_holds_upserts_deletes_and_baselines():
+    stage_df = build_stage_frame(edited_change_set(base_rows()))
+    assert ops_by_key(stage_df) == sorted([
+        (UPSERT, B_P3), (UPSERT, D_P5), (DELETE, C_P4), (BEFORE, B_P3), (BEFORE, C_P4),
+    ])
+    upserted = stage_df[stage_df[OP_COL] == UPSERT].set_index("PRODUCT")["JAN"]
+    assert upserted.to_dict() == {"P3": 30.0, "P5": 5.0}
+    assert stage_df.loc[stage_df[OP_COL] == BEFORE, "JAN"].tolist() == [3.0, 4.0]
+
+
+def test_no_conflicts_while_sales_is_unchanged():
+    session = offline_sales(base_rows())
+    assert conflicting_keys(session, build_stage_frame(edited_change_set(base_rows()))) == []
+
+
+@pytest.mark.parametrize("change, key", [
+    (f"UPDATE {SALES_TABLE} SET JAN = 99 WHERE PRODUCT = 'P3'", B_P3),
+    (f"DELETE FROM {SALES_TABLE} WHERE PRODUCT = 'P4'", C_P4),
+    (f"INSERT INTO {SALES_TABLE} (METRIC, FORECAST, PRODUCT, YEAR, JAN) VALUES ('D', 'F', 'P5', 2020, 1)", D_P5),
+])
+def test_rows_changed_by_another_session_conflict(change, key):
+    session = offline_sales(base_rows())
+    session.sql(change).collect()
+    assert conflicting_keys(session, build_stage_frame(edited_change_set(base_rows()))) == [key]
+
+
+def test_merge_applies_only_the_staged_changes():
+    session = offline_sales(base_rows())
+    stage_df = build_stage_frame(edited_change_set(base_rows()))
+    columns = [c for c in stage_df.columns if c != OP_COL]
+    counts = session.sql(merge_statement(columns, staged(session, stage_df))).collect()[0].as_dict()
+
+    assert counts == {"number of rows inserted": 1, "number of rows updated": 1, "number of rows deleted": 1}
+    stored = session.table(SALES_TABLE).to_pandas()
+    assert dict(zip(key_tuples(stored), stored["JAN"])) == {("A", "F", "P1", "2020"): 1.0, B_P3: 30.0, D_P5: 5.0}
+
+
+def test_save_rolls_back_on_a_conflict():
+    session = offline_sales(base_rows())
+    session.sql(f"UPDATE {SALES_TABLE} SET JAN = 99 WHERE PRODUCT = 'P3'").collect()
+    with pytest.raises(ConcurrentModificationError):
+        save_change_set(session, edited_change_set(base_rows()))
+    assert len(session.table(SALES_TABLE).to_pandas()) == 3
+
+
+def test_an_upload_may_reuse_a_key_the_save_deletes():
+    session = offline_sales(base_rows())
+    upload = staged(session, sales_rows(("C", "F", "P4", 2020, 40), ("E", "F", "P6", 2020, 6)), "TMP_UPLOAD_TEST")
+    result = save_change_set(session, edited_change_set(base_rows()), [(upload, 2)])
+
+    assert result["inserted"] == 3 and result["deleted"] == 1
+    stored = session.table(SALES_TABLE).to_pandas()
+    assert dict(zip(key_tuples(stored), stored["JAN"]))[C_P4] == 40.0
+    assert len(stored) == 5
+
+
+def test_an_upload_of_a_stored_key_conflicts():
+    session = offline_sales(base_rows())
+    upload = staged(session, sales_rows(("A", "F", "P1", 2020, 10)), "TMP_UPLOAD_TEST")
+    with pytest.raises(ConcurrentModificationError):
+        save_change_set(session, edited_change_set(base_rows()), [(upload, 1)])
@@ -0,0 +1,46 @@
+from benchmarks.offline_session import OfflineSession
+from change_set import compute_change_set, key_tuples
+from constants import PK_COLS, SALES_TABLE
+from sales_save import save_change_set
+from sales_snapshot import SalesSnapshot, read_change_version, refresh_after_save
+
+from conftest import offline_sales, sales_rows
+
+
+def snapshot_of(session, frame):
+    return SalesSnapshot(frame = frame, version = read_change_version(session))
+
+
+def stored_rows(session):
+    return session.table(SALES_TABLE).to_pandas().sort_values(PK_COLS).reset_index(drop=True)
+
+
+def test_refresh_applies_a_rekey_saved_by_this_session():
+    base = sales_rows(("A", "F", "P1", 2020, 1), ("B", "F", "P3", 2020, 3))
+    session = offline_sales(base)
+    snapshot = snapshot_of(session, base)
+
+    edited = base.copy()
+    edited.loc[0, "PRODUCT"] = "P2"
+    change_set = compute_change_set(base, edited)
+    refreshed = refresh_after_save(snapshot, change_set, save_change_set(session, change_set))
+
+    assert refreshed is not None
+    assert refreshed.version == read_change_version(session)
+    assert sorted(key_tuples(refreshed.frame)) == key_tuples(stored_rows(session))
+
+
+def test_refresh_rejects_a_change_from_another_session_that_keeps_the_sums(tmp_path):
+    base = sales_rows(("A", "F", "P1", 2020, 1), ("B", "F", "P3", 2020, 3))
+    database = str(tmp_path / "sales.db")
+    session = offline_sales(base, database)
+    other = OfflineSession(database)
+    snapshot = snapshot_of(session, base)
+
+    other.sql(f"UPDATE {SALES_TABLE} SET JAN = 4 - JAN").collect()
+    edited = base.copy()
+    edited.loc[0, "FEB"] = 5.0
+    change_set = compute_change_set(base, edited)
+    save_result = save_change_set(session, change_set, detect_conflicts = False)
+
+    assert refresh_after_save(snapshot, change_set, save_result) is None
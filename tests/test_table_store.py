@@ -0,0 +1,57 @@
+from change_set import key_tuples
+from table_store import VersionedTable
+
+from conftest import sales_rows
+
+
+def products(frame):
+    return list(frame["PRODUCT"])
+
+
+def five_rows():
+    return sales_rows(*[("A", "F", f"P{i}", 2020, i) for i in range(5)])
+
+
+def test_view_is_the_base_until_something_changes():
+    base = five_rows()
+    table = VersionedTable(base)
+    assert table.view() is base
+    table.apply_editor_state({"edited_rows": {}, "added_rows": [], "deleted_rows": []})
+    assert table.view() is base and not table.has_changes
+
+
+def test_edit_positions_are_view_positions_after_deletes():
+    base = five_rows()
+    table = VersionedTable(base)
+    table.apply_editor_state({"deleted_rows": [1, 3]})
+    assert products(table.view()) == ["P0", "P2", "P4"]
+
+    table.apply_editor_state({"edited_rows": {2: {"JAN": 40.0}}, "deleted_rows": [0]})
+    view = table.view()
+    assert products(view) == ["P2", "P4"]
+    assert list(view["JAN"]) == [2.0, 40.0]
+    assert len(table) == 2
+    assert products(base) == ["P0", "P1", "P2", "P3", "P4"] and base["JAN"].iloc[4] == 4.0
+
+
+def test_added_rows_follow_the_kept_base_rows():
+    table = VersionedTable(five_rows())
+    table.apply_editor_state({"deleted_rows": [0]})
+    table.append(sales_rows(("B", "F", "P5", 2021, 5), ("B", "F", "P6", 2021, 6)))
+    assert products(table.view()) == ["P1", "P2", "P3", "P4", "P5", "P6"]
+
+    table.apply_editor_state({"edited_rows": {4: {"JAN": 50.0}}, "deleted_rows": [5]})
+    view = table.view()
+    assert key_tuples(view.iloc[4:]) == [("B", "F", "P5", "2021")]
+    assert view["JAN"].iloc[4] == 50.0
+
+
+def test_a_cell_edit_is_dropped_with_its_deleted_row():
+    table = VersionedTable(five_rows())
+    table.apply_editor_state({"edited_rows": {1: {"JAN": 10.0}}})
+    table.apply_editor_state({"deleted_rows": [1]})
+    table.apply_editor_state({"edited_rows": {1: {"FEB": 1.0}}})
+    view = table.view()
+    assert products(view) == ["P0", "P2", "P3", "P4"]
+    assert list(view["JAN"]) == [0.0, 2.0, 3.0, 4.0]
+    assert list(view["FEB"]) == [0.0, 1.0, 0.0, 0.0]
@@ -0,0 +1,195 @@
+"""
+Rule-based validation of SALES rows before they reach the editor or a staging table.
+
+Every rule checks a whole frame with vectorized pandas/NumPy operations and
+returns boolean masks, so a frame is validated in one pass per rule whatever its
+size. The editor, the new row dialog and both CSV append paths run the same rules:
+
+    key_not_null  every key column holds a non-blank value
+    in_dropdown   key values are among the DROPDOWN_OPTIONS of their column
+    numeric       month values are numbers
+    non_negative  month values are >= 0
+    unique_key    keys are unique within the frame and not in the existing keys
+
+Every violation is reported with its row (the index label of the row in the
+validated frame) and column, not just the first one found.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from change_set import normalize_keys
+from constants import MONTH_COLS, PK_COLS
+from perf_trace import span
+
+VIOLATION_COLUMNS = ["row", "column", "rule", "value", "message"]
+
+
+@dataclass(frozen=True)
+class ValidationReport:
+    """
+    Attributes:
+        violations (pd.DataFrame) : One row per invalid cell with row, column, rule, value and message
+        n_rows (int) : Number of rows validated
+    """
+    violations: pd.DataFrame
+    n_rows: int
+
+    @property
+    def ok(self):
+        return self.violations.empty
+
+    def invalid_rows(self):
+        """
+        Returns:
+            pd.Index : Labels of the rows with at least one violation, in order
+        """
+        return pd.Index(pd.unique(self.violations["row"]))
+
+    def summary(self):
+        """
+        Returns:
+            dict : Number of violations per rule
+        """
+        return self.violations["rule"].value_counts(sort = False).to_dict()
+
+
+@dataclass
+class _Frame:
+    """
+    The frame under validation plus the key normalisation shared by the key rules.
+    """
+    df: pd.DataFrame
+    pk_cols: list
+    month_cols: list
+    dropdown_options: dict
+    existing_keys: object
+    _keys: pd.DataFrame = None
+
+    @property
+    def keys(self):
+        if self._keys is None:
+            self._keys = normalize_keys(self.df[self.pk_cols], self.pk_cols)
+        return self._keys
+
+
+def _blank(column, strings=None):
+    """
+    Missing values and strings that are empty once stripped.
+
+    Args:
+        strings (pd.Series) : The column already cast to stripped strings, when at hand
+    """
+    missing = column.isna().to_numpy()
+    if column.dtype == object or isinstance(column.dtype, (pd.StringDtype, pd.CategoricalDtype)):
+        if strings is None:
+            strings = column.astype(str).str.strip()
+        missing = missing | (strings == "").to_numpy()
+    return missing
+
+
+def check_key_not_null(frame):
+    for col_name in frame.pk_cols:
+        yield col_name, _blank(frame.df[col_name], frame.keys[col_name]), f"{col_name} is empty"
+
+
+def check_in_dropdown(frame):
+    for col_name in frame.pk_cols:
+        options = (frame.dropdown_options or {}).get(col_name)
+        if not options:
+            continue
+        allowed = {str(v).strip() for v in options}
+        column = frame.df[col_name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # One membership test per category instead of per row
+            known = np.array([str(c).strip() in allowed for c in column.cat.categories], dtype = bool)
+            codes = column.cat.codes.to_numpy()
+            unknown = (codes >= 0) & ~known[np.maximum(codes, 0)] if len(known) else np.zeros(len(codes), dtype = bool)
+        else:
+            strings = frame.keys[col_name]
+            if pd.api.types.is_float_dtype(column.dtype):
+                # A YEAR column with gaps is parsed from a CSV as floats: 2024.0 stands for 2024
+                values = column.dropna()
+                if (values == np.floor(values)).all():
+                    strings = column.astype("Int64").astype(str)
+            unknown = ~strings.isin(allowed).to_numpy() & ~_blank(column, frame.keys[col_name])
+        yield col_name, unknown, f"{col_name} is not one of the dropdown options"
+
+
+def _numbers(column):
+    if pd.api.types.is_numeric_dtype(column.dtype) and not pd.api.types.is_bool_dtype(column.dtype):
+        return column
+    return pd.to_numeric(column, errors = "coerce")
+
+
+def check_numeric(frame):
+    for col_name in frame.month_cols:
+        column = frame.df[col_name]
+        not_number = (_numbers(column).isna().to_numpy() & ~_blank(column))
+        yield col_name, not_number, f"{col_name} is not a number"
+
+
+def check_non_negative(frame):
+    for col_name in frame.month_cols:
+        with np.errstate(invalid = "ignore"):
+            negative = (_numbers(frame.df[col_name]) < 0).fillna(False).to_numpy(dtype = bool)
+        yield col_name, negative, f"{col_name} is negative"
+
+
+def check_unique_key(frame):
+    duplicated = frame.keys.duplicated(keep = False).to_numpy()
+    if frame.existing_keys is not None:
+        exists = np.fromiter(
+            (key in frame.existing_keys for key in zip(*(frame.keys[c].to_numpy() for c in frame.pk_cols))),
+            dtype = bool,
+            count = len(frame.df),
+        )
+        duplicated = duplicated | exists
+    # Reported once per row, on the first key column
+    yield frame.pk_cols[0], duplicated, f"The ({', '.join(frame.pk_cols)}) combination is not unique"
+
+
+RULES = {
+    "key_not_null": check_key_not_null,
+    "in_dropdown": check_in_dropdown,
+    "numeric": check_numeric,
+    "non_negative": check_non_negative,
+    "unique_key": check_unique_key,
+}
+
+
+def validate(df, dropdown_options=None, existing_keys=None, rules=tuple(RULES), pk_cols=PK_COLS, month_cols=MONTH_COLS):
+    """
+    Checks every row of df against the rules.
+
+    Args:
+        df (pd.DataFrame) : The rows to check, with the SALES columns
+        dropdown_options (dict) : Column name -> allowed values; columns without options are not checked
+        existing_keys (container) : Keys the rows must not reuse, a set or a key index overlay
+        rules (iterable) : Names of the RULES to run
+        pk_cols (list) : The key columns
+        month_cols (list) : The numeric columns; those missing from df are skipped
+
+    Returns:
+        ValidationReport : Every violation found
+    """
+    frame = _Frame(df, list(pk_cols), [c for c in month_cols if c in df.columns], dropdown_options, existing_keys)
+    labels = df.index.to_numpy()
+    parts = []
+    with span("validate", rows = len(df)) as s:
+        for rule in rules:
+            for col_name, mask, message in RULES[rule](frame):
+                positions = np.flatnonzero(mask)
+                if not len(positions):
+                    continue
+                parts.append(pd.DataFrame({
+                    "row": labels[positions],
+                    "column": col_name,
+                    "rule": rule,
+                    "value": df[col_name].to_numpy(dtype = object)[positions],
+                    "message": message,
+                }))
+        violations = pd.concat(parts, ignore_index = True) if parts else pd.DataFrame(columns = VIOLATION_COLUMNS)
+        s.set(violations = len(violations))
+    return ValidationReport(violations = violations, n_rows = len(df))
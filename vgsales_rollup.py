@@ -0,0 +1,91 @@
+"""
+Pre-aggregated VGSALES rollup by (YEAR, GENRE, PLATFORM).
+
+The rollup is a Snowflake dynamic table, so the warehouse refreshes it
+incrementally whenever VGSALES changes. Filtered dashboard queries read the
+rollup, a few thousand rows, instead of the fact table.
+"""
+import streamlit as st
+
+from constants import DATABASE_SCHEMA, REGION_COLS, VGSALES_TABLE
+from query_cache import cached_query
+
+ROLLUP_TABLE = f"{DATABASE_SCHEMA}.VGSALES_ROLLUP"
+ROLLUP_TARGET_LAG = "1 minute"
+ROLLUP_RETRY_SECONDS = 5 * 60
+
+
+def rollup_ddl(warehouse):
+    """
+    Returns:
+        str : The CREATE DYNAMIC TABLE statement for the rollup
+    """
+    sums = ",\n            ".join([f"SUM({c}) AS {c}" for c in REGION_COLS])
+    return f"""
+        CREATE DYNAMIC TABLE IF NOT EXISTS {ROLLUP_TABLE}
+        TARGET_LAG = '{ROLLUP_TARGET_LAG}'
+        WAREHOUSE = {warehouse}
+        REFRESH_MODE = INCREMENTAL
+        AS
+        SELECT
+            YEAR,
+            GENRE,
+            PLATFORM,
+            {sums},
+            COUNT(*) AS ROW_COUNT
+        FROM {VGSALES_TABLE}
+        GROUP BY YEAR, GENRE, PLATFORM
+    """
+
+
+@st.cache_resource(ttl = ROLLUP_RETRY_SECONDS)
+def ensure_rollup(_session):
+    """
+    Creates the rollup if it does not exist yet. The outcome is shared by the whole process
+    for ROLLUP_RETRY_SECONDS, so a failed attempt (e.g. a missing privilege or warehouse)
+    is retried after that instead of disabling the rollup until the app restarts.
+
+    Returns:
+        bool : True when the rollup can be queried, False to fall back to VGSALES
+    """
+    try:
+        warehouse = _session.sql("SELECT CURRENT_WAREHOUSE()").collect()[0][0]
+        _session.sql(rollup_ddl(warehouse)).collect()
+        return True
+    except Exception:
+        return False
+
+
+def dashboard_source(session):
+    """
+    Returns:
+        str : The table the dashboard should aggregate, the rollup when available
+    """
+    return ROLLUP_TABLE if ensure_rollup(session) else VGSALES_TABLE
+
+
+def _fetch_filter_options(session, source):
+    df = (
+        session.table(source)
+        .select("GENRE", "PLATFORM")
+        .distinct()
+        .to_pandas()
+    )
+    return {
+        "GENRE": sorted(df["GENRE"].dropna().astype(str).unique().tolist()),
+        "PLATFORM": sorted(df["PLATFORM"].dropna().astype(str).unique().tolist()),
+    }
+
+
+def load_filter_options(session):
+    """
+    Returns:
+        dict : Sorted GENRE and PLATFORM values for the sidebar filters
+    """
+    source = dashboard_source(session)
+    return cached_query(
+        session,
+        [VGSALES_TABLE, source],
+        ("filter_options", source),
+        lambda: _fetch_filter_options(session, source),
+    )